@@ -0,0 +1,185 @@
+import errno
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+from latency import percentile
+
+# ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else.
+MAXRSS_SCALE = 1024 if sys.platform == 'darwin' else 1
+
+BENCH_FIELDS = [
+    ('wall', 'Wall (ms)', 1000.0),
+    ('user', 'User CPU (ms)', 1000.0),
+    ('sys', 'Sys CPU (ms)', 1000.0),
+    ('max_rss', 'Max RSS (KB)', 1.0),
+]
+
+# A child's max RSS survives exec and starts out at what it shared with its
+# parent at fork, so a program forked straight from the editor would report at
+# least the editor's size. Programs are instead forked from this launcher, a
+# fresh interpreter without site imports. It prints the max RSS of a child
+# that exits straight after fork (the floor any program reads), then the
+# program's exit code, wall time and rusage. It enforces the timeout itself:
+# its only thread kills the child before reaping it, so the kill can't hit a
+# reused pid.
+_LAUNCHER = r"""
+import os, signal, sys, time
+timeout, cmd = float(sys.argv[1]), sys.argv[2:]
+out = os.dup(1)
+devnull = os.open(os.devnull, os.O_WRONLY)
+def spawn(path):
+    # The child runs as little Python as possible before exec: every page it
+    # touches counts towards the program's max RSS
+    pid = os.fork()
+    if pid == 0:
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        if path:
+            try:
+                os.execv(path, cmd)
+            except OSError as e:
+                os.write(out, b'error %d\n' % e.errno)
+        os._exit(127)
+    return pid
+floor = os.wait4(spawn(None), 0)[2].ru_maxrss
+start = time.perf_counter()
+pid = spawn(cmd[0])
+if timeout and hasattr(os, 'waitid'):
+    def expire(signum, frame):
+        os.kill(pid, signal.SIGKILL)
+    signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)   # leaves the child unreaped
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    signal.signal(signal.SIGALRM, signal.SIG_IGN)
+    wall = time.perf_counter() - start
+    _, status, usage = os.wait4(pid, 0)
+else:
+    deadline = start + timeout if timeout else None
+    while True:
+        done, status, usage = os.wait4(pid, os.WNOHANG if deadline else 0)
+        if done:
+            break
+        if time.perf_counter() >= deadline:
+            os.kill(pid, signal.SIGKILL)
+            deadline = None
+        else:
+            time.sleep(0.001)
+    wall = time.perf_counter() - start
+os.write(out, b'%d %d %.9f %.9f %.9f %d\n' % (floor, os.waitstatus_to_exitcode(status), wall,
+                                             usage.ru_utime, usage.ru_stime, usage.ru_maxrss))
+"""
+
+
+def _run_launched(cmd, stdin, timeout):
+    # The launcher execs a full path, so the program is looked up here
+    path = cmd[0] if os.path.dirname(cmd[0]) else shutil.which(cmd[0])
+    if path is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), cmd[0])
+    launcher = subprocess.run([sys.executable, '-S', '-E', '-c', _LAUNCHER, str(timeout or 0), path, *cmd[1:]],
+                              stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    fields = launcher.stdout.split()
+    if fields[:1] == [b'error']:
+        code = int(fields[1])
+        raise OSError(code, os.strerror(code), cmd[0])
+    if len(fields) != 6:
+        raise RuntimeError(f"benchmark launcher failed: {launcher.stderr.decode(errors='replace').strip()}")
+    floor, returncode, wall, user, sys_time, max_rss = fields
+    return {
+        'wall': float(wall),
+        'user': float(user),
+        'sys': float(sys_time),
+        'max_rss': int(max_rss) / MAXRSS_SCALE,
+        'rss_floor': int(floor) / MAXRSS_SCALE,
+        'returncode': int(returncode),
+    }
+
+
+def run_once(cmd, stdin_path=None, timeout=None):
+    stdin = open(stdin_path, 'rb') if stdin_path else subprocess.DEVNULL
+    try:
+        if hasattr(os, 'wait4'):
+            return _run_launched(cmd, stdin, timeout)
+        # Windows: wall time only
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        return {'wall': time.perf_counter() - start, 'user': None, 'sys': None, 'max_rss': None,
+                'returncode': proc.returncode}
+    finally:
+        if stdin_path:
+            stdin.close()
+
+
+def run_benchmark(cmd, runs=10, warmups=2, stdin_path=None, timeout=None):
+    for _ in range(warmups):
+        run_once(cmd, stdin_path, timeout)
+    return [run_once(cmd, stdin_path, timeout) for _ in range(runs)]
+
+
+def summarize(values):
+    return {
+        'min': min(values),
+        'median': statistics.median(values),
+        'p95': percentile(sorted(values), 0.95),
+        'stddev': statistics.stdev(values) if len(values) > 1 else 0.0,
+    }
+
+
+def summarize_samples(samples):
+    summary = {}
+    for field, _, scale in BENCH_FIELDS:
+        values = [s[field] * scale for s in samples if s[field] is not None]
+        if values:
+            summary[field] = summarize(values)
+    return summary
+
+
+def _rss_floor_note(samples):
+    floors = [s['rss_floor'] for s in samples if s.get('rss_floor') is not None]
+    if floors:
+        return f"Note: max RSS reads at least {max(floors):.0f} KB, the launcher's size at fork."
+    return None
+
+
+def format_report(label, samples):
+    summary = summarize_samples(samples)
+    failures = sum(1 for s in samples if s['returncode'] != 0)
+    lines = [f"Benchmark: {label} ({len(samples)} runs)"]
+    lines.append(f"{'':<15}{'min':>12}{'median':>12}{'p95':>12}{'stddev':>12}")
+    for field, title, _ in BENCH_FIELDS:
+        if field not in summary:
+            continue
+        st = summary[field]
+        lines.append(f"{title:<15}{st['min']:>12.2f}{st['median']:>12.2f}{st['p95']:>12.2f}{st['stddev']:>12.2f}")
+    if failures:
+        lines.append(f"Warning: {failures} run(s) exited with a non-zero status.")
+    note = _rss_floor_note(samples)
+    if 'max_rss' in summary and note:
+        lines.append(note)
+    return "\n".join(lines) + "\n"
+
+
+def format_comparison(label_a, samples_a, label_b, samples_b):
+    sum_a = summarize_samples(samples_a)
+    sum_b = summarize_samples(samples_b)
+    lines = [f"Benchmark comparison: A = {label_a}, B = {label_b}"]
+    lines.append(f"{'':<15}{'A median':>12}{'B median':>12}{'A p95':>12}{'B p95':>12}{'B/A':>8}")
+    for field, title, _ in BENCH_FIELDS:
+        if field not in sum_a or field not in sum_b:
+            continue
+        a, b = sum_a[field], sum_b[field]
+        ratio = f"{b['median'] / a['median']:.2f}x" if a['median'] else '-'
+        lines.append(f"{title:<15}{a['median']:>12.2f}{b['median']:>12.2f}{a['p95']:>12.2f}{b['p95']:>12.2f}{ratio:>8}")
+    note = _rss_floor_note(samples_a + samples_b)
+    if 'max_rss' in sum_a and 'max_rss' in sum_b and note:
+        lines.append(note)
+    return "\n".join(lines) + "\n"
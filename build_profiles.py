@@ -0,0 +1,132 @@
+import hashlib
+import os
+import subprocess
+import time
+from contextlib import contextmanager
+
+# ------------------------------
+# Named build profiles for C/C++
+# ------------------------------
+# Every profile writes into its own output directory next to the source file,
+# so switching profiles never throws away the artifacts of another one.
+BUILD_PROFILES = {
+    'Debug': {'flags': ['-g', '-O0'], 'dir': 'debug'},
+    'Release (-O2)': {'flags': ['-O2'], 'dir': 'release'},
+    'Native (-O3)': {'flags': ['-O3', '-march=native'], 'dir': 'native'},
+}
+
+DEFAULT_PROFILE = 'Release (-O2)'
+DEBUG_PROFILE = 'Debug'
+
+BUILD_DIR = 'build'
+
+COMPILERS = {
+    'C': 'gcc',
+    'C++': 'g++',
+}
+
+EXE_SUFFIX = '.exe' if os.name == 'nt' else ''
+
+# An editor that logs its builds registers a callable taking (op, **fields);
+# without one, build() does no bookkeeping beyond the up-to-date check
+_build_listener = None
+
+
+def set_build_listener(listener):
+    global _build_listener
+    _build_listener = listener
+
+
+@contextmanager
+def _reported(lang, src, **fields):
+    # Times a build and hands the record (cache, exit_code, ...) to the listener
+    if _build_listener is None:
+        yield {}
+        return
+    try:
+        size = os.path.getsize(src)
+    except OSError:
+        size = None
+    record = dict(fields, lang=lang, bytes=size)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        _build_listener('build', **record)
+
+
+def profile_dir(src, profile, variant=''):
+    out_dir = BUILD_PROFILES[profile]['dir']
+    if variant:
+        out_dir = f"{out_dir}-{variant}"
+    return os.path.join(os.path.dirname(os.path.abspath(src)), BUILD_DIR, out_dir)
+
+
+def artifact_path(src, profile, variant=''):
+    base = os.path.splitext(os.path.basename(src))[0]
+    return os.path.join(profile_dir(src, profile, variant), base + EXE_SUFFIX)
+
+
+def compile_command(lang, src, exe, profile, extra_flags=()):
+    return [COMPILERS[lang], *BUILD_PROFILES[profile]['flags'], *extra_flags, src, '-o', exe]
+
+
+def _build_stamp(src, cmd):
+    digest = hashlib.sha1()
+    with open(src, 'rb') as f:
+        digest.update(f.read())
+    digest.update('\0'.join(cmd).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Returns (exe_path, proc). proc is None when the existing artifact was built
+# from the same source and flags, in which case the compiler is not run at all.
+def build(lang, src, profile, extra_flags=(), variant='', force=False):
+    exe = artifact_path(src, profile, variant)
+    cmd = compile_command(lang, src, exe, profile, extra_flags)
+    stamp_file = exe + '.stamp'
+    with _reported(lang, src, profile=profile) as record:
+        stamp = _build_stamp(src, cmd)
+
+        if not force and os.path.exists(exe) and os.path.exists(stamp_file):
+            with open(stamp_file, 'r') as f:
+                if f.read() == stamp:
+                    record.update(cache='hit', exit_code=0)
+                    return exe, None
+
+        record['cache'] = 'miss'
+        os.makedirs(os.path.dirname(exe), exist_ok=True)
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        record['exit_code'] = proc.returncode
+        if proc.returncode == 0:
+            with open(stamp_file, 'w') as f:
+                f.write(stamp)
+        elif os.path.exists(stamp_file):
+            os.remove(stamp_file)
+        return exe, proc
+
+
+# Builds src if its language needs a compile step and returns (run_cmd, error).
+def prepare_run_command(lang, src, profile=DEFAULT_PROFILE, variant=''):
+    if lang in COMPILERS:
+        exe, proc = build(lang, src, profile, variant=variant)
+        if proc is not None and proc.returncode != 0:
+            return None, proc.stderr
+        return [exe], None
+    if lang == 'Python':
+        return ['python', src], None
+    if lang == 'Java':
+        out_dir = os.path.join(os.path.dirname(os.path.abspath(src)), BUILD_DIR, 'java')
+        os.makedirs(out_dir, exist_ok=True)
+        with _reported(lang, src) as record:
+            proc = subprocess.run(['javac', '-d', out_dir, src], capture_output=True, text=True)
+            record['exit_code'] = proc.returncode
+        if proc.returncode != 0:
+            return None, proc.stderr
+        class_name = os.path.splitext(os.path.basename(src))[0]
+        return ['java', '-cp', out_dir, class_name], None
+    return None, f"Running {lang} programs is not supported."
@@ -0,0 +1,98 @@
+import difflib
+import functools
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: no per-process memory limit
+    resource = None
+
+DEFAULT_TIMEOUT = 5            # seconds per case
+DEFAULT_MEMORY_LIMIT_MB = 256  # address-space limit per case
+INPUT_EXTENSION = '.in'
+EXPECTED_EXTENSION = '.out'
+
+
+def discover_cases(directory):
+    # Every NAME.in is a case; NAME.out is its expected output when present
+    cases = []
+    for entry in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(entry)
+        if ext != INPUT_EXTENSION:
+            continue
+        expected = os.path.join(directory, name + EXPECTED_EXTENSION)
+        cases.append((name, os.path.join(directory, entry), expected if os.path.exists(expected) else None))
+    return cases
+
+
+def normalize_output(text):
+    lines = [line.rstrip() for line in text.splitlines()]
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _limit_memory(limit_mb):
+    limit = limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def run_case(cmd, case, timeout=DEFAULT_TIMEOUT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+    name, input_path, expected_path = case
+    preexec = None
+    if memory_limit_mb and cmd[0] == 'java':
+        # The JVM reserves far more address space than it uses; cap its heap instead
+        cmd = [cmd[0], f"-Xmx{memory_limit_mb}m", *cmd[1:]]
+    elif memory_limit_mb and resource is not None:
+        preexec = functools.partial(_limit_memory, memory_limit_mb)
+
+    start = time.perf_counter()
+    try:
+        with open(input_path, 'rb') as stdin:
+            proc = subprocess.run(cmd, stdin=stdin, capture_output=True, timeout=timeout, preexec_fn=preexec)
+    except subprocess.TimeoutExpired:
+        return {'name': name, 'status': 'TLE', 'time': time.perf_counter() - start,
+                'detail': f"Time limit of {timeout}s exceeded."}
+    except OSError as e:
+        return {'name': name, 'status': 'ERROR', 'time': 0.0, 'detail': str(e)}
+    elapsed = time.perf_counter() - start
+
+    stdout = proc.stdout.decode('utf-8', errors='replace')
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode('utf-8', errors='replace')
+        return {'name': name, 'status': 'RE', 'time': elapsed,
+                'detail': f"Exit code {proc.returncode}.\n{stderr}"}
+    if expected_path is None:
+        return {'name': name, 'status': 'DONE', 'time': elapsed, 'detail': stdout}
+
+    with open(expected_path, 'r', encoding='utf-8', errors='replace') as f:
+        expected = normalize_output(f.read())
+    actual = normalize_output(stdout)
+    if actual == expected:
+        return {'name': name, 'status': 'PASS', 'time': elapsed, 'detail': ''}
+    diff = difflib.unified_diff(expected, actual, 'expected', 'actual', lineterm='', n=1)
+    return {'name': name, 'status': 'FAIL', 'time': elapsed, 'detail': "\n".join(list(diff)[:40])}
+
+
+# Runs every case concurrently. Each pool worker only waits on its own child
+# process, so the pool size is the number of programs running at once.
+def run_cases(cmd, cases, timeout=DEFAULT_TIMEOUT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, workers=None):
+    if not cases:
+        return []
+    workers = workers or min(len(cases), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_case, cmd, case, timeout, memory_limit_mb) for case in cases]
+        return [future.result() for future in futures]
+
+
+def format_results(results):
+    passed = sum(1 for r in results if r['status'] in ('PASS', 'DONE'))
+    lines = [f"{'Case':<24}{'Status':<8}{'Time (ms)':>10}"]
+    # Slowest first so the cases worth optimizing are at the top
+    for r in sorted(results, key=lambda r: r['time'], reverse=True):
+        lines.append(f"{r['name']:<24}{r['status']:<8}{r['time'] * 1000:>10.1f}")
+    lines.append(f"{passed}/{len(results)} cases passed.")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,144 @@
+import cProfile
+import io
+import os
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+
+from latency import tracker
+
+# ----------------------------------
+# On-demand profiling from the menu
+# ----------------------------------
+# Diagnostics > Start Capture turns on cProfile for the Tk main thread (where
+# every handler and UI job runs) and tracemalloc, and takes a first memory
+# snapshot. Stop Capture writes a timestamped folder under DIAGNOSTICS_DIR:
+#   profile.prof   raw cProfile data, for snakeviz or pstats
+#   profile.txt    hot functions by own and by cumulative time
+#   memory.txt     top live allocators and the growth since the capture began
+#   trace.json     the latency tracker's spans, as Chrome trace-event JSON
+#   summary.txt    duration, peak memory and the p50/p95 latencies
+# tracemalloc keeps TRACE_FRAMES frames per allocation; more frames give
+# longer tracebacks in memory.txt at a higher cost per allocation.
+
+DIAGNOSTICS_DIR = os.path.join(os.path.expanduser('~'), 'editor-diagnostics')
+TRACE_FRAMES = 4
+TOP_FUNCTIONS = 40
+TOP_ALLOCATORS = 25
+TOP_TRACEBACKS = 5
+
+
+def _kib(size):
+    return f"{size / 1024:,.1f} KiB"
+
+
+class DiagnosticsCapture:
+    def __init__(self, base_dir=DIAGNOSTICS_DIR, frames=TRACE_FRAMES):
+        self.base_dir = base_dir
+        self.frames = frames
+        self.profile = None
+        self.first_snapshot = None
+        self.started = None
+        self.started_wall = None
+        self.owns_tracemalloc = False
+        self.stats = {'captures': 0}
+
+    @property
+    def running(self):
+        return self.profile is not None
+
+    def start(self):
+        if self.running:
+            return
+        # Someone may already be tracing (PYTHONTRACEMALLOC); leave it running then
+        self.owns_tracemalloc = not tracemalloc.is_tracing()
+        if self.owns_tracemalloc:
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        self.first_snapshot = self._snapshot()
+        self.started = time.perf_counter()
+        self.started_wall = time.localtime()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        # Returns the report folder
+        if not self.running:
+            return None
+        self.profile.disable()
+        duration = time.perf_counter() - self.started
+        last_snapshot = self._snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self.owns_tracemalloc:
+            tracemalloc.stop()
+
+        folder = os.path.join(self.base_dir, time.strftime('%Y%m%d-%H%M%S', self.started_wall))
+        os.makedirs(folder, exist_ok=True)
+        self.profile.dump_stats(os.path.join(folder, 'profile.prof'))
+        with open(os.path.join(folder, 'profile.txt'), 'w') as f:
+            f.write(format_profile(self.profile))
+        with open(os.path.join(folder, 'memory.txt'), 'w') as f:
+            f.write(format_memory(self.first_snapshot, last_snapshot, current, peak))
+        tracker.export_chrome_trace(os.path.join(folder, 'trace.json'))
+        with open(os.path.join(folder, 'summary.txt'), 'w') as f:
+            f.write(self._summary(duration, current, peak))
+
+        self.profile = None
+        self.first_snapshot = None
+        self.stats['captures'] += 1
+        return folder
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    def _summary(self, duration, current, peak):
+        lines = [
+            f"Started:  {time.strftime('%Y-%m-%d %H:%M:%S', self.started_wall)}",
+            f"Duration: {duration:.1f} s",
+            f"Python:   {sys.version.split()[0]} on {platform.platform()}",
+            f"Memory:   {_kib(current)} traced at stop, {_kib(peak)} peak during the capture",
+            "Profile:  Tk main thread only; compiler and build subprocesses are not included",
+            "",
+            f"{'Latency':<16}{'p50 (ms)':>10}{'p95 (ms)':>10}{'count':>8}",
+        ]
+        for name, (p50, p95, count) in tracker.summary().items():
+            lines.append(f"{name:<16}{p50 * 1000:>10.2f}{p95 * 1000:>10.2f}{count:>8}")
+        return "\n".join(lines) + "\n"
+
+
+def format_profile(profile, limit=TOP_FUNCTIONS):
+    out = io.StringIO()
+    for order, title in (('tottime', 'Hot functions by own time'), ('cumulative', 'Hot functions by cumulative time')):
+        out.write(f"{title}\n{'=' * len(title)}\n")
+        pstats.Stats(profile, stream=out).strip_dirs().sort_stats(order).print_stats(limit)
+    return out.getvalue()
+
+
+def format_memory(first, last, current, peak, limit=TOP_ALLOCATORS):
+    lines = [f"Traced memory: {_kib(current)} now, {_kib(peak)} peak", "",
+             "Top allocators (live at stop)", "============================="]
+    for stat in last.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{_kib(stat.size):>14} {stat.count:>9} blocks  {frame.filename}:{frame.lineno}")
+    lines += ["", "Growth since the capture started", "================================"]
+    for stat in last.compare_to(first, 'lineno')[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{'+' if stat.size_diff >= 0 else '-'}{_kib(abs(stat.size_diff)):>13} "
+                     f"{stat.count_diff:>+9} blocks  {frame.filename}:{frame.lineno}")
+    lines += ["", "Largest growth by traceback", "==========================="]
+    for stat in last.compare_to(first, 'traceback')[:TOP_TRACEBACKS]:
+        lines.append(f"{_kib(stat.size_diff)} in {stat.count_diff:+} blocks")
+        lines.extend("    " + line for line in stat.traceback.format())
+    return "\n".join(lines) + "\n"
+
+
+# One capture per process: cProfile can only profile one thing at a time
+capture = DiagnosticsCapture()
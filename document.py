@@ -0,0 +1,234 @@
+import bisect
+import sys
+
+# ----------------------------
+# Piece-table document model
+# ----------------------------
+# Text lives in immutable buffers: the text the document was loaded with, plus
+# one small buffer per burst of typing. A piece is (buffer, start, length), so
+# a snapshot is just a tuple of pieces and never copies the text itself.
+
+MERGE_LIMIT = 4096   # typing keeps extending one add buffer up to this size
+MAX_PIECES = 4096    # past this many pieces the document is flattened again
+
+
+class Buffer:
+    __slots__ = ('text', 'is_add', '_newlines')
+
+    def __init__(self, text, is_add=False):
+        self.text = text
+        self.is_add = is_add  # typed text, which later typing may extend
+        self._newlines = None
+
+    @property
+    def newlines(self):
+        # Offsets of every '\n' in the buffer, built on first use
+        if self._newlines is None:
+            positions = []
+            find = self.text.find
+            pos = find('\n')
+            while pos != -1:
+                positions.append(pos)
+                pos = find('\n', pos + 1)
+            self._newlines = positions
+        return self._newlines
+
+    def count_newlines(self, start, end):
+        newlines = self.newlines
+        return bisect.bisect_left(newlines, end) - bisect.bisect_left(newlines, start)
+
+
+class _PieceView:
+    # Read-only queries shared by Document and DocumentSnapshot. Lookups bisect
+    # over per-piece prefix sums of characters and newlines: O(log n).
+
+    def _index(self):
+        raise NotImplementedError
+
+    @property
+    def length(self):
+        offsets, _ = self._index()
+        return offsets[-1]
+
+    @property
+    def line_count(self):
+        _, newlines = self._index()
+        return newlines[-1] + 1
+
+    def get_text(self, start=0, end=None):
+        offsets, _ = self._index()
+        total = offsets[-1]
+        end = total if end is None else min(end, total)
+        start = max(0, start)
+        if start >= end:
+            return ''
+        if start == 0 and end == total:
+            self.stats['full_copies'] += 1
+        self.stats['chars_copied'] += end - start
+        i = bisect.bisect_right(offsets, start) - 1
+        parts = []
+        while start < end:
+            buf, p_start, p_len = self.pieces[i]
+            local = start - offsets[i]
+            take = min(p_len - local, end - start)
+            parts.append(buf.text[p_start + local:p_start + local + take])
+            start += take
+            i += 1
+        return ''.join(parts)
+
+    def line_start(self, line):
+        # Offset of the first character of a 1-based line
+        offsets, newlines = self._index()
+        if line <= 1:
+            return 0
+        if line - 1 > newlines[-1]:
+            return offsets[-1]
+        target = line - 1  # number of newlines before the line
+        i = bisect.bisect_left(newlines, target) - 1
+        buf, p_start, _ = self.pieces[i]
+        first = bisect.bisect_left(buf.newlines, p_start)
+        pos = buf.newlines[first + target - newlines[i] - 1]
+        return offsets[i] + (pos - p_start) + 1
+
+    def offset_to_line_col(self, offset):
+        offsets, newlines = self._index()
+        offset = max(0, min(offset, offsets[-1]))
+        i = bisect.bisect_right(offsets, offset) - 1
+        if i >= len(self.pieces):
+            i = len(self.pieces) - 1
+        if i < 0:
+            return 1, offset
+        buf, p_start, _ = self.pieces[i]
+        line = 1 + newlines[i] + buf.count_newlines(p_start, p_start + offset - offsets[i])
+        return line, offset - self.line_start(line)
+
+    def line_col_to_offset(self, line, col):
+        start = self.line_start(line)
+        return min(start + col, self.line_end(line))
+
+    def line_end(self, line):
+        if line >= self.line_count:
+            return self.length
+        return self.line_start(line + 1) - 1
+
+    def get_line(self, line):
+        return self.get_text(self.line_start(line), self.line_end(line))
+
+    def to_tk_index(self, offset):
+        line, col = self.offset_to_line_col(offset)
+        return f"{line}.{col}"
+
+    def from_tk_index(self, index):
+        line, col = map(int, index.split('.'))
+        return self.line_col_to_offset(line, col)
+
+
+class DocumentSnapshot(_PieceView):
+    def __init__(self, pieces, offsets, newlines, version, stats):
+        self.pieces = pieces
+        self._offsets = offsets
+        self._newlines = newlines
+        self.version = version
+        self.stats = stats
+
+    def _index(self):
+        return self._offsets, self._newlines
+
+
+class Document(_PieceView):
+    def __init__(self, text=''):
+        self.pieces = []
+        self.version = 0
+        self.stats = {'full_copies': 0, 'chars_copied': 0, 'edits': 0}
+        self._offsets = None
+        self._newlines = None
+        self.reset(text)
+
+    def reset(self, text):
+        self.pieces = [(Buffer(text), 0, len(text))] if text else []
+        self._invalidate()
+        self.version += 1
+
+    def _invalidate(self):
+        self._offsets = None
+        self._newlines = None
+
+    def _index(self):
+        if self._offsets is None:
+            offsets = [0]
+            newlines = [0]
+            for buf, start, length in self.pieces:
+                offsets.append(offsets[-1] + length)
+                newlines.append(newlines[-1] + buf.count_newlines(start, start + length))
+            self._offsets = offsets
+            self._newlines = newlines
+        return self._offsets, self._newlines
+
+    def _split(self, offset):
+        # Returns the piece index that starts exactly at offset, splitting a piece if needed
+        offsets, _ = self._index()
+        i = bisect.bisect_right(offsets, offset) - 1
+        if i >= len(self.pieces):
+            return len(self.pieces)
+        local = offset - offsets[i]
+        if local == 0:
+            return i
+        buf, start, length = self.pieces[i]
+        self.pieces[i:i + 1] = [(buf, start, local), (buf, start + local, length - local)]
+        self._invalidate()
+        return i + 1
+
+    def insert(self, offset, text):
+        if not text:
+            return
+        offset = max(0, min(offset, self.length))
+        offsets, _ = self._index()
+        i = bisect.bisect_left(offsets, offset) - 1
+        # Typing right after the previous insert extends that add buffer
+        if 0 <= i < len(self.pieces) and offsets[i + 1] == offset:
+            buf, start, length = self.pieces[i]
+            if buf.is_add and start + length == len(buf.text) and len(buf.text) + len(text) <= MERGE_LIMIT:
+                self.pieces[i] = (Buffer(buf.text + text, is_add=True), start, length + len(text))
+                self._edited()
+                return
+        index = self._split(offset)
+        self.pieces.insert(index, (Buffer(text, is_add=True), 0, len(text)))
+        self._edited()
+
+    def delete(self, offset, length):
+        # Returns the removed text
+        offset = max(0, offset)
+        end = min(offset + length, self.length)
+        if offset >= end:
+            return ''
+        removed = self.get_text(offset, end)
+        first = self._split(offset)
+        last = self._split(end)
+        del self.pieces[first:last]
+        self._edited()
+        return removed
+
+    def _edited(self):
+        self._invalidate()
+        self.version += 1
+        self.stats['edits'] += 1
+        if len(self.pieces) > MAX_PIECES:
+            text = self.get_text()
+            self.pieces = [(Buffer(text), 0, len(text))]
+            self._invalidate()
+
+    def snapshot(self):
+        offsets, newlines = self._index()
+        return DocumentSnapshot(tuple(self.pieces), offsets, newlines, self.version, self.stats)
+
+    def memory_estimate(self):
+        seen = set()
+        total = sys.getsizeof(self.pieces)
+        for buf, _, _ in self.pieces:
+            total += 64  # piece tuple
+            if id(buf) not in seen:
+                seen.add(id(buf))
+                total += sys.getsizeof(buf.text)
+                if buf._newlines is not None:
+                    total += sys.getsizeof(buf._newlines) + 28 * len(buf._newlines)
+        return total
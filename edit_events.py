@@ -0,0 +1,142 @@
+from collections import namedtuple
+from tkinter import TclError
+
+# -----------------------------------
+# Edit-delta events from a Text widget
+# -----------------------------------
+# The widget's Tcl command is renamed and replaced by a Python dispatcher, so
+# every insert/delete/replace is seen: typing, paste, cut, undo/redo, drag and
+# drop and programmatic edits alike. `start` is the "line.col" index where the
+# edit happened, valid in the buffer as it was just before that edit.
+EditEvent = namedtuple('EditEvent', 'start removed inserted version')
+
+# Called as callback(widget, event) for edits in every proxied widget, so a
+# session recorder can watch all tabs without knowing how each app made them
+_observers = []
+
+
+def observe_all(callback):
+    _observers.append(callback)
+    return callback
+
+
+def unobserve_all(callback):
+    if callback in _observers:
+        _observers.remove(callback)
+
+
+def _key(index):
+    line, col = index.split('.')
+    return int(line), int(col)
+
+
+class TextEditProxy:
+    def __init__(self, text_widget):
+        self.widget = text_widget
+        self.subscribers = []
+        self.version = 0
+        self.stats = {'full_reads': 0, 'events': 0}
+        self.path = text_widget._w
+        self.command = self.path + '_widget'
+        text_widget.tk.call('rename', self.path, self.command)
+        text_widget.tk.createcommand(self.path, self.dispatch)
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def close(self):
+        # Once the widget is destroyed its renamed command goes with it; the
+        # dispatcher at the original path would otherwise linger
+        self.subscribers.clear()
+        try:
+            self.widget.tk.deletecommand(self.path)
+        except TclError:
+            pass
+
+    def _emit(self, start, removed, inserted):
+        self.version += 1
+        self.stats['events'] += 1
+        event = EditEvent(start, removed, inserted, self.version)
+        for callback in list(self.subscribers):
+            callback(event)
+        for callback in list(_observers):
+            callback(self.widget, event)
+
+    def dispatch(self, *args):
+        call = self.widget.tk.call
+        command = self.command
+        op = args[0] if args else ''
+        if op not in ('insert', 'delete', 'replace') or str(call(command, 'cget', '-state')) != 'normal':
+            if op == 'get' and args[1:2] == ('1.0',) and len(args) == 3 and str(args[2]).startswith('end'):
+                self.stats['full_reads'] += 1
+            return call((command,) + args)
+
+        def index(value):
+            return str(call(command, 'index', value))
+
+        if op == 'insert':
+            start = index(args[1])
+            # Tk never inserts after the final newline
+            if call(command, 'compare', start, '==', 'end'):
+                start = index('end-1c')
+            result = call((command,) + args)
+            inserted = ''.join(str(chunk) for chunk in args[2::2])
+            if inserted:
+                self._emit(start, '', inserted)
+            return result
+
+        if op == 'delete':
+            ends = list(args[1:])
+            if len(ends) % 2:
+                ends.append(f"{ends[-1]}+1c")
+            spans = []
+            for i in range(0, len(ends), 2):
+                start, end = index(ends[i]), index(ends[i + 1])
+                if call(command, 'compare', end, '==', 'end'):
+                    end = index('end-1c')
+                if _key(start) < _key(end):
+                    spans.append((_key(start), start, _key(end), end))
+            # Tk merges overlapping ranges, so the events must too
+            merged = []
+            for start_key, start, end_key, end in sorted(spans):
+                if merged and start_key <= merged[-1][2]:
+                    if end_key > merged[-1][2]:
+                        merged[-1] = (merged[-1][0], merged[-1][1], end_key, end)
+                else:
+                    merged.append((start_key, start, end_key, end))
+            removed = [(start, str(call(command, 'get', start, end))) for _, start, _, end in merged]
+            result = call((command,) + args)
+            # Bottom-up, so each start index is still valid when its event fires
+            for start, text in reversed(removed):
+                self._emit(start, text, '')
+            return result
+
+        # replace index1 index2 chars ?tagList chars tagList ...?
+        start, end = index(args[1]), index(args[2])
+        if call(command, 'compare', end, '==', 'end'):
+            end = index('end-1c')
+        removed = str(call(command, 'get', start, end)) if call(command, 'compare', start, '<', end) else ''
+        result = call((command,) + args)
+        inserted = ''.join(str(chunk) for chunk in args[3::2])
+        if removed or inserted:
+            self._emit(start, removed, inserted)
+        return result
+
+
+def coalesce(widget, callback):
+    # Subscriber that runs callback once, at idle time, per burst of edits
+    pending = []
+
+    def run():
+        pending.clear()
+        callback()
+
+    def subscriber(event):
+        if not pending:
+            pending.append(widget.after_idle(run))
+    return subscriber
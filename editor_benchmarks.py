@@ -0,0 +1,517 @@
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+from benchmark import summarize
+from headless import FakeText, load_script_definitions
+
+# ----------------------------------------------------
+# Headless benchmarks for the editors' hot paths
+# ----------------------------------------------------
+# Lexing, highlighting, completion, find/replace and the syntax checkers run
+# against generated C, C++, Python, Java and HTML sources of 100 to 100k
+# lines. Widget code runs on FakeText by default, or on a real Tk Text when a
+# display is available (e.g. under `xvfb-run`). Results are written as JSON;
+# pass --baseline to compare against a stored run and exit non-zero when any
+# benchmark got slower than the threshold allows.
+#
+#   python editor_benchmarks.py --out results.json
+#   python editor_benchmarks.py --sizes 100,1000 --only highlight --baseline results.json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25   # 25% slower than the baseline median is a regression
+LANGUAGES = ['C', 'C++', 'Python', 'Java', 'HTML']
+FILE_NAMES = {'C': 'corpus.c', 'C++': 'corpus.cpp', 'Python': 'corpus.py', 'Java': 'Corpus.java',
+              'HTML': 'corpus.html'}
+
+# ---------------
+# Corpora
+# ---------------
+_C_HEADER = "#include <stdio.h>\n#include <string.h>\n\n"
+_C_BLOCK = """/* Block {n}: accumulate and report */
+static int table_{n}[] = {{1, 2, 3, {n}}};
+
+int function_{n}(int count, const char *name) {{
+    // running checksum over the table
+    int total = 0;
+    for (int i = 0; i < count; i++) {{
+        if (i % 3 == 0) {{
+            total += table_{n}[i % 4] * 2;
+        }} else {{
+            printf("%s: %d\\n", name, i);
+        }}
+    }}
+    return total + (int)strlen(name);
+}}
+
+"""
+_CPP_HEADER = "#include <string>\n#include <vector>\n\n"
+_CPP_BLOCK = """// Block {n}
+template <typename T>
+class Holder{n} {{
+public:
+    explicit Holder{n}(T value) : value_(value) {{}}
+    T get() const {{ return value_; }}
+    std::string describe() const {{
+        return R"(holder "{n}" with a (raw) string)" + std::to_string(1'000 + {n});
+    }}
+private:
+    T value_;
+}};
+
+int use{n}(const std::vector<int> &items) {{
+    int sum = 0;
+    for (int item : items) {{ sum += Holder{n}<int>(item).get(); }}
+    return sum;
+}}
+
+"""
+_PY_HEADER = "import os\nimport re\n\n\n"
+_PY_BLOCK = """def function_{n}(items, name='block {n}'):
+    # running checksum over the items
+    total = 0
+    for index, item in enumerate(items):
+        if index % 3 == 0:
+            total += item * 2
+        elif re.match(r'\\d+', str(item)):
+            total -= 1
+        else:
+            print(f"{{name}}: {{index}}")
+    return total + len(os.sep)
+
+
+class Holder{n}:
+    \"\"\"Wraps one value.\"\"\"
+
+    def __init__(self, value):
+        self.value = value
+
+    def describe(self):
+        return 'holder %d' % self.value
+
+
+"""
+_JAVA_HEADER = "import java.util.List;\n\npublic class Corpus {\n"
+_JAVA_BLOCK = """    // Block {n}
+    static int function{n}(List<Integer> items, String name) {{
+        int total = 0;
+        for (int i = 0; i < items.size(); i++) {{
+            if (i % 3 == 0) {{
+                total += items.get(i) * 2;
+            }} else {{
+                System.out.println(name + ": " + i + " \\"{n}\\"");
+            }}
+        }}
+        return total;
+    }}
+
+"""
+_JAVA_FOOTER = "}\n"
+_HTML_HEADER = "<!DOCTYPE html>\n<html>\n<head>\n<title>Corpus</title>\n</head>\n<body>\n"
+_HTML_BLOCK = """<div class="block" id="block-{n}">
+  <h2>Block {n}</h2>
+  <p>Some <b>bold</b> and <a href="#block-{n}">linked</a> text.
+  <ul>
+    <li>First item
+    <li>Second item
+  </ul>
+  <table>
+    <tr><td>{n}</td><td>value</td></tr>
+  </table>
+  <!-- end of block {n} -->
+</div>
+"""
+_HTML_FOOTER = "</body>\n</html>\n"
+
+CORPUS_TEMPLATES = {
+    'C': (_C_HEADER, _C_BLOCK, ''),
+    'C++': (_CPP_HEADER, _CPP_BLOCK, ''),
+    'Python': (_PY_HEADER, _PY_BLOCK, ''),
+    'Java': (_JAVA_HEADER, _JAVA_BLOCK, _JAVA_FOOTER),
+    'HTML': (_HTML_HEADER, _HTML_BLOCK, _HTML_FOOTER),
+}
+
+
+def generate_corpus(lang, lines):
+    # Whole blocks only, so every corpus is valid source of roughly `lines` lines
+    header, block, footer = CORPUS_TEMPLATES[lang]
+    per_block = block.count('\n')
+    blocks = max(1, (lines - header.count('\n') - footer.count('\n')) // per_block)
+    return header + ''.join(block.format(n=n) for n in range(blocks)) + footer
+
+
+def sample_edit(code, seed=0):
+    # A one-character insertion in the middle of the buffer, as a keystroke would make
+    middle = code.find('\n', len(code) // 2) + 1
+    return code[:middle] + random.Random(seed).choice('xyz') + code[middle:]
+
+
+# ---------------
+# Widgets
+# ---------------
+def make_widget_factory(kind):
+    # Returns (name, factory(content) -> Text-like widget)
+    if kind in ('auto', 'tk'):
+        try:
+            import tkinter
+            root = tkinter.Tk()
+            root.withdraw()
+        except Exception:
+            if kind == 'tk':
+                raise
+        else:
+            def real(content=''):
+                for child in root.winfo_children():
+                    child.destroy()
+                widget = tkinter.Text(root)
+                widget.insert('1.0', content)
+                return widget
+            return 'tk', real
+    return 'fake', FakeText
+
+
+# ---------------
+# Benchmarks
+# ---------------
+# Each benchmark is (name, languages, max_lines, setup). setup(code, lang,
+# make_widget) runs untimed before every repeat and returns the callable
+# that is timed, plus the widget whose calls are counted (or None).
+BENCHMARKS = []
+
+
+def benchmark(name, languages, max_lines=None):
+    def register(setup):
+        BENCHMARKS.append((name, languages, max_lines, setup))
+        return setup
+    return register
+
+
+def _scripts():
+    # Definitions from the GUI scripts, which can't be imported without opening a window
+    cache = _scripts.__dict__.setdefault('cache', {})
+    if not cache:
+        cache['main'] = load_script_definitions(os.path.join(HERE, 'main.py'), ['highlight_code', 'get_tkinter_index'])
+        cache['newMain'] = load_script_definitions(
+            os.path.join(HERE, 'newMain.py'), ['highlight_job', 'tag_tokens', 'get_tkinter_index', 'autocomplete_kmp',
+                                               'kmp_prefix_match', 'compute_lps'])
+        # The first CodeEditorTab in full_compiler, which highlight_syntax and simple_tokenize belong to
+        cache['legacy_tab'] = load_script_definitions(os.path.join(HERE, 'full_compiler.py'), ['CodeEditorTab'])
+    return cache
+
+
+def _drain(job):
+    for _ in job:
+        pass
+
+
+@benchmark('lex/tokenize', ['C', 'C++', 'Python', 'Java'])
+def _bench_tokenize(code, lang, make_widget):
+    from lexer import tokenize
+    return lambda: sum(1 for _ in tokenize(code, lang)), None
+
+
+@benchmark('lex/structural', ['C', 'C++', 'Python', 'Java'])
+def _bench_structural(code, lang, make_widget):
+    from lexer import tokenize
+    return lambda: sum(1 for _ in tokenize(code, lang, structural=True)), None
+
+
+@benchmark('lex/TokenStore.build', ['C', 'C++', 'Python', 'Java'])
+def _bench_token_store_build(code, lang, make_widget):
+    # Time to the full token set on open, in this process only
+    from token_store import TokenStore
+    return lambda: TokenStore(lang, workers=1).update(code), None
+
+
+@benchmark('lex/TokenStore.build.parallel', ['C', 'C++', 'Python', 'Java'])
+def _bench_token_store_build_parallel(code, lang, make_widget):
+    # The same with the process pool, which only kicks in for huge buffers on
+    # machines with more than one core
+    from token_store import TokenStore
+    return lambda: TokenStore(lang).update(code), None
+
+
+@benchmark('lex/TokenStore.keystroke', ['C', 'C++', 'Python', 'Java'])
+def _bench_token_store_keystroke(code, lang, make_widget):
+    # Typing one character in the middle of the file, then catching the store up
+    from token_store import store_for
+    tokens = store_for(lang)
+    tokens.update(code)
+    middle = len(code) // 2
+    edited = code[:middle] + 'x' + code[middle:]
+
+    def run():
+        tokens.note_edit(middle, 0, 1)
+        tokens.update(edited)
+        tokens.note_edit(middle, 1, 0)
+        tokens.update(code)
+    return run, None
+
+
+@benchmark('highlight/main.highlight_code', ['C'], max_lines=10000)
+def _bench_main_highlight(code, lang, make_widget):
+    highlight_code = _scripts()['main']['highlight_code']
+    widget = make_widget(code)
+    return lambda: highlight_code(widget, code), widget
+
+
+@benchmark('highlight/newMain.highlight_code', ['C'], max_lines=10000)
+def _bench_newmain_highlight(code, lang, make_widget):
+    from token_store import store_for
+    highlight_job = _scripts()['newMain']['highlight_job']
+    widget = make_widget(code)
+
+    def run():
+        tokens = store_for(lang)
+        tokens.update(code)
+        _drain(highlight_job(widget, code, tokens))
+    return run, widget
+
+
+@benchmark('highlight/multiSyn.highlight_code', LANGUAGES, max_lines=10000)
+def _bench_multisyn_highlight(code, lang, make_widget):
+    from document import Document
+    from multiSyn import SyntaxChecker
+    checker = SyntaxChecker.__new__(SyntaxChecker)
+    checker.text_area = make_widget(code)
+    checker.language = types.SimpleNamespace(get=lambda: lang)
+    checker.elide_long_lines = types.SimpleNamespace(get=lambda: True)
+    checker.document = Document(code)
+
+    def run():
+        checker.tokens = None   # time the full lex, not just the tagging
+        _drain(checker.highlight_job(code))
+    return run, checker.text_area
+
+
+@benchmark('highlight/CodeEditorTab.highlight_syntax', ['C', 'Python'], max_lines=10000)
+def _bench_legacy_highlight(code, lang, make_widget):
+    tab_class = _scripts()['legacy_tab']['CodeEditorTab']
+    tab = tab_class.__new__(tab_class)
+    tab.text, tab.language, tab.error_lines = make_widget(code), lang, set()
+    return tab.highlight_syntax, tab.text
+
+
+@benchmark('highlight/CodeEditorTab.highlight_job', ['C', 'Python'], max_lines=10000)
+def _bench_tab_highlight(code, lang, make_widget):
+    from document import Document
+    from full_compiler import CodeEditorTab
+    tab = CodeEditorTab.__new__(CodeEditorTab)
+    tab.text, tab.language, tab.document = make_widget(code), lang, Document(code)
+    tab.hibernated = None
+
+    def run():
+        tab.tokens = None   # time the full lex, not just the tagging
+        _drain(tab.highlight_job())
+    return run, tab.text
+
+
+@benchmark('tokenize/simple_tokenize', ['C', 'Python'])
+def _bench_simple_tokenize(code, lang, make_widget):
+    tab_class = _scripts()['legacy_tab']['CodeEditorTab']
+    tokenize = tab_class.simple_tokenize
+    lines = code.split('\n')
+    return lambda: [tokenize(None, line) for line in lines], None
+
+
+@benchmark('complete/autocomplete_kmp', LANGUAGES)
+def _bench_autocomplete(code, lang, make_widget):
+    defs = _scripts()['newMain']
+    words = sorted(set(re.findall(r'[A-Za-z_]\w*', code)) | set(defs['C_KEYWORDS']))
+    prefixes = [word[:2] for word in random.Random(0).sample(words, min(200, len(words)))]
+    return lambda: [defs['autocomplete_kmp'](prefix, words) for prefix in prefixes], None
+
+
+@benchmark('replace/FindReplaceDialog.replace_all', LANGUAGES, max_lines=10000)
+def _bench_replace_all(code, lang, make_widget):
+    import full_compiler
+    from search_engine import compile_query
+    widget = make_widget(code)
+    dialog = types.SimpleNamespace(
+        text_widget=widget,
+        build_pattern=lambda: compile_query('block'),   # in every corpus, as "Block" or "block"
+        replace_entry=types.SimpleNamespace(get=lambda: 'section'),
+        use_regex=types.SimpleNamespace(get=lambda: False),
+        invalidate=lambda: None, clear_highlights=lambda: None,
+    )
+    quiet = types.SimpleNamespace(showinfo=lambda *a, **k: None, showerror=lambda *a, **k: None)
+
+    def run():
+        saved, full_compiler.messagebox = full_compiler.messagebox, quiet
+        try:
+            full_compiler.FindReplaceDialog.replace_all(dialog)
+        finally:
+            full_compiler.messagebox = saved
+    return run, widget
+
+
+@benchmark('check/check_structure', ['C', 'C++', 'Python', 'Java'])
+def _bench_structure(code, lang, make_widget):
+    from structure_check import check_structure
+    return lambda: check_structure(code, lang), None
+
+
+@benchmark('check/check_html', ['HTML'])
+def _bench_html(code, lang, make_widget):
+    from html_check import check_html
+    return lambda: check_html(code), None
+
+
+@benchmark('check/HTMLChecker.keystroke', ['HTML'])
+def _bench_html_keystroke(code, lang, make_widget):
+    from html_check import HTMLChecker
+    checker = HTMLChecker()
+    checker.check(code)
+    edited = sample_edit(code)
+    return lambda: checker.check(edited), None
+
+
+@benchmark('check/PythonAnalyzer.analyze', ['Python'])
+def _bench_analyzer(code, lang, make_widget):
+    from py_analysis import PythonAnalyzer
+    return lambda: PythonAnalyzer().analyze(code), None
+
+
+@benchmark('check/PythonAnalyzer.keystroke', ['Python'])
+def _bench_analyzer_keystroke(code, lang, make_widget):
+    from py_analysis import PythonAnalyzer
+    analyzer = PythonAnalyzer()
+    analyzer.analyze(code)
+    edited = sample_edit(code)
+    return lambda: analyzer.analyze(edited), None
+
+
+_COMPILER_TOOLS = {'C': 'gcc', 'C++': 'g++', 'Python': 'python', 'Java': 'javac', 'HTML': None}
+
+
+@benchmark('check/SYNTAX_COMMANDS', LANGUAGES, max_lines=10000)
+def _bench_compiler(code, lang, make_widget):
+    from multiSyn import SYNTAX_COMMANDS
+    tool = _COMPILER_TOOLS[lang]
+    if tool and not shutil.which(tool):
+        return None, None
+    path = os.path.join(_work_dir(), FILE_NAMES[lang])
+    with open(path, 'w') as f:
+        f.write(code)
+    return lambda: SYNTAX_COMMANDS[lang](path), None
+
+
+def _work_dir():
+    # Scratch directory for compiler inputs, removed when the process exits
+    if not _work_dir.__dict__.get('path'):
+        _work_dir.path = tempfile.mkdtemp(prefix='editor-bench-')
+        atexit.register(shutil.rmtree, _work_dir.path, True)
+    return _work_dir.path
+
+
+# ---------------
+# Runner
+# ---------------
+def run_suite(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, only=None, widget='auto', log=print):
+    widget_kind, make_widget = make_widget_factory(widget)
+    results = {}
+    corpora = {}
+    for name, languages, max_lines, setup in BENCHMARKS:
+        if only and not re.search(only, name):
+            continue
+        for lang in languages:
+            for lines in sizes:
+                if max_lines and lines > max_lines:
+                    continue
+                key = f"{name}/{lang}/{lines}"
+                code = corpora.get((lang, lines)) or corpora.setdefault((lang, lines), generate_corpus(lang, lines))
+                times, calls = [], None
+                for _ in range(repeat):
+                    run, widget_obj = setup(code, lang, make_widget)
+                    if run is None:
+                        break
+                    start = time.perf_counter()
+                    run()
+                    times.append((time.perf_counter() - start) * 1000.0)
+                    if isinstance(widget_obj, FakeText):
+                        calls = sum(widget_obj.calls.values())
+                if not times:
+                    log(f"{key:<60} skipped")
+                    continue
+                stats = summarize(times)
+                results[key] = {'median_ms': stats['median'], 'min_ms': stats['min'],
+                                'p95_ms': stats['p95'], 'runs': len(times)}
+                if calls is not None:
+                    results[key]['widget_calls'] = calls
+                log(f"{key:<60}{stats['median']:>12.2f} ms")
+    meta = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'widget': widget_kind,
+        'sizes': list(sizes),
+        'repeat': repeat,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    return {'meta': meta, 'results': results}
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    # Returns [(key, baseline ms, current ms, ratio, regressed)] for benchmarks in both runs
+    rows = []
+    for key, result in sorted(current['results'].items()):
+        before = baseline['results'].get(key)
+        if not before or not before['median_ms']:
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        # More widget round trips is a regression even when the clock doesn't show it
+        calls_grew = 'widget_calls' in before and result.get('widget_calls', 0) > before['widget_calls']
+        rows.append((key, before['median_ms'], result['median_ms'], ratio, ratio > 1 + threshold or calls_grew))
+    return rows
+
+
+def format_comparison(rows):
+    lines = [f"{'Benchmark':<60}{'Base (ms)':>12}{'Now (ms)':>12}{'Now/Base':>10}"]
+    for key, before, after, ratio, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        lines.append(f"{key:<60}{before:>12.2f}{after:>12.2f}{ratio:>9.2f}x{flag}")
+    regressions = sum(1 for row in rows if row[4])
+    lines.append(f"{regressions} regression(s) in {len(rows)} compared benchmark(s).")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless editor benchmarks")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated corpus sizes in lines")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--only', help="regex on benchmark names")
+    parser.add_argument('--widget', choices=['auto', 'fake', 'tk'], default='auto',
+                        help="Text widget to drive: a real Tk needs a display (e.g. xvfb-run)")
+    parser.add_argument('--out', help="write results JSON here")
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of the median before a benchmark counts as regressed")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    current = run_suite(sizes, args.repeat, args.only, args.widget)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(current, json.load(f), args.threshold)
+        print(format_comparison(rows), end='')
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
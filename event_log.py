@@ -0,0 +1,298 @@
+import argparse
+import atexit
+import glob
+import json
+import os
+import platform
+import queue
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from latency import percentile
+
+# ---------------------------------------
+# Structured log of checks, builds, runs
+# ---------------------------------------
+# Every compiler check, build (with its up-to-date cache hit or miss), program
+# run and auto-save appends one JSON line: op, language, source size, duration,
+# exit code, cache result and, where work waits for the Tk thread or an edit
+# burst, the queue wait. Callers only put records on a queue; a daemon thread
+# writes them in batches (at most every FLUSH_INTERVAL seconds) and rotates
+# the file RotatingFileHandler-style at MAX_BYTES, keeping BACKUP_COUNT old
+# ones. A full queue or a failing disk drops records instead of stalling the
+# editor. Logs from many machines can be pooled and summarised with
+#
+#   python event_log.py analyze ~/editor-logs other-host/events.jsonl*
+#
+# Nothing is logged until an editor calls enable_logging() at startup, so
+# importing this module, building from a script or benchmarking writes no files.
+# EDITOR_EVENT_LOG overrides the file path; set it to "off" to keep logging off.
+
+LOG_DIR = os.path.join(os.path.expanduser('~'), 'editor-logs')
+LOG_FILE = 'events.jsonl'
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 5
+FLUSH_INTERVAL = 1.0    # seconds
+MAX_QUEUE = 10000
+
+_STOP = object()
+
+
+class EventLog:
+    def __init__(self, path, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(MAX_QUEUE)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.common = {'host': platform.node(), 'pid': os.getpid(),
+                       'app': os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]}
+        self.stats = {'written': 0, 'dropped': 0, 'rotations': 0, 'batches': 0}
+
+    def write(self, op, **fields):
+        record = {'ts': round(time.time(), 3), 'op': op}
+        record.update(self.common)
+        record.update(fields)
+        if self.thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='event-log', daemon=True)
+                self.thread.start()
+
+    def close(self, timeout=2.0):
+        # Flushes what is queued; called at exit
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not _STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            records = [record for record in batch if record is not _STOP]
+            if records:
+                self._write_batch(records)
+            if stop:
+                return
+
+    def _write_batch(self, records):
+        data = ''.join(json.dumps(record, separators=(',', ':'), default=str) + "\n" for record in records)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if size and size + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(data)
+        except OSError:
+            self.stats['dropped'] += len(records)
+            return
+        self.stats['written'] += len(records)
+        self.stats['batches'] += 1
+
+    def _rotate(self):
+        # events.jsonl -> events.jsonl.1 -> ... -> events.jsonl.<backup_count>
+        for index in range(self.backup_count - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.stats['rotations'] += 1
+
+
+class _DisabledLog:
+    def write(self, op, **fields):
+        pass
+
+    def close(self, timeout=None):
+        pass
+
+
+@contextmanager
+def operation(op, queued_at=None, **fields):
+    # Times the block and logs it with whatever the block adds to the record
+    # (exit_code, cache, ...); queued_at is the perf_counter() time the work
+    # was requested
+    record = dict(fields)
+    start = time.perf_counter()
+    if queued_at is not None:
+        record['queue_wait_ms'] = round((start - queued_at) * 1000, 3)
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        event_log.write(op, **record)
+
+
+def source_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def log_event(op, **fields):
+    # For callers that time their own work, like build_profiles' listener
+    event_log.write(op, **fields)
+
+
+def enable_logging(path=None):
+    # Starts logging for the rest of the process; the editors call this once
+    global event_log
+    if isinstance(event_log, EventLog):
+        return event_log
+    path = path or os.environ.get('EDITOR_EVENT_LOG', os.path.join(LOG_DIR, LOG_FILE))
+    if path.lower() in ('off', '0', 'none', ''):
+        return event_log
+    event_log = EventLog(path)
+    atexit.register(event_log.close)
+    return event_log
+
+
+# Shared by every window and worker thread in the process
+event_log = _DisabledLog()
+
+
+# ---------------
+# Offline analysis
+# ---------------
+
+def log_files(paths):
+    # Directories contribute their events.jsonl and its rotated backups; paths
+    # and globs that match nothing are skipped with a warning
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(path, LOG_FILE + '*')))
+        else:
+            # A file whose name has glob characters in it matches only itself
+            matches = sorted(glob.glob(path)) or ([path] if os.path.isfile(path) else [])
+        if not matches:
+            print(f"warning: no log files match {path}", file=sys.stderr)
+        files.extend(matches)
+    return files
+
+
+def read_records(files):
+    for filename in files:
+        try:
+            f = open(filename, 'r', encoding='utf-8', errors='replace')
+        except OSError as e:
+            # e.g. rotated away since it was listed
+            print(f"warning: skipping {filename}: {e.strerror}", file=sys.stderr)
+            continue
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+
+
+def analyze(records):
+    # {(lang, op): stats}; durations and waits in ms
+    groups = defaultdict(lambda: {'durations': [], 'waits': [], 'hits': 0, 'misses': 0, 'failures': 0,
+                                  'bytes': 0, 'hosts': set()})
+    for record in records:
+        group = groups[(record.get('lang') or '-', record.get('op', '?'))]
+        if record.get('duration_ms') is not None:
+            group['durations'].append(record['duration_ms'])
+        if record.get('queue_wait_ms') is not None:
+            group['waits'].append(record['queue_wait_ms'])
+        if record.get('cache') == 'hit':
+            group['hits'] += 1
+        elif record.get('cache') == 'miss':
+            group['misses'] += 1
+        if record.get('exit_code') not in (None, 0) or record.get('error'):
+            group['failures'] += 1
+        group['bytes'] += record.get('bytes') or 0
+        group['hosts'].add(record.get('host'))
+
+    result = {}
+    for key, group in sorted(groups.items()):
+        durations, waits = sorted(group['durations']), sorted(group['waits'])
+        lookups = group['hits'] + group['misses']
+        count = len(durations)
+        result[key] = {
+            'count': count,
+            'hosts': len(group['hosts']),
+            'p50': percentile(durations, 0.5), 'p90': percentile(durations, 0.9),
+            'p95': percentile(durations, 0.95), 'p99': percentile(durations, 0.99),
+            'max': durations[-1] if durations else None,
+            'wait_p95': percentile(waits, 0.95),
+            'cache_hit_rate': group['hits'] / lookups if lookups else None,
+            'failure_rate': group['failures'] / count if count else None,
+            'mean_bytes': group['bytes'] / count if count else None,
+        }
+    return result
+
+
+def format_analysis(result):
+    def ms(value):
+        return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+    def rate(value):
+        return f"{value * 100:>7.1f}%" if value is not None else f"{'-':>8}"
+
+    lines = [f"{'Language':<10}{'Op':<10}{'Count':>7}{'Hosts':>6}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}"
+             f"{'Max':>9}{'Wait p95':>9}{'Cache':>8}{'Failed':>8}   (ms)"]
+    for (lang, op), s in result.items():
+        lines.append(f"{lang:<10}{op:<10}{s['count']:>7}{s['hosts']:>6}{ms(s['p50'])}{ms(s['p90'])}"
+                     f"{ms(s['p95'])}{ms(s['p99'])}{ms(s['max'])}{ms(s['wait_p95'])}"
+                     f"{rate(s['cache_hit_rate'])}{rate(s['failure_rate'])}")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Editor event log tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    analyze_cmd = commands.add_parser('analyze', help="latency percentiles and cache-hit rates per language and op")
+    analyze_cmd.add_argument('paths', nargs='*', default=[LOG_DIR],
+                             help="log files, globs or directories (default: %(default)s)")
+    analyze_cmd.add_argument('--since', type=float, help="only records from the last N hours")
+    analyze_cmd.add_argument('--json', action='store_true', help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    records = read_records(log_files(args.paths))
+    if args.since is not None:
+        cutoff = time.time() - args.since * 3600
+        records = (record for record in records if record.get('ts', 0) >= cutoff)
+    result = analyze(records)
+    if args.json:
+        print(json.dumps({f"{lang}/{op}": stats for (lang, op), stats in result.items()}, indent=2))
+    else:
+        print(format_analysis(result), end='')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,6 +4,36 @@ import subprocess
 import os
 import threading
 import time
+import bisect
+import hashlib
+import json
+import math
+import queue
+import re
+import zlib
+from collections import namedtuple
+
+from build_profiles import (BUILD_PROFILES, DEFAULT_PROFILE, DEBUG_PROFILE, build, compile_command,
+                            prepare_run_command, set_build_listener)
+from benchmark import run_benchmark, format_report, format_comparison
+from case_runner import discover_cases, run_cases
+from profilers import run_gprof, run_gcov, find_function_lines
+from gdb_mi import GdbController
+from search_engine import compile_query, find_all, replace_all, LineIndex
+from workspace_search import WorkspaceSearch
+from document import Document
+from edit_events import TextEditProxy, coalesce
+from undo_history import UndoHistory, history_for
+from large_file import ProgressiveLoader, format_progress
+from long_lines import (TOKENIZE_WINDOW, ELIDED_TAG, find_long_lines, mark_long_lines,
+                        mark_line_if_long)
+from token_store import store_for
+from lexer import (KEYWORD, COMMENT, UNTERMINATED_COMMENT, STRING, CHAR, UNTERMINATED_STRING,
+                   UNTERMINATED_CHAR, supported)
+from ui_scheduler import scheduler_for, ConsoleWriter
+from latency import tracker, LatencyHUD
+from diagnostics import capture
+from event_log import operation, source_size, enable_logging, log_event
 
 # --------------------
 # Keywords by language
@@ -33,12 +63,25 @@ SYNTAX_COLORS = {
     'error': '#FF0000',         # Red underline
 }
 
+# Line heatmap backgrounds, coldest to hottest
+HEATMAP_COLORS = ['#FFF9C4', '#FFE082', '#FFCA28', '#FFA726', '#FF7043', '#E53935']
+
+# Token kinds the editor tab colors, and their tags
+HIGHLIGHT_TAGS = {
+    KEYWORD: 'keyword',
+    COMMENT: 'comment', UNTERMINATED_COMMENT: 'comment',
+    STRING: 'string', CHAR: 'string', UNTERMINATED_STRING: 'string', UNTERMINATED_CHAR: 'string',
+}
+HIGHLIGHT_COLORS = {'keyword': 'blue', 'comment': 'green', 'string': 'orange'}
+TAG_BATCH = 256          # ranges handed to one tag_add call
+MAX_SUGGESTIONS = 50
+
 # Supported languages for simplicity
 LANGUAGES = {
     'C': {
         'keywords': C_KEYWORDS,
         'filetypes': [('C Files', '*.c')],
-        'compile_cmd': lambda src, exe: ['gcc', src, '-o', exe],
+        'compile_cmd': lambda src, exe, profile=DEFAULT_PROFILE: compile_command('C', src, exe, profile),
         'run_cmd': lambda exe: [exe],
         'extension': '.c',
     },
@@ -52,6 +95,18 @@ LANGUAGES = {
 }
 
 AUTO_SAVE_INTERVAL = 60  # seconds
+GUTTER_CHUNK = 2000       # line numbers inserted per scheduler step
+
+# Tabs left in the background this long give up their widgets (0 disables)
+HIBERNATE_AFTER = 15 * 60     # seconds
+HIBERNATE_CHECK_MS = 30000
+HIBERNATE_COMPRESSION = 1     # zlib level: fast, and code still shrinks 3-5x
+# Rough per-item costs behind CodeEditorTab.memory_estimate
+TK_LINE_BYTES = 64            # Tk's B-tree line and segment headers
+TK_TAG_RANGE_BYTES = 80       # a pair of tag toggle segments
+HIBERNATED_TAB_BYTES = 512    # the tab object and its frame
+
+HibernatedTab = namedtuple('HibernatedTab', 'blob lines chars highlighted')
 
 class CodeEditorTab:
     def __init__(self, parent, language='C', filename=None, content=''):
@@ -378,6 +433,18 @@ class FindReplaceDialog(tk.Toplevel):
         self.text_widget.delete('1.0', 'end')
         self.text_widget.insert('1.0', new_content)
 
+def sort_treeview(tree, column, numeric, reverse):
+    def key(iid):
+        value = tree.item(iid, 'text') if column == '#0' else tree.set(iid, column)
+        if not numeric:
+            return value
+        try:
+            return float(value.rstrip('%'))
+        except ValueError:
+            return 0.0
+    for index, iid in enumerate(sorted(tree.get_children(''), key=key, reverse=reverse)):
+        tree.move(iid, '', index)
+
 class ConsoleWindow(tk.Toplevel):
     def __init__(self, parent):
         super().__init__(parent)
@@ -385,17 +452,498 @@ class ConsoleWindow(tk.Toplevel):
         self.geometry("700x400")
         self.text = tk.Text(self, bg='black', fg='white', state='disabled')
         self.text.pack(fill='both', expand=True)
+        # Large program output is inserted a chunk per slice instead of in one burst
+        self.writer = ConsoleWriter(self.text)
 
     def write(self, message):
-        self.text.config(state='normal')
-        self.text.insert('end', message)
-        self.text.see('end')
-        self.text.config(state='disabled')
+        self.writer.write(message)
 
     def clear(self):
-        self.text.config(state='normal')
-        self.text.delete('1.0', 'end')
-        self.text.config(state='disabled')
+        self.writer.clear()
+
+class TestResultsWindow(tk.Toplevel):
+    STATUS_COLORS = {'PASS': '#2E7D32', 'DONE': '#2E7D32', 'FAIL': '#C62828', 'RE': '#C62828',
+                     'TLE': '#EF6C00', 'ERROR': '#C62828'}
+
+    def __init__(self, parent, title, results):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("600x450")
+        self.results = {r['name']: r for r in results}
+
+        passed = sum(1 for r in results if r['status'] in ('PASS', 'DONE'))
+        tk.Label(self, text=f"{passed}/{len(results)} cases passed").pack(anchor='w', padx=4, pady=4)
+
+        columns = ('status', 'time')
+        self.tree = ttk.Treeview(self, columns=columns, height=12)
+        self.tree.heading('#0', text="Case", command=lambda: self.sort_by('#0', False))
+        self.tree.heading('status', text="Status", command=lambda: self.sort_by('status', False))
+        self.tree.heading('time', text="Time (ms)", command=lambda: self.sort_by('time', True))
+        self.tree.column('time', anchor='e')
+        self.tree.pack(fill='both', expand=True)
+        for status, color in self.STATUS_COLORS.items():
+            self.tree.tag_configure(status, foreground=color)
+
+        # Slowest cases first
+        for r in sorted(results, key=lambda r: r['time'], reverse=True):
+            self.tree.insert('', 'end', iid=r['name'], text=r['name'],
+                             values=(r['status'], f"{r['time'] * 1000:.1f}"), tags=(r['status'],))
+        self.tree.bind('<<TreeviewSelect>>', self.show_detail)
+
+        self.detail = tk.Text(self, height=8, bg='black', fg='white', state='disabled')
+        self.detail.pack(fill='x')
+
+    def sort_by(self, column, numeric):
+        sort_treeview(self.tree, column, numeric, reverse=numeric)
+
+    def show_detail(self, event=None):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        self.detail.config(state='normal')
+        self.detail.delete('1.0', 'end')
+        self.detail.insert('1.0', self.results[selection[0]]['detail'])
+        self.detail.config(state='disabled')
+
+class ProfileWindow(tk.Toplevel):
+    FLAT_COLUMNS = [('percent', "% time", True), ('self', "Self (s)", True), ('cumulative', "Cumulative (s)", True),
+                    ('calls', "Calls", True), ('self_per_call', "Self/call", True), ('total_per_call', "Total/call", True)]
+    GRAPH_COLUMNS = [('percent', "% time", True), ('self', "Self (s)", True), ('children', "Children (s)", True),
+                     ('called', "Called", False), ('callers', "Callers", False), ('callees', "Callees", False)]
+
+    def __init__(self, parent, title, flat_rows, call_graph):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("760x420")
+        self.sort_state = {}
+
+        notebook = ttk.Notebook(self)
+        notebook.pack(fill='both', expand=True)
+
+        flat_tree = self.make_tree(notebook, "Function", self.FLAT_COLUMNS)
+        notebook.add(flat_tree.master, text="Flat profile")
+        for row in flat_rows:
+            values = [f"{row['percent']:.2f}", f"{row['self']:.2f}", f"{row['cumulative']:.2f}", row['calls'],
+                      f"{row['self_per_call']:.2f}", f"{row['total_per_call']:.2f}"]
+            flat_tree.insert('', 'end', text=row['name'], values=values)
+
+        graph_tree = self.make_tree(notebook, "Function", self.GRAPH_COLUMNS)
+        notebook.add(graph_tree.master, text="Call graph")
+        for entry in sorted(call_graph.values(), key=lambda e: e['percent'], reverse=True):
+            values = [f"{entry['percent']:.1f}", f"{entry['self']:.2f}", f"{entry['children']:.2f}", entry['called'],
+                      ", ".join(entry['callers']), ", ".join(entry['callees'])]
+            graph_tree.insert('', 'end', text=entry['name'], values=values)
+
+    def make_tree(self, notebook, first_title, columns):
+        frame = tk.Frame(notebook)
+        tree = ttk.Treeview(frame, columns=[c[0] for c in columns])
+        tree.heading('#0', text=first_title, command=lambda: self.sort_by(tree, '#0', False))
+        for column, title, numeric in columns:
+            tree.heading(column, text=title, command=lambda c=column, n=numeric: self.sort_by(tree, c, n))
+            tree.column(column, width=90, anchor='e' if numeric else 'w')
+        tree.pack(fill='both', expand=True)
+        return tree
+
+    def sort_by(self, tree, column, numeric):
+        # Clicking the same heading again flips the order
+        key = (str(tree), column)
+        reverse = not self.sort_state.get(key, not numeric)
+        self.sort_state[key] = reverse
+        sort_treeview(tree, column, numeric, reverse)
+
+class DebuggerWindow(tk.Toplevel):
+    POLL_INTERVAL = 20  # ms between draining gdb records
+
+    def __init__(self, parent, editor, exe_path):
+        super().__init__(parent)
+        self.title(f"Debugger - {os.path.basename(editor.filename)}")
+        self.geometry("700x500")
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.editor = editor
+        self.source = os.path.abspath(editor.filename)
+        self.breakpoint_numbers = {}  # editor line -> gdb breakpoint number
+        self.started = False
+
+        toolbar = tk.Frame(self, bd=1, relief=tk.RAISED)
+        toolbar.pack(side='top', fill='x')
+        for label, command in (("Run/Continue", self.run_or_continue), ("Step Over", lambda: self.gdb.next()),
+                               ("Step Into", lambda: self.gdb.step()), ("Step Out", lambda: self.gdb.finish()),
+                               ("Pause", lambda: self.gdb.interrupt()), ("Stop", self.close)):
+            tk.Button(toolbar, text=label, command=command).pack(side='left', padx=2, pady=2)
+
+        panes = ttk.PanedWindow(self, orient='vertical')
+        panes.pack(fill='both', expand=True)
+        views = ttk.PanedWindow(panes, orient='horizontal')
+        panes.add(views, weight=2)
+
+        self.stack_tree = ttk.Treeview(views, columns=('location',))
+        self.stack_tree.heading('#0', text="Frame")
+        self.stack_tree.heading('location', text="Location")
+        views.add(self.stack_tree, weight=1)
+
+        self.locals_tree = ttk.Treeview(views, columns=('type', 'value'))
+        self.locals_tree.heading('#0', text="Local")
+        self.locals_tree.heading('type', text="Type")
+        self.locals_tree.heading('value', text="Value")
+        views.add(self.locals_tree, weight=1)
+
+        self.output = tk.Text(self, height=10, bg='black', fg='white', state='disabled')
+        panes.add(self.output, weight=1)
+        # The program runs on its own terminal; a line typed here goes to its stdin
+        self.program_input = tk.Entry(self)
+        self.program_input.pack(side='bottom', fill='x', before=panes)
+        self.program_input.bind('<Return>', self.send_program_input)
+
+        self.gdb = GdbController(exe_path)
+        self.gdb.on('exec', self.on_exec)
+        self.gdb.on('console', self.on_stream)
+        self.gdb.on('target', self.on_stream)
+        self.gdb.on('program', self.on_stream)
+        self.gdb.on('result', self.on_result)
+        self.gdb.on('exit', lambda record: self.write("\n[gdb exited]\n"))
+        try:
+            self.gdb.start()
+        except OSError:
+            self.destroy()
+            raise
+
+        editor.on_breakpoint_toggle = self.breakpoint_toggled
+        for line in sorted(editor.breakpoints):
+            self.insert_breakpoint(line)
+        self.poll()
+
+    def poll(self):
+        more = self.gdb.poll()
+        # Come straight back when records are still queued, otherwise idle a little
+        self.poll_job = self.after(1 if more else self.POLL_INTERVAL, self.poll)
+
+    def write(self, message):
+        self.output.config(state='normal')
+        self.output.insert('end', message)
+        self.output.see('end')
+        self.output.config(state='disabled')
+
+    def run_or_continue(self):
+        if self.started:
+            self.gdb.cont()
+        else:
+            self.started = True
+            self.gdb.run()
+
+    def insert_breakpoint(self, line):
+        def inserted(record):
+            if record['class'] == 'done':
+                self.breakpoint_numbers[line] = record['payload']['bkpt']['number']
+        self.gdb.break_insert(self.source, line, inserted)
+
+    def breakpoint_toggled(self, line, enabled):
+        if enabled:
+            self.insert_breakpoint(line)
+        elif line in self.breakpoint_numbers:
+            self.gdb.break_delete(self.breakpoint_numbers.pop(line))
+
+    def on_stream(self, record):
+        self.write(record['text'])
+
+    def send_program_input(self, event=None):
+        self.gdb.send_input(self.program_input.get() + '\n')
+        self.program_input.delete(0, 'end')
+
+    def on_result(self, record):
+        if record['class'] == 'error':
+            self.write(f"Error: {record['payload'].get('msg', '')}\n")
+
+    def on_exec(self, record):
+        if record['class'] == 'running':
+            self.editor.set_current_line(None)
+            return
+        if record['class'] != 'stopped':
+            return
+        payload = record['payload']
+        reason = payload.get('reason', '')
+        if reason.startswith('exited'):
+            self.started = False
+            self.editor.set_current_line(None)
+            self.write(f"\n[program {reason.replace('-', ' ')}]\n")
+            self.stack_tree.delete(*self.stack_tree.get_children())
+            self.locals_tree.delete(*self.locals_tree.get_children())
+            return
+        frame = payload.get('frame', {})
+        if os.path.abspath(frame.get('fullname', '')) == self.source and 'line' in frame:
+            self.editor.set_current_line(int(frame['line']))
+        self.gdb.list_frames(self.show_frames)
+        self.gdb.list_variables(self.show_variables)
+
+    def show_frames(self, record):
+        self.stack_tree.delete(*self.stack_tree.get_children())
+        for frame in record['payload'].get('stack', []):
+            location = f"{frame.get('file', '??')}:{frame.get('line', '?')}"
+            self.stack_tree.insert('', 'end', text=f"#{frame.get('level')} {frame.get('func', '??')}",
+                                   values=(location,))
+
+    def show_variables(self, record):
+        self.locals_tree.delete(*self.locals_tree.get_children())
+        for var in record['payload'].get('variables', []):
+            self.locals_tree.insert('', 'end', text=var.get('name'),
+                                    values=(var.get('type', ''), var.get('value', '...')))
+
+    def close(self):
+        self.after_cancel(self.poll_job)
+        self.editor.on_breakpoint_toggle = None
+        self.editor.set_current_line(None)
+        self.gdb.stop()
+        self.destroy()
+
+class FindInFilesWindow(tk.Toplevel):
+    POLL_INTERVAL = 30   # ms
+    BATCH_PER_TICK = 200  # files added to the tree per poll
+
+    def __init__(self, parent, open_location):
+        super().__init__(parent)
+        self.title("Find in Files")
+        self.geometry("700x500")
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.open_location = open_location
+        self.search = None
+        self.poll_job = None
+        self.file_matches = {}  # tree item -> (path, matches) not yet expanded
+
+        form = tk.Frame(self)
+        form.pack(fill='x')
+        tk.Label(form, text="Folder:").grid(row=0, column=0, sticky='w', padx=4, pady=4)
+        self.folder_var = tk.StringVar(value=os.getcwd())
+        tk.Entry(form, textvariable=self.folder_var, width=50).grid(row=0, column=1, padx=4, pady=4)
+        tk.Button(form, text="Browse", command=self.browse).grid(row=0, column=2, padx=4)
+
+        tk.Label(form, text="Find:").grid(row=1, column=0, sticky='w', padx=4, pady=4)
+        self.query_entry = tk.Entry(form, width=50)
+        self.query_entry.grid(row=1, column=1, padx=4, pady=4)
+        self.query_entry.bind('<Return>', lambda e: self.start_search())
+        self.query_entry.focus_set()
+        tk.Button(form, text="Search", command=self.start_search).grid(row=1, column=2, padx=4)
+
+        self.match_case = tk.BooleanVar()
+        self.use_regex = tk.BooleanVar()
+        options = tk.Frame(form)
+        options.grid(row=2, column=1, sticky='w')
+        tk.Checkbutton(options, text="Match case", variable=self.match_case).pack(side='left')
+        tk.Checkbutton(options, text="Regex", variable=self.use_regex).pack(side='left')
+
+        self.status = tk.Label(self, text="", anchor='w')
+        self.status.pack(fill='x', padx=4)
+
+        self.tree = ttk.Treeview(self, columns=('line',))
+        self.tree.heading('#0', text="Match")
+        self.tree.heading('line', text="Line")
+        self.tree.column('line', width=60, anchor='e')
+        self.tree.pack(fill='both', expand=True)
+        self.tree.bind('<<TreeviewOpen>>', self.expand_file)
+        self.tree.bind('<Double-1>', self.open_match)
+
+    def browse(self):
+        folder = filedialog.askdirectory(parent=self)
+        if folder:
+            self.folder_var.set(folder)
+
+    def start_search(self):
+        query = self.query_entry.get()
+        if not query:
+            return
+        # A new query always supersedes the running one
+        self.stop_search()
+        self.tree.delete(*self.tree.get_children())
+        self.file_matches = {}
+        self.file_count = self.match_count = 0
+        try:
+            self.search = WorkspaceSearch(self.folder_var.get(), query, self.match_case.get(), self.use_regex.get())
+        except re.error as e:
+            messagebox.showerror("Find in Files", f"Invalid regular expression:\n{e}", parent=self)
+            return
+        self.search.start()
+        self.status.config(text="Searching...")
+        self.poll()
+
+    def poll(self):
+        search = self.search
+        for _ in range(self.BATCH_PER_TICK):
+            try:
+                item = search.results.get_nowait()
+            except queue.Empty:
+                break
+            if item == 'done':
+                self.status.config(text=f"{self.match_count} match(es) in {self.file_count} file(s).")
+                self.search = None
+                self.poll_job = None
+                return
+            path, matches = item
+            self.file_count += 1
+            self.match_count += len(matches)
+            # Match rows are only created when the file node is expanded
+            node = self.tree.insert('', 'end', text=path, values=(len(matches),))
+            self.tree.insert(node, 'end', text="...")
+            self.file_matches[node] = (path, matches)
+        self.status.config(text=f"Searching... {self.match_count} match(es) in {self.file_count} file(s)")
+        self.poll_job = self.after(self.POLL_INTERVAL, self.poll)
+
+    def expand_file(self, event=None):
+        node = self.tree.focus()
+        if node not in self.file_matches:
+            return
+        path, matches = self.file_matches.pop(node)
+        self.tree.delete(*self.tree.get_children(node))
+        for line_no, preview in matches:
+            self.tree.insert(node, 'end', text=preview, values=(line_no,))
+
+    def open_match(self, event=None):
+        node = self.tree.focus()
+        parent = self.tree.parent(node)
+        if not parent:
+            return
+        self.open_location(self.tree.item(parent, 'text'), int(self.tree.set(node, 'line')))
+
+    def stop_search(self):
+        if self.poll_job:
+            self.after_cancel(self.poll_job)
+            self.poll_job = None
+        if self.search:
+            self.search.cancel()
+            self.search = None
+
+    def close(self):
+        self.stop_search()
+        self.destroy()
+
+class BenchmarkDialog(tk.Toplevel):
+    def __init__(self, parent, on_start):
+        super().__init__(parent)
+        self.title("Benchmark")
+        self.geometry("460x230")
+        self.transient(parent)
+        self.resizable(False, False)
+        self.on_start = on_start
+
+        tk.Label(self, text="Runs:").grid(row=0, column=0, sticky='w', padx=4, pady=4)
+        self.runs_var = tk.IntVar(value=10)
+        tk.Spinbox(self, from_=1, to=1000, textvariable=self.runs_var, width=6).grid(row=0, column=1, sticky='w', padx=4, pady=4)
+
+        tk.Label(self, text="Warm-ups:").grid(row=1, column=0, sticky='w', padx=4, pady=4)
+        self.warmups_var = tk.IntVar(value=2)
+        tk.Spinbox(self, from_=0, to=100, textvariable=self.warmups_var, width=6).grid(row=1, column=1, sticky='w', padx=4, pady=4)
+
+        tk.Label(self, text="Stdin file:").grid(row=2, column=0, sticky='w', padx=4, pady=4)
+        self.stdin_var = tk.StringVar()
+        tk.Entry(self, textvariable=self.stdin_var, width=30).grid(row=2, column=1, padx=4, pady=4)
+        tk.Button(self, text="Browse", command=lambda: self.browse(self.stdin_var)).grid(row=2, column=2, padx=4)
+
+        # Optional side-by-side comparison against another profile or a saved revision
+        self.compare_var = tk.StringVar(value='none')
+        compare_frame = tk.Frame(self)
+        compare_frame.grid(row=3, column=0, columnspan=3, sticky='w', padx=4, pady=4)
+        tk.Label(compare_frame, text="Compare with:").pack(side='left')
+        for label, value in (("Nothing", 'none'), ("Profile", 'profile'), ("Revision", 'revision')):
+            tk.Radiobutton(compare_frame, text=label, variable=self.compare_var, value=value).pack(side='left')
+
+        tk.Label(self, text="Profile B:").grid(row=4, column=0, sticky='w', padx=4, pady=4)
+        self.profile_b_var = tk.StringVar(value=DEBUG_PROFILE)
+        ttk.Combobox(self, values=list(BUILD_PROFILES.keys()), textvariable=self.profile_b_var,
+                     state='readonly', width=14).grid(row=4, column=1, sticky='w', padx=4, pady=4)
+
+        tk.Label(self, text="Revision B:").grid(row=5, column=0, sticky='w', padx=4, pady=4)
+        self.revision_var = tk.StringVar()
+        tk.Entry(self, textvariable=self.revision_var, width=30).grid(row=5, column=1, padx=4, pady=4)
+        tk.Button(self, text="Browse", command=lambda: self.browse(self.revision_var)).grid(row=5, column=2, padx=4)
+
+        btn_frame = tk.Frame(self)
+        btn_frame.grid(row=6, column=0, columnspan=3, pady=4)
+        tk.Button(btn_frame, text="Start", command=self.start).pack(side='left', padx=4)
+        tk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side='left', padx=4)
+
+    def browse(self, var):
+        filename = filedialog.askopenfilename(parent=self)
+        if filename:
+            var.set(filename)
+
+    def start(self):
+        try:
+            runs = max(1, self.runs_var.get())
+            warmups = max(0, self.warmups_var.get())
+        except tk.TclError:
+            messagebox.showerror("Benchmark", "Runs and warm-ups must be numbers.", parent=self)
+            return
+        options = {
+            'runs': runs,
+            'warmups': warmups,
+            'stdin': self.stdin_var.get() or None,
+            'compare': self.compare_var.get(),
+            'profile_b': self.profile_b_var.get(),
+            'revision_b': self.revision_var.get() or None,
+        }
+        if options['compare'] == 'revision' and not options['revision_b']:
+            messagebox.showerror("Benchmark", "Choose a saved revision to compare with.", parent=self)
+            return
+        self.destroy()
+        self.on_start(options)
+
+class TabMemoryWindow(tk.Toplevel):
+    REFRESH_MS = 2000
+    COLUMNS = [('state', "State", 'w'), ('idle', "Idle", 'e'), ('lines', "Lines", 'e'), ('memory', "Memory", 'e')]
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.title("Tab Memory")
+        self.geometry("560x320")
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in self.COLUMNS])
+        self.tree.heading('#0', text="Tab")
+        for column, title, anchor in self.COLUMNS:
+            self.tree.heading(column, text=title)
+            self.tree.column(column, width=90, anchor=anchor)
+        self.tree.pack(fill='both', expand=True)
+
+        bottom = tk.Frame(self)
+        bottom.pack(fill='x', padx=6, pady=4)
+        self.total_label = tk.Label(bottom, anchor='w')
+        self.total_label.pack(side='left', fill='x', expand=True)
+        tk.Label(bottom, text="Hibernate after (min, 0 = never):").pack(side='left')
+        self.minutes_var = tk.StringVar(value=f"{app.hibernate_after / 60:g}")
+        entry = tk.Entry(bottom, textvariable=self.minutes_var, width=5)
+        entry.pack(side='left', padx=2)
+        entry.bind('<Return>', lambda e: self.apply_timeout())
+        tk.Button(bottom, text="Set", command=self.apply_timeout).pack(side='left', padx=2)
+        tk.Button(bottom, text="Hibernate Inactive Now", command=self.hibernate_now).pack(side='left', padx=2)
+        self.refresh()
+
+    def apply_timeout(self):
+        try:
+            self.app.hibernate_after = max(0.0, float(self.minutes_var.get())) * 60
+        except ValueError:
+            messagebox.showerror("Tab Memory", "Enter a number of minutes.", parent=self)
+
+    def hibernate_now(self):
+        self.app.hibernate_inactive_tabs(0)
+        self.refresh(reschedule=False)
+
+    def refresh(self, reschedule=True):
+        if not self.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        now = time.monotonic()
+        total = 0
+        for index, editor in enumerate(self.app.editor_tabs):
+            memory = editor.memory_estimate()
+            total += memory
+            if editor is self.app.active_tab:
+                state, idle = "active", ""
+            else:
+                state = "hibernated" if editor.hibernated else "loaded"
+                idle = f"{(now - editor.last_active) / 60:.0f} min"
+            lines = editor.hibernated.lines if editor.hibernated else editor.document.line_count
+            self.tree.insert('', 'end', text=self.app.tabs.tab(index, 'text'),
+                             values=(state, idle, lines, f"{memory / 1024:,.0f} KiB"))
+        self.total_label.config(text=f"{len(self.app.editor_tabs)} tab(s), about {total / 1024 / 1024:,.1f} MiB")
+        if reschedule:
+            self.after(self.REFRESH_MS, self.refresh)
 
 class CodeEditorApp(tk.Tk):
     def __init__(self):
@@ -412,17 +960,31 @@ class CodeEditorApp(tk.Tk):
         self.editor_tabs = []
 
         self.current_language = tk.StringVar(value='C')
+        self.build_profile = tk.StringVar(value=DEFAULT_PROFILE)
+        self.elide_long_lines = tk.BooleanVar(value=CodeEditorTab.elide_long_lines)
         self.create_menu()
         self.create_toolbar()
 
+        # Live p50/p95 latencies of editor phases and compiler runs
+        self.status_bar = tk.Label(self, anchor='w', relief=tk.SUNKEN, font=('Consolas', 9))
+        self.status_bar.pack(side='bottom', fill='x')
+        self.latency_hud = LatencyHUD(self.status_bar, tracker)
+
         # Console window for run/debug output
         self.console = ConsoleWindow(self)
         self.console.withdraw()
 
+        self.debugger = None
+
         # Auto save thread
         self.auto_save_enabled = True
         self.start_auto_save_thread()
 
+        # Background tabs hibernate after hibernate_after seconds
+        self.hibernate_after = HIBERNATE_AFTER
+        self.active_tab = None
+        self.after(HIBERNATE_CHECK_MS, self.check_hibernation)
+
         # Open initial blank tab
         self.new_file()
 
@@ -442,13 +1004,35 @@ class CodeEditorApp(tk.Tk):
 
         edit_menu = tk.Menu(menubar, tearoff=0)
         edit_menu.add_command(label="Find and Replace", accelerator="Ctrl+F", command=self.find_replace)
+        edit_menu.add_command(label="Find in Files", accelerator="Ctrl+Shift+F", command=self.find_in_files)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Document Statistics", command=self.show_document_stats)
+        edit_menu.add_command(label="Tab Memory...", command=self.show_tab_memory)
+        edit_menu.add_checkbutton(label="Elide Long Lines", variable=self.elide_long_lines,
+                                  command=self.toggle_long_line_elision)
         menubar.add_cascade(label="Edit", menu=edit_menu)
 
         run_menu = tk.Menu(menubar, tearoff=0)
         run_menu.add_command(label="Compile & Run", accelerator="F5", command=self.compile_and_run)
         run_menu.add_command(label="Debug (GDB)", accelerator="F6", command=self.debug_code)
+        run_menu.add_command(label="Benchmark...", command=self.benchmark_code)
+        run_menu.add_command(label="Run Test Cases...", command=self.run_test_cases)
+        run_menu.add_command(label="Profile (gprof)", command=self.profile_code)
+        run_menu.add_command(label="Clear Profile Annotations", command=self.clear_profile_annotations)
+        run_menu.add_separator()
+        run_menu.add_command(label="Line Heatmap (gcov)", command=self.heatmap_code)
+        run_menu.add_command(label="Refresh Heatmap", command=lambda: self.heatmap_code(refresh=True))
+        run_menu.add_command(label="Clear Heatmap", command=self.clear_heatmap)
+        run_menu.add_separator()
+        run_menu.add_command(label="Export Latency Trace...", command=self.export_latency_trace)
         menubar.add_cascade(label="Run", menu=run_menu)
 
+        self.diagnostics_menu = tk.Menu(menubar, tearoff=0)
+        self.diagnostics_menu.add_command(label="Start Capture", command=self.start_diagnostics)
+        self.diagnostics_menu.add_command(label="Stop Capture and Save Report", command=self.stop_diagnostics,
+                                          state='disabled')
+        menubar.add_cascade(label="Diagnostics", menu=self.diagnostics_menu)
+
         lang_menu = tk.Menu(menubar, tearoff=0)
         for lang in LANGUAGES.keys():
             lang_menu.add_radiobutton(label=lang, variable=self.current_language, value=lang, command=self.switch_language)
@@ -462,6 +1046,7 @@ class CodeEditorApp(tk.Tk):
         self.bind_all("<Control-s>", lambda e: self.save_file())
         self.bind_all("<Control-S>", lambda e: self.save_file_as())
         self.bind_all("<Control-f>", lambda e: self.find_replace())
+        self.bind_all("<Control-F>", lambda e: self.find_in_files())
         self.bind_all("<F5>", lambda e: self.compile_and_run())
         self.bind_all("<F6>", lambda e: self.debug_code())
 
@@ -493,11 +1078,18 @@ class CodeEditorApp(tk.Tk):
         lang_combo.pack(side='left', padx=2)
         lang_combo.bind('<<ComboboxSelected>>', lambda e: self.switch_language())
 
+        tk.Label(toolbar, text="Profile:").pack(side='left', padx=5)
+        profile_combo = ttk.Combobox(toolbar, values=list(BUILD_PROFILES.keys()), textvariable=self.build_profile, state='readonly', width=14)
+        profile_combo.pack(side='left', padx=2)
+
     def current_editor(self):
         if not self.editor_tabs:
             return None
         index = self.tabs.index(self.tabs.select())
-        return self.editor_tabs[index]
+        editor = self.editor_tabs[index]
+        # Selecting a tab only wakes it once <<NotebookTabChanged>> is handled
+        editor.wake()
+        return editor
 
     def new_file(self):
         lang = self.current_language.get()
@@ -507,15 +1099,25 @@ class CodeEditorApp(tk.Tk):
         self.tabs.select(len(self.editor_tabs) - 1)
 
     def open_file(self):
-        lang = self.current_language.get()
         filetypes = []
         for ext in LANGUAGES.values():
             filetypes.extend(ext['filetypes'])
         filename = filedialog.askopenfilename(filetypes=filetypes)
         if not filename:
             return
-        with open(filename, 'r', encoding='utf-8') as f:
-            content = f.read()
+        self.open_path(filename)
+
+    def open_path(self, filename, line=None):
+        # Focus the tab if the file is already open, waking it so callers
+        # can use its widgets straight away. With a line, the cursor goes
+        # there, or to it once the file has finished loading
+        for index, tab in enumerate(self.editor_tabs):
+            if tab.filename and os.path.abspath(tab.filename) == os.path.abspath(filename):
+                tab.wake()
+                self.tabs.select(index)
+                if line is not None:
+                    tab.go_to_line(line)
+                return tab
         ext = os.path.splitext(filename)[1]
         # Detect language by extension
         lang = 'C'
@@ -523,19 +1125,34 @@ class CodeEditorApp(tk.Tk):
             if ext == v['extension']:
                 lang = k
                 break
-        new_tab = CodeEditorTab(self.tabs, language=lang, filename=filename, content=content)
+        new_tab = CodeEditorTab(self.tabs, language=lang, filename=filename)
         self.editor_tabs.append(new_tab)
         tab_name = os.path.basename(filename)
         self.tabs.add(new_tab.frame, text=tab_name)
         self.tabs.select(len(self.editor_tabs) - 1)
         self.current_language.set(lang)
 
+        def show_progress(loaded, size):
+            self.tabs.tab(new_tab.frame, text=format_progress(tab_name, loaded, size))
+
+        def loaded(tab):
+            self.tabs.tab(tab.frame, text=f"{tab_name} [read-only]" if tab.read_only else tab_name)
+
+        new_tab.load_file(filename, show_progress, loaded)
+        if line is not None:
+            new_tab.go_to_line(line)
+        return new_tab
+
     def save_file(self):
         editor = self.current_editor()
         if not editor:
             return
         if not editor.filename:
             return self.save_file_as()
+        if editor.loader is not None or editor.read_only:
+            messagebox.showinfo("Save", "The file is still loading." if editor.loader is not None
+                                else "Large files are opened read-only.")
+            return
         try:
             with open(editor.filename, 'w', encoding='utf-8') as f:
                 f.write(editor.get_content())
@@ -562,6 +1179,31 @@ class CodeEditorApp(tk.Tk):
             return
         FindReplaceDialog(self, editor.text)
 
+    def show_document_stats(self):
+        editor = self.current_editor()
+        if not editor:
+            return
+        doc = editor.document
+        stats = doc.stats
+        messagebox.showinfo("Document Statistics",
+                            f"Characters: {doc.length}\n"
+                            f"Lines: {doc.line_count}\n"
+                            f"Pieces: {len(doc.pieces)}\n"
+                            f"Estimated memory: {doc.memory_estimate() / 1024:.1f} KB\n"
+                            f"Edits applied: {stats['edits']}\n"
+                            f"Full-buffer copies from the document: {stats['full_copies']}\n"
+                            f"Characters copied out of the document: {stats['chars_copied']}\n"
+                            f"Full-buffer reads from Tk: {editor.edit_proxy.stats['full_reads']}")
+
+    def find_in_files(self):
+        FindInFilesWindow(self, self.open_location)
+
+    def open_location(self, filename, line):
+        try:
+            self.open_path(filename, line)
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("Error", f"Could not open file:\n{e}")
+
     def compile_and_run(self):
         editor = self.current_editor()
         if not editor:
@@ -581,41 +1223,248 @@ class CodeEditorApp(tk.Tk):
         self.console.deiconify()
         self.console.lift()
 
-        if lang == 'C':
-            # Compile with gcc
-            exe_path = os.path.splitext(editor.filename)[0]
-            compile_cmd = LANGUAGES['C']['compile_cmd'](editor.filename, exe_path)
+        with operation('run', lang=lang, bytes=source_size(editor.filename)) as record:
+            if lang == 'C':
+                # Compile with gcc using the selected build profile
+                profile = self.build_profile.get()
+                try:
+                    # Compile (skipped when this profile's artifact is up to date)
+                    with tracker.phase('build', 'subprocess'):
+                        exe_path, proc = build('C', editor.filename, profile)
+                    if proc is None:
+                        self.console.write(f"[{profile}] Build is up to date.\n")
+                    elif proc.returncode != 0:
+                        record['exit_code'] = proc.returncode
+                        self.console.write("Compilation failed:\n")
+                        self.console.write(proc.stderr)
+                        self.highlight_errors_from_gcc(proc.stderr)
+                        return
+                    else:
+                        self.console.write(f"[{profile}] Compilation successful.\n")
+                    # Run executable
+                    run_cmd = LANGUAGES['C']['run_cmd'](exe_path)
+                    with tracker.phase('run', 'subprocess'):
+                        run_proc = subprocess.run(run_cmd, capture_output=True, text=True)
+                    record['exit_code'] = run_proc.returncode
+                    self.console.write("Program output:\n")
+                    self.console.write(run_proc.stdout)
+                    if run_proc.stderr:
+                        self.console.write("\nErrors:\n")
+                        self.console.write(run_proc.stderr)
+                except Exception as e:
+                    record['error'] = type(e).__name__
+                    self.console.write(f"Error: {e}")
+            elif lang == 'Python':
+                # Run Python file
+                run_cmd = LANGUAGES['Python']['run_cmd'](editor.filename)
+                try:
+                    with tracker.phase('run', 'subprocess'):
+                        run_proc = subprocess.run(run_cmd, capture_output=True, text=True)
+                    record['exit_code'] = run_proc.returncode
+                    self.console.write(run_proc.stdout)
+                    if run_proc.stderr:
+                        self.console.write("\nErrors:\n")
+                        self.console.write(run_proc.stderr)
+                except Exception as e:
+                    record['error'] = type(e).__name__
+                    self.console.write(f"Error: {e}")
+
+    def export_latency_trace(self):
+        path = filedialog.asksaveasfilename(defaultextension='.json',
+                                            filetypes=[('Chrome trace', '*.json')],
+                                            title="Export Latency Trace")
+        if not path:
+            return
+        count = tracker.export_chrome_trace(path)
+        messagebox.showinfo("Latency Trace", f"Exported {count} span(s) to {path}\n"
+                            "Open it in chrome://tracing or ui.perfetto.dev.")
+
+    def start_diagnostics(self):
+        # cProfile + tracemalloc until stopped; see diagnostics.py for the report
+        capture.start()
+        self.diagnostics_menu.entryconfig(0, state='disabled')
+        self.diagnostics_menu.entryconfig(1, state='normal')
+
+    def stop_diagnostics(self):
+        folder = capture.stop()
+        self.diagnostics_menu.entryconfig(0, state='normal')
+        self.diagnostics_menu.entryconfig(1, state='disabled')
+        if folder:
+            messagebox.showinfo("Diagnostics", f"Profile and memory reports written to\n{folder}")
+
+    def benchmark_code(self):
+        editor = self.current_editor()
+        if not editor:
+            return
+        if not editor.filename:
+            messagebox.showwarning("Benchmark", "Save your file before benchmarking.")
+            return
+        self.save_file()
+        BenchmarkDialog(self, lambda options: self.run_benchmark(editor, options))
+
+    def run_benchmark(self, editor, options):
+        lang = editor.language
+        profile = self.build_profile.get()
+        name = os.path.basename(editor.filename)
+        targets = [(f"{name} [{profile}]" if lang == 'C' else name, editor.filename, profile)]
+        if options['compare'] == 'profile' and lang == 'C':
+            targets.append((f"{name} [{options['profile_b']}]", editor.filename, options['profile_b']))
+        elif options['compare'] == 'revision':
+            rev_name = os.path.basename(options['revision_b'])
+            targets.append((f"{rev_name} [{profile}]" if lang == 'C' else rev_name, options['revision_b'], profile))
+
+        self.console.clear()
+        self.console.deiconify()
+        self.console.lift()
+
+        commands = []
+        for label, src, target_profile in targets:
+            cmd, error = prepare_run_command(lang, src, target_profile)
+            if error is not None:
+                self.console.write(f"Compilation failed for {label}:\n{error}")
+                return
+            commands.append((label, cmd))
+
+        self.console.write(f"Benchmarking {len(commands)} target(s): "
+                           f"{options['runs']} runs after {options['warmups']} warm-up(s)...\n")
+
+        def worker():
             try:
-                # Compile
-                proc = subprocess.run(compile_cmd, capture_output=True, text=True)
-                if proc.returncode != 0:
-                    self.console.write("Compilation failed:\n")
-                    self.console.write(proc.stderr)
-                    self.highlight_errors_from_gcc(proc.stderr)
-                    return
-                else:
-                    self.console.write("Compilation successful.\n")
-                # Run executable
-                run_cmd = LANGUAGES['C']['run_cmd'](exe_path)
-                run_proc = subprocess.run(run_cmd, capture_output=True, text=True)
-                self.console.write("Program output:\n")
-                self.console.write(run_proc.stdout)
-                if run_proc.stderr:
-                    self.console.write("\nErrors:\n")
-                    self.console.write(run_proc.stderr)
+                results = [(label, run_benchmark(cmd, options['runs'], options['warmups'], options['stdin']))
+                           for label, cmd in commands]
             except Exception as e:
-                self.console.write(f"Error: {e}")
-        elif lang == 'Python':
-            # Run Python file
-            run_cmd = LANGUAGES['Python']['run_cmd'](editor.filename)
+                self.after(0, self.console.write, f"Benchmark error: {e}\n")
+                return
+            report = "".join(format_report(label, samples) + "\n" for label, samples in results)
+            if len(results) == 2:
+                (label_a, samples_a), (label_b, samples_b) = results
+                report += format_comparison(label_a, samples_a, label_b, samples_b)
+            self.after(0, self.console.write, report)
+        threading.Thread(target=worker, daemon=True).start()
+
+    def run_test_cases(self):
+        editor = self.current_editor()
+        if not editor:
+            return
+        if not editor.filename:
+            messagebox.showwarning("Test Cases", "Save your file before running test cases.")
+            return
+        self.save_file()
+        directory = filedialog.askdirectory(title="Folder with .in/.out test cases")
+        if not directory:
+            return
+        cases = discover_cases(directory)
+        if not cases:
+            messagebox.showinfo("Test Cases", "No .in files found in that folder.")
+            return
+
+        self.console.clear()
+        self.console.deiconify()
+        self.console.lift()
+
+        # Build once, then run every case against the same artifact
+        cmd, error = prepare_run_command(editor.language, editor.filename, self.build_profile.get())
+        if error is not None:
+            self.console.write("Compilation failed:\n")
+            self.console.write(error)
+            self.highlight_errors_from_gcc(error)
+            return
+        self.console.write(f"Running {len(cases)} test case(s)...\n")
+
+        def worker():
             try:
-                run_proc = subprocess.run(run_cmd, capture_output=True, text=True)
-                self.console.write(run_proc.stdout)
-                if run_proc.stderr:
-                    self.console.write("\nErrors:\n")
-                    self.console.write(run_proc.stderr)
+                results = run_cases(cmd, cases)
             except Exception as e:
-                self.console.write(f"Error: {e}")
+                self.after(0, self.console.write, f"Test runner error: {e}\n")
+                return
+            title = f"Test Cases - {os.path.basename(editor.filename)}"
+            self.after(0, TestResultsWindow, self, title, results)
+        threading.Thread(target=worker, daemon=True).start()
+
+    def profile_code(self):
+        editor = self.current_editor()
+        if not editor or editor.language != 'C':
+            messagebox.showinfo("Profile", "Profiling is only supported for C language in this editor.")
+            return
+        if not editor.filename:
+            messagebox.showwarning("Profile", "Save your C file before profiling.")
+            return
+        self.save_file()
+        profile = self.build_profile.get()
+
+        self.console.clear()
+        self.console.deiconify()
+        self.console.lift()
+        self.console.write(f"[{profile}] Building with -pg and profiling...\n")
+
+        def worker():
+            try:
+                flat_rows, call_graph, _, error = run_gprof('C', editor.filename, profile)
+            except Exception as e:
+                self.after(0, self.console.write, f"Profiler error: {e}\n")
+                return
+            if error is not None:
+                self.after(0, self.console.write, error)
+                return
+            self.after(0, self.show_profile, editor, flat_rows, call_graph)
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_profile(self, editor, flat_rows, call_graph):
+        self.console.write(f"Profiled {len(flat_rows)} function(s).\n")
+        ProfileWindow(self, f"Profile - {os.path.basename(editor.filename)}", flat_rows, call_graph)
+        # Show each function's share of self time next to its definition
+        share = {row['name']: row['percent'] for row in flat_rows}
+        lines = find_function_lines(editor.get_content(), share.keys())
+        editor.set_line_annotations({line: f"{share[name]:.1f}%" for name, line in lines.items()})
+
+    def clear_profile_annotations(self):
+        editor = self.current_editor()
+        if editor:
+            editor.set_line_annotations({})
+
+    def heatmap_code(self, refresh=False):
+        editor = self.current_editor()
+        if not editor or editor.language != 'C':
+            messagebox.showinfo("Heatmap", "Line heatmaps are only supported for C language in this editor.")
+            return
+        if not editor.filename:
+            messagebox.showwarning("Heatmap", "Save your C file before building a heatmap.")
+            return
+        # Unchanged source: reuse the counts from the last run instead of rebuilding
+        content_hash = editor.content_hash()
+        if refresh and editor.heatmap_cache and editor.heatmap_cache[0] == content_hash:
+            editor.set_heatmap(editor.heatmap_cache[1])
+            return
+        self.save_file()
+        profile = self.build_profile.get()
+
+        self.console.clear()
+        self.console.deiconify()
+        self.console.lift()
+        self.console.write(f"[{profile}] Building with --coverage and collecting line counts...\n")
+
+        def worker():
+            try:
+                counts, error = run_gcov('C', editor.filename, profile)
+            except Exception as e:
+                self.after(0, self.console.write, f"Coverage error: {e}\n")
+                return
+            if error is not None:
+                self.after(0, self.console.write, error)
+                return
+            self.after(0, self.show_heatmap, editor, content_hash, counts)
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_heatmap(self, editor, content_hash, counts):
+        editor.heatmap_cache = (content_hash, counts)
+        editor.set_heatmap(counts)
+        executed = sum(1 for count in counts.values() if count > 0)
+        self.console.write(f"{executed} of {len(counts)} instrumented line(s) executed.\n")
+
+    def clear_heatmap(self):
+        editor = self.current_editor()
+        if editor:
+            editor.clear_heatmap()
 
     def highlight_errors_from_gcc(self, gcc_output):
         # Clear error highlights on all tabs
@@ -649,22 +1498,24 @@ class CodeEditorApp(tk.Tk):
         if not editor.filename:
             messagebox.showwarning("Debug", "Save your C file before debugging.")
             return
-        exe_path = os.path.splitext(editor.filename)[0]
-        if not os.path.exists(exe_path):
-            messagebox.showwarning("Debug", "Executable not found. Compile first.")
-            return
         self.console.clear()
         self.console.deiconify()
         self.console.lift()
 
+        # Debugging always uses the debug profile, whatever is selected for running
+        exe_path, proc = build('C', editor.filename, DEBUG_PROFILE)
+        if proc is not None and proc.returncode != 0:
+            self.console.write("Compilation failed:\n")
+            self.console.write(proc.stderr)
+            self.highlight_errors_from_gcc(proc.stderr)
+            return
+
+        if self.debugger and self.debugger.winfo_exists():
+            self.debugger.close()
         try:
-            # Run gdb -q exe_path -ex run -ex quit
-            gdb_cmd = ["gdb", "-q", exe_path, "-ex", "run", "-ex", "quit"]
-            proc = subprocess.run(gdb_cmd, capture_output=True, text=True)
-            self.console.write(proc.stdout)
-            if proc.stderr:
-                self.console.write("\nErrors:\n")
-                self.console.write(proc.stderr)
+            # Interactive gdb/MI session; click the line numbers to set breakpoints
+            self.debugger = DebuggerWindow(self, editor, exe_path)
+            self.console.write("Debugger started. Click a line number to toggle a breakpoint.\n")
         except Exception as e:
             self.console.write(f"Error running debugger: {e}")
 
@@ -677,18 +1528,70 @@ class CodeEditorApp(tk.Tk):
             self.tabs.tab(tab_index, text=f"Untitled{LANGUAGES[new_lang]['extension']}")
 
     def on_tab_change(self, event):
+        now = time.monotonic()
+        if self.active_tab is not None:
+            self.active_tab.last_active = now
         editor = self.current_editor()
+        self.active_tab = editor
         if editor:
+            editor.last_active = now
             self.current_language.set(editor.language)
 
+    def can_hibernate(self, editor):
+        if (editor.hibernated is not None or editor is self.active_tab or editor.on_breakpoint_toggle
+                or editor.loader is not None):
+            return False
+        # An open Find and Replace dialog holds on to the tab's Text widget
+        return not any(isinstance(window, FindReplaceDialog) and window.text_widget is editor.text
+                       for window in self.winfo_children())
+
+    def hibernate_inactive_tabs(self, idle_for):
+        now = time.monotonic()
+        for editor in self.editor_tabs:
+            if now - editor.last_active >= idle_for and self.can_hibernate(editor):
+                editor.hibernate()
+
+    def check_hibernation(self):
+        if self.hibernate_after:
+            self.hibernate_inactive_tabs(self.hibernate_after)
+        self.after(HIBERNATE_CHECK_MS, self.check_hibernation)
+
+    def show_tab_memory(self):
+        TabMemoryWindow(self)
+
+    def toggle_long_line_elision(self):
+        CodeEditorTab.elide_long_lines = self.elide_long_lines.get()
+        for editor in self.editor_tabs:
+            if editor.hibernated is None:
+                editor.text.tag_configure(ELIDED_TAG, elide=CodeEditorTab.elide_long_lines)
+
     def start_auto_save_thread(self):
+        def collect_snapshots(snapshots, ready):
+            # Runs on the Tk thread; snapshots are immutable so the writer can use them freely
+            snapshots.extend((editor.filename, editor.language, editor.get_snapshot())
+                             for editor in self.editor_tabs
+                             if editor.filename and editor.loader is None and not editor.read_only)
+            ready.set()
+
         def auto_save_loop():
             while self.auto_save_enabled:
-                time.sleep(60)
-                for editor in self.editor_tabs:
-                    if editor.filename:
-                        with open(editor.filename, 'w', encoding='utf-8') as f:
-                            f.write(editor.get_content())
+                time.sleep(AUTO_SAVE_INTERVAL)
+                snapshots = []
+                ready = threading.Event()
+                # Time spent waiting for the Tk thread is logged as queue wait
+                queued_at = time.perf_counter()
+                try:
+                    self.after(0, collect_snapshots, snapshots, ready)
+                except RuntimeError:
+                    return
+                if not ready.wait(5):
+                    continue
+                for filename, lang, snapshot in snapshots:
+                    with operation('autosave', queued_at, lang=lang) as record:
+                        text = snapshot.get_text()
+                        with open(filename, 'w', encoding='utf-8') as f:
+                            f.write(text)
+                        record['bytes'] = len(text.encode('utf-8'))
         threading.Thread(target=auto_save_loop, daemon=True).start()
 
     def on_close(self):
@@ -696,11 +1599,36 @@ class CodeEditorApp(tk.Tk):
         self.destroy()
 
 class CodeEditorTab:
+    # Hide what lies past VIEW_CHARS on very long lines; shared by every tab
+    elide_long_lines = True
+
     def __init__(self, parent_notebook, language='C', filename=None, content=''):
         self.language = language
         self.filename = filename
         self.frame = tk.Frame(parent_notebook)
-        self.text = tk.Text(self.frame, undo=True, wrap='none', font=('Consolas', 12))
+
+        self.error_lines = []
+        self.line_annotations = {}
+        self.heatmap_cache = None  # (content hash, line counts) of the last gcov run
+        self.breakpoints = set()
+        self.on_breakpoint_toggle = None  # set by an active debugger session
+        self.scheduler = scheduler_for(self.frame)
+        self.gutter_state = None  # (line count, annotations, breakpoints) the gutter shows
+        self.hibernated = None    # HibernatedTab while the widgets are torn down
+        self.last_active = time.monotonic()
+        self.history = UndoHistory()  # kept across hibernation
+        self.tag_range_count = None  # (cache key, count) for memory_estimate
+        self.autocomplete_popup = None
+        self.loader = None        # ProgressiveLoader while a file streams in
+        self.read_only = False    # set for files too big to edit
+        self.tokens = None        # TokenStore, built on first use
+
+        self.build_widgets(content)
+        self.update_line_numbers()
+        self.apply_syntax_highlighting()
+
+    def build_widgets(self, content):
+        self.text = tk.Text(self.frame, wrap='none', font=('Consolas', 12))
         self.text.pack(side='right', fill='both', expand=True)
 
         # Line numbers widget
@@ -723,17 +1651,139 @@ class CodeEditorTab:
         self.text.bind('<MouseWheel>', self.update_line_numbers)
         self.text.bind('<Button-1>', self.update_line_numbers)
         self.text.bind('<Configure>', self.update_line_numbers)
+        self.linenumbers.bind('<Button-1>', self.toggle_breakpoint)
 
         self.text.insert('1.0', content)
 
-        self.error_lines = []
+        # Python-side copy of the buffer, kept in step with every widget edit
+        self.document = Document(content)
+        self.edit_proxy = TextEditProxy(self.text)
+        self.edit_proxy.subscribe(self.apply_edit_to_document)
+        self.edit_proxy.subscribe(coalesce(self.text, self.on_edit))
+        self.history.attach(self.text, self.edit_proxy)
+        self.text.bind('<<Undo>>', self.undo)
+        self.text.bind('<<Redo>>', self.redo)
+        tracker.watch_input(self.text)
+        if self.read_only:
+            self.text.config(state='disabled')
+
+        # Autocomplete popup
+        self.text.bind('<KeyRelease>', self.on_key_release)
+        self.text.bind('<ButtonRelease-1>', self.show_matching_bracket, add='+')
+
+    def load_file(self, path, on_progress=None, on_done=None):
+        # The buffer fills over many event-loop slices. Loading isn't an undoable
+        # edit, and the gutter and highlighting wait for the last chunk
+        self.history.detach()
+        self.tokens = None
+
+        def finish(loader):
+            self.loader = None
+            self.read_only = loader.read_only
+            self.history.attach(self.text, self.edit_proxy)
+            self.update_line_numbers()
+            self.apply_syntax_highlighting()
+            if on_done:
+                on_done(self)
+
+        self.loader = ProgressiveLoader(self.text, path, on_progress, finish).start()
+
+    def go_to_line(self, line):
+        # A file still streaming in gets the cursor from its loader at the end
+        index = f"{line}.0"
+        if self.loader is not None:
+            self.loader.cursor = index
+        else:
+            self.text.mark_set('insert', index)
+            self.text.see(index)
+        self.text.focus_set()
+
+    def hibernate(self):
+        # Packs the buffer, cursor, scroll position and highlight tags into one
+        # compressed blob and destroys the Text widgets. The undo history moves
+        # to its spill file and is reattached on wake
+        if self.hibernated is not None:
+            return
+        self.scheduler.cancel((self, 'gutter'))
+        # A highlight pass still in progress isn't worth keeping
+        highlighted = not self.scheduler.pending((self, 'highlight'))
+        self.scheduler.cancel((self, 'highlight'))
+        tags = []
+        if highlighted:
+            # tag_names() is in priority order, which recreating them in order keeps
+            for tag in self.text.tag_names():
+                if tag == 'sel':
+                    continue
+                options = {name: str(value[4]) for name, value in self.text.tag_configure(tag).items()
+                           if str(value[4]) != ''}
+                tags.append((tag, options, [str(index) for index in self.text.tag_ranges(tag)]))
+        state = {'text': self.get_content(), 'insert': self.text.index('insert'),
+                 'yview': self.text.yview()[0], 'xview': self.text.xview()[0], 'tags': tags}
+        blob = zlib.compress(json.dumps(state).encode('utf-8'), HIBERNATE_COMPRESSION)
+        self.hibernated = HibernatedTab(blob, self.document.line_count, self.document.length, highlighted)
 
+        if self.autocomplete_popup:
+            self.autocomplete_popup.destroy()
+            self.autocomplete_popup = None
+        for child in self.frame.winfo_children():
+            child.destroy()
+        self.history.detach()
+        self.history.spill_all()
+        self.edit_proxy.close()
+        self.text = self.linenumbers = self.v_scroll = self.h_scroll = None
+        self.document = self.edit_proxy = None
+        self.tokens = None        # cheaper to lex again on wake than to keep
+        self.gutter_state = None
+
+    def wake(self):
+        if self.hibernated is None:
+            return
+        state = json.loads(zlib.decompress(self.hibernated.blob).decode('utf-8'))
+        highlighted = self.hibernated.highlighted
+        self.hibernated = None
+        self.build_widgets(state['text'])
+        # The content hasn't changed, so the old highlighting is still right
+        for tag, options, ranges in state['tags']:
+            self.text.tag_configure(tag, **options)
+            if ranges:
+                self.text.tag_add(tag, *ranges)
+        self.text.mark_set('insert', state['insert'])
+        self.text.xview_moveto(state['xview'])
+        self.text.yview_moveto(state['yview'])
         self.update_line_numbers()
-        self.apply_syntax_highlighting()
+        if not highlighted:
+            self.apply_syntax_highlighting()
+        self.last_active = time.monotonic()
+
+    def memory_estimate(self):
+        # Bytes, roughly: the compressed blob, or the document plus Tk's copy of
+        # the text, its per-line and per-tag-range bookkeeping, the gutter and undo
+        if self.hibernated is not None:
+            return len(self.hibernated.blob) + HIBERNATED_TAB_BYTES + self.history.memory_bytes
+        lines = self.document.line_count
+        # Listing every tag range is slow on big files; recount only after edits or highlighting
+        key = (self.document.version, self.scheduler.pending((self, 'highlight')), len(self.error_lines))
+        if self.tag_range_count is None or self.tag_range_count[0] != key:
+            count = sum(len(self.text.tag_ranges(tag)) for tag in self.text.tag_names()) // 2
+            self.tag_range_count = (key, count)
+        tag_ranges = self.tag_range_count[1]
+        text_widget = self.document.length + lines * TK_LINE_BYTES + tag_ranges * TK_TAG_RANGE_BYTES
+        gutter = lines * (TK_LINE_BYTES + len(str(lines)) + 1)
+        tokens = self.tokens.memory_bytes if self.tokens is not None else 0
+        return self.document.memory_estimate() + text_widget + gutter + self.history.memory_bytes + tokens
+
+    def undo(self, event=None):
+        self.history.undo()
+        return 'break'
 
-        # Autocomplete popup
-        self.autocomplete_popup = None
-        self.text.bind('<KeyRelease>', self.handle_autocomplete)
+    def redo(self, event=None):
+        self.history.redo()
+        return 'break'
+
+    def get_snapshot(self):
+        if self.hibernated is not None:
+            return Document(self.get_content()).snapshot()
+        return self.document.snapshot()
 
     def on_vscroll(self, *args):
         self.text.yview(*args)
@@ -743,82 +1793,223 @@ class CodeEditorTab:
         self.v_scroll.set(*args)
         self.linenumbers.yview_moveto(args[0])
 
+    def on_edit(self):
+        if self.loader is not None:
+            return
+        with tracker.event('edit'):
+            mark_line_if_long(self.text, elide=self.elide_long_lines)
+            self.update_line_numbers()
+            self.refresh_highlighting()
+
+    def on_key_release(self, event):
+        self.show_matching_bracket()
+        with tracker.phase('autocomplete'):
+            return self.handle_autocomplete(event)
+
     def update_line_numbers(self, event=None):
+        # Scrolls and clicks leave the gutter as it is; refill it only when its contents change
+        line_count = int(self.text.index('end-1c').split('.')[0])
+        state = (line_count, dict(self.line_annotations), frozenset(self.breakpoints))
+        if state != self.gutter_state:
+            self.gutter_state = state
+            self.scheduler.submit((self, 'gutter'), self.fill_gutter(line_count))
+
+        # Update error highlights for lines with errors
+        self.highlight_error_lines()
+
+    def fill_gutter(self, line_count):
+        if self.line_annotations:
+            # Profiler annotations share the gutter with the line numbers
+            annotations = self.line_annotations
+            label = lambda i: f"{i:>4} {annotations.get(i, ''):>6}"
+            self.linenumbers.config(width=12)
+        else:
+            label = str
+            self.linenumbers.config(width=4)
         self.linenumbers.config(state='normal')
         self.linenumbers.delete('1.0', 'end')
-        line_count = self.text.index('end-1c').split('.')[0]
-        line_numbers_string = "\n".join(str(i) for i in range(1, int(line_count) + 1))
-        self.linenumbers.insert('1.0', line_numbers_string)
+        for first in range(1, line_count + 1, GUTTER_CHUNK):
+            chunk = "\n".join(label(i) for i in range(first, min(first + GUTTER_CHUNK, line_count + 1)))
+            self.linenumbers.config(state='normal')
+            self.linenumbers.insert('end-1c', chunk if first == 1 else "\n" + chunk)
+            self.linenumbers.config(state='disabled')
+            self.linenumbers.yview_moveto(self.text.yview()[0])
+            yield
+        self.linenumbers.config(state='normal')
+        for line in self.breakpoints:
+            self.linenumbers.tag_add('breakpoint', f"{line}.0", f"{line}.end")
+        self.linenumbers.tag_config('breakpoint', background='#E53935', foreground='white')
         self.linenumbers.config(state='disabled')
 
-        # Update error highlights for lines with errors
-        self.highlight_error_lines()
+    def apply_edit_to_document(self, event):
+        offset = self.document.from_tk_index(event.start)
+        if self.tokens is not None:
+            self.tokens.note_edit(offset, len(event.removed), len(event.inserted))
+        if event.removed:
+            self.document.delete(offset, len(event.removed))
+        if event.inserted:
+            self.document.insert(offset, event.inserted)
 
     def get_content(self):
-        return self.text.get('1.0', 'end-1c')
+        if self.hibernated is not None:
+            return json.loads(zlib.decompress(self.hibernated.blob).decode('utf-8'))['text']
+        return self.document.get_text()
 
     def set_language(self, language):
         self.language = language
         self.apply_syntax_highlighting()
 
     def apply_syntax_highlighting(self):
-        # Remove previous tags
-        for tag in self.text.tag_names():
-            self.text.tag_delete(tag)
+        # Tagging a large file takes many Tk searches; they run in time slices
+        if self.loader is not None or self.read_only:
+            return
+        self.scheduler.submit((self, 'highlight'), self.highlight_job())
+
+    def token_store(self):
+        # The tab's tokens, brought up to date with the document
+        if self.tokens is None or self.tokens.lang != self.language:
+            self.tokens = store_for(self.language)
+            if self.tokens is None:
+                return None
+        self.tokens.update(self.document)
+        return self.tokens
+
+    def highlight_job(self):
+        # Remove previous syntax tags only; heatmap, debugger, error, search and
+        # bracket overlays stay (mark_long_lines resets its own tags)
+        for tag in HIGHLIGHT_COLORS:
+            self.text.tag_remove(tag, '1.0', 'end')
+
+        # Very long lines are soft-wrapped, and nothing past their first
+        # TOKENIZE_WINDOW characters is tagged
+        long_lines = find_long_lines(self.get_content())
+        mark_long_lines(self.text, long_lines, self.elide_long_lines)
+        yield from self.tag_tokens(0, self.document.length, long_lines)
+
+    def tag_tokens(self, start, end, long_lines=()):
+        # Colors the tokens overlapping [start, end) from the token store
+        tokens = self.token_store()
+        if tokens is None:
+            return
+        for tag, color in HIGHLIGHT_COLORS.items():
+            self.text.tag_config(tag, foreground=color)
+        # Offsets past the window on each long line: [(first, last)]
+        tails = [(line_start + TOKENIZE_WINDOW, line_start + length) for line, line_start, length in long_lines]
+        tail_starts = [first for first, last in tails]
+        to_index = self.document.to_tk_index
+        ranges = {tag: [] for tag in HIGHLIGHT_COLORS}
+        for kind, token_start, token_end in tokens.range(start, end):
+            tag = HIGHLIGHT_TAGS.get(kind)
+            if tag is None:
+                continue
+            if tails:
+                k = bisect.bisect_right(tail_starts, token_start) - 1
+                if k >= 0 and token_start < tails[k][1]:
+                    continue
+            batch = ranges[tag]
+            batch += (to_index(token_start), to_index(token_end))
+            if len(batch) >= 2 * TAG_BATCH:
+                self.text.tag_add(tag, *batch)
+                batch.clear()
+                yield
+        for tag, batch in ranges.items():
+            if batch:
+                self.text.tag_add(tag, *batch)
+
+    def refresh_highlighting(self):
+        # Re-tags just the span whose tokens an edit changed
+        if self.read_only:
+            return
+        if self.tokens is None:
+            # Dropped by hibernation, so the edit's span is unknown: tag it all again
+            if supported(self.language):
+                self.apply_syntax_highlighting()
+            return
+        if self.scheduler.pending((self, 'highlight')):
+            # The full pass reads the token arrays as it goes; start it over
+            self.apply_syntax_highlighting()
+            return
+        span = self.tokens.update(self.document)
+        if span is None:
+            return
+        first, last = self.document.to_tk_index(span[0]), self.document.to_tk_index(span[1])
+        for tag in HIGHLIGHT_COLORS:
+            self.text.tag_remove(tag, first, last)
+        for _ in self.tag_tokens(span[0], span[1]):
+            pass
+
+    def show_matching_bracket(self, event=None):
+        self.text.tag_remove('bracket_match', '1.0', 'end')
+        tokens = self.token_store()
+        if tokens is None:
+            return
+        match = tokens.match_bracket(self.document, self.document.from_tk_index(self.text.index('insert')))
+        if match:
+            self.text.tag_config('bracket_match', background='#c8e6c9')
+            for offset in match:
+                index = self.document.to_tk_index(offset)
+                self.text.tag_add('bracket_match', index, f"{index}+1c")
 
-        # Define simple keywords and patterns per language
-        lang_info = LANGUAGES.get(self.language, {})
-        keywords = lang_info.get('keywords', [])
-        comments = lang_info.get('comment_patterns', [])
-        strings = lang_info.get('string_patterns', [])
+    def set_error_lines(self, lines):
+        self.error_lines = lines
+        if self.hibernated is None:  # otherwise shown when the tab wakes
+            self.highlight_error_lines()
 
-        content = self.get_content()
+    def set_line_annotations(self, annotations):
+        self.wake()
+        self.line_annotations = dict(annotations)
+        self.update_line_numbers()
 
-        # Basic keyword highlighting
-        for kw in keywords:
-            start = '1.0'
-            while True:
-                pos = self.text.search(r'\b' + kw + r'\b', start, stopindex='end', regexp=True)
-                if not pos:
-                    break
-                end_pos = f"{pos}+{len(kw)}c"
-                self.text.tag_add('keyword', pos, end_pos)
-                start = end_pos
-        self.text.tag_config('keyword', foreground='blue')
-
-        # Comments highlighting
-        for pattern in comments:
-            start = '1.0'
-            while True:
-                pos = self.text.search(pattern, start, stopindex='end', regexp=True)
-                if not pos:
-                    break
-                # Highlight till end of line for single-line comments
-                line_end = self.text.index(f"{pos} lineend")
-                self.text.tag_add('comment', pos, line_end)
-                start = line_end
-        self.text.tag_config('comment', foreground='green')
-
-        # Strings highlighting
-        for pattern in strings:
-            start = '1.0'
-            while True:
-                pos = self.text.search(pattern, start, stopindex='end', regexp=True)
-                if not pos:
-                    break
-                # Find closing quote
-                quote_char = pattern[0]
-                end_pos = self.text.search(quote_char, pos + '+1c', stopindex='end')
-                if not end_pos:
-                    break
-                end_pos = f"{end_pos}+1c"
-                self.text.tag_add('string', pos, end_pos)
-                start = end_pos
-        self.text.tag_config('string', foreground='orange')
+    def toggle_breakpoint(self, event):
+        line = int(self.linenumbers.index(f"@{event.x},{event.y}").split('.')[0])
+        enabled = line not in self.breakpoints
+        if enabled:
+            self.breakpoints.add(line)
+        else:
+            self.breakpoints.discard(line)
+        self.update_line_numbers()
+        if self.on_breakpoint_toggle:
+            self.on_breakpoint_toggle(line, enabled)
+        return 'break'
 
-    def set_error_lines(self, lines):
-        self.error_lines = lines
-        self.highlight_error_lines()
+    def set_current_line(self, line):
+        self.wake()
+        self.text.tag_remove('debug_current', '1.0', 'end')
+        if line is None:
+            return
+        self.text.tag_add('debug_current', f"{line}.0", f"{line + 1}.0")
+        self.text.tag_config('debug_current', background='#C8E6C9')
+        self.text.tag_raise('debug_current')
+        self.text.see(f"{line}.0")
+
+    def content_hash(self):
+        return hashlib.sha1(self.get_content().encode('utf-8')).hexdigest()
+
+    def set_heatmap(self, counts):
+        self.wake()
+        self.clear_heatmap()
+        executed = {line: count for line, count in counts.items() if count > 0}
+        if not executed:
+            return
+        # Log scale so a single very hot loop doesn't flatten everything else
+        peak = math.log1p(max(executed.values()))
+        levels = len(HEATMAP_COLORS)
+        ranges = [[] for _ in range(levels)]
+        for line, count in executed.items():
+            level = min(levels - 1, int(math.log1p(count) / peak * levels)) if peak else 0
+            ranges[level].extend((f"{line}.0", f"{line + 1}.0"))
+        # One tag_add per heat level instead of one per line
+        for level, color in enumerate(HEATMAP_COLORS):
+            tag = f"heat{level}"
+            self.text.tag_config(tag, background=color)
+            if ranges[level]:
+                self.text.tag_add(tag, *ranges[level])
+            self.text.tag_lower(tag)
+
+    def clear_heatmap(self):
+        self.wake()
+        for level in range(len(HEATMAP_COLORS)):
+            self.text.tag_remove(f"heat{level}", '1.0', 'end')
 
     def highlight_error_lines(self):
         self.text.tag_remove('error_line', '1.0', 'end')
@@ -846,6 +2037,12 @@ class CodeEditorTab:
         lang_info = LANGUAGES.get(self.language, {})
         keywords = lang_info.get('keywords', [])
         suggestions = [kw for kw in keywords if kw.startswith(word) and kw != word]
+        # Names already used in the file, from the token store
+        tokens = self.token_store()
+        if tokens is not None:
+            names = tokens.identifiers(self.document)
+            suggestions += sorted(name for name in names if name.startswith(word) and name != word)
+            suggestions = suggestions[:MAX_SUGGESTIONS]
 
         if not suggestions:
             if self.autocomplete_popup:
@@ -891,90 +2088,191 @@ class CodeEditorTab:
         self.text.delete(pos, end)
         self.text.insert(pos, word)
 
+def replace_range_as_one_edit(text_widget, start, end, new_text):
+    # Group the delete and insert so a single undo reverts the whole change
+    history = history_for(text_widget)
+    if history is not None:
+        with history.group():
+            text_widget.delete(start, end)
+            text_widget.insert(start, new_text)
+        return
+    autoseparators = text_widget.cget('autoseparators')
+    text_widget.config(autoseparators=False)
+    text_widget.edit_separator()
+    text_widget.delete(start, end)
+    text_widget.insert(start, new_text)
+    text_widget.edit_separator()
+    text_widget.config(autoseparators=autoseparators)
+
 class FindReplaceDialog(tk.Toplevel):
     def __init__(self, parent, text_widget):
         super().__init__(parent)
         self.title("Find and Replace")
         self.text_widget = text_widget
-        self.geometry("400x120")
+        self.geometry("460x150")
         self.transient(parent)
         self.resizable(False, False)
+        self.protocol("WM_DELETE_WINDOW", self.close)
 
         tk.Label(self, text="Find:").grid(row=0, column=0, sticky='w', padx=4, pady=4)
-        self.find_entry = tk.Entry(self, width=30)
+        self.find_var = tk.StringVar()
+        self.find_entry = tk.Entry(self, width=30, textvariable=self.find_var)
         self.find_entry.grid(row=0, column=1, padx=4, pady=4)
         self.find_entry.focus_set()
+        self.count_label = tk.Label(self, text="", width=10, anchor='w')
+        self.count_label.grid(row=0, column=2, sticky='w')
 
         tk.Label(self, text="Replace:").grid(row=1, column=0, sticky='w', padx=4, pady=4)
         self.replace_entry = tk.Entry(self, width=30)
         self.replace_entry.grid(row=1, column=1, padx=4, pady=4)
 
         self.match_case = tk.BooleanVar()
-        tk.Checkbutton(self, text="Match case", variable=self.match_case).grid(row=2, column=1, sticky='w', padx=4, pady=4)
+        self.whole_word = tk.BooleanVar()
+        self.use_regex = tk.BooleanVar()
+        options = tk.Frame(self)
+        options.grid(row=2, column=1, sticky='w')
+        tk.Checkbutton(options, text="Match case", variable=self.match_case, command=self.invalidate).pack(side='left')
+        tk.Checkbutton(options, text="Whole word", variable=self.whole_word, command=self.invalidate).pack(side='left')
+        tk.Checkbutton(options, text="Regex", variable=self.use_regex, command=self.invalidate).pack(side='left')
 
         btn_frame = tk.Frame(self)
-        btn_frame.grid(row=3, column=0, columnspan=2, pady=4)
+        btn_frame.grid(row=3, column=0, columnspan=3, pady=4)
 
+        tk.Button(btn_frame, text="Find Previous", command=self.find_previous).pack(side='left', padx=4)
         tk.Button(btn_frame, text="Find Next", command=self.find_next).pack(side='left', padx=4)
         tk.Button(btn_frame, text="Replace", command=self.replace).pack(side='left', padx=4)
         tk.Button(btn_frame, text="Replace All", command=self.replace_all).pack(side='left', padx=4)
-        tk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side='left', padx=4)
+        tk.Button(btn_frame, text="Cancel", command=self.close).pack(side='left', padx=4)
 
-        self.last_search_index = '1.0'
+        self.find_var.trace_add('write', lambda *args: self.invalidate())
+        self.find_entry.bind('<Return>', lambda e: self.find_next())
 
-    def find_next(self):
-        find_text = self.find_entry.get()
+        # Match index for the current query over the last buffer snapshot
+        self.snapshot = None
+        self.matches = []
+        self.line_index = None
+        self.current = -1
+
+    def invalidate(self):
+        self.snapshot = None
+
+    def build_pattern(self):
+        find_text = self.find_var.get()
         if not find_text:
-            return
-        start_pos = self.text_widget.index(self.last_search_index)
-        if self.match_case.get():
-            pos = self.text_widget.search(find_text, start_pos, nocase=0, stopindex='end')
-        else:
-            pos = self.text_widget.search(find_text, start_pos, nocase=1, stopindex='end')
+            return None
+        try:
+            return compile_query(find_text, self.match_case.get(), self.whole_word.get(), self.use_regex.get())
+        except re.error as e:
+            self.count_label.config(text="Bad regex")
+            messagebox.showerror("Find", f"Invalid regular expression:\n{e}", parent=self)
+            return None
 
-        if not pos:
-            messagebox.showinfo("Find", "No more occurrences found.")
-            self.last_search_index = '1.0'
-            return
-        end_pos = f"{pos}+{len(find_text)}c"
+    def refresh_matches(self):
+        # Re-index only when the query or the buffer changed since the last search
+        content = self.text_widget.get('1.0', 'end-1c')
+        if self.snapshot is not None and content == self.snapshot:
+            return True
+        pattern = self.build_pattern()
+        if pattern is None:
+            self.clear_highlights()
+            return False
+        self.snapshot = content
+        self.matches = find_all(content, pattern)
+        self.line_index = LineIndex(content)
+        self.current = -1
         self.text_widget.tag_remove('search_highlight', '1.0', 'end')
-        self.text_widget.tag_add('search_highlight', pos, end_pos)
+        if self.matches:
+            ranges = []
+            for start, end in self.matches:
+                ranges.append(self.line_index.to_index(start))
+                ranges.append(self.line_index.to_index(end))
+            # One tag call for every match
+            self.text_widget.tag_add('search_highlight', *ranges)
         self.text_widget.tag_config('search_highlight', background='yellow')
-        self.text_widget.mark_set('insert', end_pos)
-        self.text_widget.see(pos)
-        self.last_search_index = end_pos
+        self.text_widget.tag_config('search_current', background='orange')
+        self.text_widget.tag_raise('search_current')
+        return True
+
+    def select_match(self, position):
+        self.current = position
+        start, end = self.matches[position]
+        start_index = self.line_index.to_index(start)
+        end_index = self.line_index.to_index(end)
+        self.text_widget.tag_remove('search_current', '1.0', 'end')
+        self.text_widget.tag_add('search_current', start_index, end_index)
+        self.text_widget.mark_set('insert', end_index)
+        self.text_widget.see(start_index)
+        self.count_label.config(text=f"{position + 1} of {len(self.matches)}")
 
-    def replace(self):
-        find_text = self.find_entry.get()
-        replace_text = self.replace_entry.get()
-        if not find_text:
+    def find_next(self):
+        self.step(forward=True)
+
+    def find_previous(self):
+        self.step(forward=False)
+
+    def step(self, forward):
+        if not self.refresh_matches():
             return
-        pos = self.text_widget.search(find_text, '1.0', stopindex='end')
-        if not pos:
-            messagebox.showinfo("Replace", "Text not found.")
+        if not self.matches:
+            self.count_label.config(text="0 of 0")
+            messagebox.showinfo("Find", "No occurrences found.", parent=self)
             return
-        end_pos = f"{pos}+{len(find_text)}c"
-        self.text_widget.delete(pos, end_pos)
-        self.text_widget.insert(pos, replace_text)
+        if self.current == -1:
+            # Start from the cursor rather than the top of the buffer
+            cursor = self.line_index.to_offset(self.text_widget.index('insert'))
+            starts = [start for start, _ in self.matches]
+            position = bisect.bisect_left(starts, cursor) if forward else bisect.bisect_left(starts, cursor) - 1
+        else:
+            position = self.current + (1 if forward else -1)
+        self.select_match(position % len(self.matches))
 
-    def replace_all(self):
-        find_text = self.find_entry.get()
+    def replace(self):
+        if not self.refresh_matches() or not self.matches:
+            return
+        if self.current == -1:
+            self.step(forward=True)
+        start, end = self.matches[self.current]
         replace_text = self.replace_entry.get()
-        if not find_text:
+        if self.use_regex.get():
+            # Re-match in place so anchors and lookarounds see the surrounding text
+            replace_text = self.build_pattern().match(self.snapshot, start).expand(replace_text)
+        replace_range_as_one_edit(self.text_widget, self.line_index.to_index(start),
+                                  self.line_index.to_index(end), replace_text)
+        position = self.current
+        self.invalidate()
+        if self.refresh_matches() and self.matches:
+            self.select_match(position % len(self.matches))
+        else:
+            self.count_label.config(text="0 of 0")
+
+    def replace_all(self):
+        pattern = self.build_pattern()
+        if pattern is None:
             return
-        start_pos = '1.0'
-        count = 0
-        while True:
-            pos = self.text_widget.search(find_text, start_pos, stopindex='end')
-            if not pos:
-                break
-            end_pos = f"{pos}+{len(find_text)}c"
-            self.text_widget.delete(pos, end_pos)
-            self.text_widget.insert(pos, replace_text)
-            start_pos = f"{pos}+{len(replace_text)}c"
-            count += 1
-        messagebox.showinfo("Replace All", f"Replaced {count} occurrences.")
+        content = self.text_widget.get('1.0', 'end-1c')
+        result = replace_all(content, pattern, self.replace_entry.get(), self.use_regex.get())
+        if result is None:
+            messagebox.showinfo("Replace All", "Replaced 0 occurrences.", parent=self)
+            return
+        start, end, new_text, count = result
+        index = LineIndex(content)
+        # Only the span between the first and last match is rewritten, in one undo step
+        replace_range_as_one_edit(self.text_widget, index.to_index(start), index.to_index(end), new_text)
+        self.invalidate()
+        self.clear_highlights()
+        messagebox.showinfo("Replace All", f"Replaced {count} occurrences.", parent=self)
+
+    def clear_highlights(self):
+        self.text_widget.tag_remove('search_highlight', '1.0', 'end')
+        self.text_widget.tag_remove('search_current', '1.0', 'end')
+        self.count_label.config(text="")
+
+    def close(self):
+        self.clear_highlights()
+        self.destroy()
 
 if __name__ == '__main__':
+    enable_logging()
+    set_build_listener(log_event)
     app = CodeEditorApp()
     app.mainloop()
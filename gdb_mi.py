@@ -0,0 +1,285 @@
+import codecs
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+
+try:
+    import pty
+except ImportError:  # Windows: the program's stdin is redirected instead
+    pty = None
+
+# ----------------------------
+# GDB/MI output record parsing
+# ----------------------------
+RECORD_TYPES = {
+    '^': 'result',
+    '*': 'exec',
+    '+': 'status',
+    '=': 'notify',
+    '~': 'console',
+    '@': 'target',
+    '&': 'log',
+}
+
+RECORD_HEAD = re.compile(r'(\d*)([\^*+=])([\w-]+)')
+C_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"')
+VARIABLE = re.compile(r'([\w-]+)=')
+
+
+def decode_c_string(raw):
+    if '\\' not in raw:
+        return raw
+    # MI escapes non-ASCII bytes as octal, so decode to bytes first, then UTF-8
+    return codecs.escape_decode(raw.encode('utf-8'))[0].decode('utf-8', errors='replace')
+
+
+def _parse_value(text, pos):
+    ch = text[pos]
+    if ch == '"':
+        match = C_STRING.match(text, pos)
+        return decode_c_string(match.group(1)), match.end()
+    if ch == '{':
+        return _parse_results(text, pos + 1, '}')
+    if ch == '[':
+        if text[pos + 1] == ']':
+            return [], pos + 2
+        # A list holds either bare values or name=value results; names are dropped
+        items = []
+        pos += 1
+        while True:
+            if text[pos] not in '"{[':
+                pos = VARIABLE.match(text, pos).end()
+            value, pos = _parse_value(text, pos)
+            items.append(value)
+            if text[pos] == ']':
+                return items, pos + 1
+            pos += 1  # ','
+    raise ValueError(f"Unexpected character {ch!r} at {pos}")
+
+
+def _parse_results(text, pos, closing=None):
+    results = {}
+    repeated = set()
+    if closing and text[pos] == closing:
+        return results, pos + 1
+    while True:
+        match = VARIABLE.match(text, pos)
+        value, pos = _parse_value(text, match.end())
+        name = match.group(1)
+        # Repeated keys (e.g. bkpt={...},bkpt={...}) are collected into a list
+        if name in repeated:
+            results[name].append(value)
+        elif name in results:
+            results[name] = [results[name], value]
+            repeated.add(name)
+        else:
+            results[name] = value
+        if pos >= len(text):
+            return results, pos
+        if text[pos] == ',':
+            pos += 1
+            continue
+        if closing and text[pos] == closing:
+            return results, pos + 1
+        return results, pos
+
+
+def parse_record(line):
+    if not line or line == '(gdb)':
+        return {'type': 'prompt'}
+    kind = line[0]
+    if kind in '~@&':
+        match = C_STRING.match(line, 1)
+        text = decode_c_string(match.group(1)) if match else line[1:]
+        return {'type': RECORD_TYPES[kind], 'text': text}
+    match = RECORD_HEAD.match(line)
+    if not match:
+        # Anything else is the program writing to gdb's stdout (no pty for it)
+        return {'type': 'program', 'text': line + '\n'}
+    token, kind, cls = match.groups()
+    pos = match.end()
+    payload = {}
+    if pos < len(line) and line[pos] == ',':
+        try:
+            payload, _ = _parse_results(line, pos + 1)
+        except (ValueError, IndexError, AttributeError):
+            payload = {'raw': line[pos + 1:]}
+    return {
+        'type': RECORD_TYPES[kind],
+        'token': int(token) if token else None,
+        'class': cls,
+        'payload': payload,
+    }
+
+
+class MIParser:
+    # Accepts arbitrary chunks of gdb output and yields complete records
+    def __init__(self):
+        self.pending = b''
+
+    def feed(self, data):
+        self.pending += data
+        *lines, self.pending = self.pending.split(b'\n')
+        records = []
+        for raw in lines:
+            line = raw.decode('utf-8', errors='replace').rstrip('\r')
+            if line.strip():
+                records.append(parse_record(line.rstrip()))
+        return records
+
+
+# -------------------------------
+# Asynchronous gdb session control
+# -------------------------------
+class GdbController:
+    def __init__(self, exe, gdb_path='gdb'):
+        self.exe = exe
+        self.gdb_path = gdb_path
+        self.proc = None
+        self.records = queue.Queue()
+        self.callbacks = {}
+        self.handlers = {}
+        self.next_token = 1
+        self.running = False
+        self.tty = None     # (master, slave) of the program's terminal
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            [self.gdb_path, '--interpreter=mi3', '-q', self.exe],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0
+        )
+        threading.Thread(target=self._reader, daemon=True).start()
+        # Without async mode gdb reads no commands while the program runs, so
+        # -exec-interrupt and breakpoint changes would wait for the next stop
+        self.send("-gdb-set mi-async on")
+        self._separate_program_io()
+
+    def _separate_program_io(self):
+        # The program must not share gdb's pipes: it would read the MI commands
+        # from stdin and write into the MI stream. It gets a pty of its own,
+        # whose output is queued as 'program' records.
+        if pty is not None:
+            try:
+                self.tty = pty.openpty()
+            except OSError:
+                self.tty = None
+        if self.tty is None:
+            self.send(f'-exec-arguments < "{os.devnull}"')
+            return
+        master, slave = self.tty
+        self.send(f"-inferior-tty-set {os.ttyname(slave)}")
+        threading.Thread(target=self._tty_reader, args=(master,), daemon=True).start()
+
+    def _tty_reader(self, master):
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        while True:
+            try:
+                data = os.read(master, 65536)
+            except OSError:     # closed by stop()
+                break
+            if not data:
+                break
+            # The terminal turns each newline into \r\n
+            self.records.put({'type': 'program', 'text': decoder.decode(data).replace('\r\n', '\n')})
+
+    def send_input(self, text):
+        # Typed at the program's terminal; the pty echoes it back as output
+        if self.tty is not None:
+            os.write(self.tty[0], text.encode('utf-8'))
+
+    def _reader(self):
+        # Parsing happens here, off the Tk thread; the UI only drains the queue
+        parser = MIParser()
+        stream = self.proc.stdout
+        while True:
+            data = stream.read1(65536) if hasattr(stream, 'read1') else os.read(stream.fileno(), 65536)
+            if not data:
+                break
+            for record in parser.feed(data):
+                self.records.put(record)
+        self.records.put({'type': 'exit'})
+
+    def on(self, record_type, handler):
+        self.handlers[record_type] = handler
+
+    def send(self, command, callback=None):
+        if not self.proc or self.proc.poll() is not None:
+            return None
+        token = self.next_token
+        self.next_token += 1
+        if callback:
+            self.callbacks[token] = callback
+        try:
+            self.proc.stdin.write(f"{token}{command}\n".encode('utf-8'))
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self.callbacks.pop(token, None)
+            return None
+        return token
+
+    def poll(self, budget=0.008):
+        # Dispatch queued records until the time budget for this tick is used up
+        deadline = time.perf_counter() + budget
+        while time.perf_counter() < deadline:
+            try:
+                record = self.records.get_nowait()
+            except queue.Empty:
+                return False
+            self._dispatch(record)
+        return not self.records.empty()
+
+    def _dispatch(self, record):
+        kind = record['type']
+        if kind == 'exec':
+            self.running = record['class'] == 'running'
+        if kind == 'result' and record['token'] in self.callbacks:
+            self.callbacks.pop(record['token'])(record)
+        handler = self.handlers.get(kind)
+        if handler:
+            handler(record)
+
+    def break_insert(self, filename, line, callback=None):
+        return self.send(f'-break-insert "{filename}:{line}"', callback)
+
+    def break_delete(self, number):
+        return self.send(f"-break-delete {number}")
+
+    def run(self):
+        return self.send("-exec-run")
+
+    def cont(self):
+        return self.send("-exec-continue")
+
+    def next(self):
+        return self.send("-exec-next")
+
+    def step(self):
+        return self.send("-exec-step")
+
+    def finish(self):
+        return self.send("-exec-finish")
+
+    def interrupt(self):
+        return self.send("-exec-interrupt")
+
+    def list_frames(self, callback):
+        return self.send("-stack-list-frames", callback)
+
+    def list_variables(self, callback):
+        # --simple-values keeps big structs and arrays out of the reply
+        return self.send("-stack-list-variables --simple-values", callback)
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.send("-gdb-exit")
+            try:
+                self.proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        if self.tty is not None:
+            for fd in self.tty:
+                os.close(fd)
+            self.tty = None
@@ -0,0 +1,296 @@
+import ast
+import bisect
+import os
+import re
+from collections import Counter
+
+# ------------------------------------------
+# Running editor code without a display
+# ------------------------------------------
+# FakeText is a pure-Python model of the parts of tkinter.Text the editors
+# use. Every call does the equivalent work (index arithmetic, tag range
+# bookkeeping, regex search over the buffer) so relative costs stay honest,
+# and every call is counted: widget round trips are the cost that dominates
+# against a real Tk, and the count doesn't depend on the machine.
+# load_script_definitions pulls selected functions and constants out of the
+# GUI scripts (main.py, newMain.py) that build their window at import time.
+
+_INDEX = re.compile(r'^\s*([^\s+-]+)((?:\s*[+-]\s*\d+\s*(?:c|chars|l|lines)|\s+(?:linestart|lineend))*)\s*$')
+_MODIFIER = re.compile(r'\s*([+-])\s*(\d+)\s*(c|chars|l|lines)|\s+(linestart|lineend)')
+# Tcl regular expressions spell word boundaries \y, \m and \M; \b is a backspace
+_TCL_ESCAPES = {'y': r'\b', 'm': r'\b(?=\w)', 'M': r'\b(?<=\w)', 'b': r'\x08'}
+_TCL_ESCAPE = re.compile(r'\\(.)')
+
+
+def tcl_regex(pattern):
+    return _TCL_ESCAPE.sub(lambda m: _TCL_ESCAPES.get(m.group(1), m.group(0)), pattern)
+
+
+class FakeText:
+    def __init__(self, content=''):
+        self.text = '\n'          # like Tk, the buffer always ends with a newline
+        self.line_starts = [0, 1]
+        self.tags = {}            # tag -> [(start, end)] offsets, possibly overlapping
+        self.tag_options = {}
+        self.marks = {'insert': 0}
+        self.options = {'state': 'normal', 'autoseparators': True, 'undo': False}
+        self.calls = Counter()
+        if content:
+            self.insert('1.0', content)
+        self.calls.clear()
+
+    # -- index arithmetic --
+    def _rebuild(self):
+        self.line_starts = [0] + [m.end() for m in re.finditer('\n', self.text)]
+
+    def _line_col(self, offset):
+        line = bisect.bisect_right(self.line_starts, offset) - 1
+        return line + 1, offset - self.line_starts[line]
+
+    def _line_end(self, line):
+        # offset of the newline that ends 1-based line
+        return self.line_starts[line] - 1 if line < len(self.line_starts) else len(self.text) - 1
+
+    def _offset(self, index):
+        if isinstance(index, (int, float)):
+            index = f"{index:.1f}" if isinstance(index, float) else f"{index}.0"
+        match = _INDEX.match(str(index))
+        if not match:
+            raise ValueError(f'bad text index "{index}"')
+        base, modifiers = match.groups()
+        if base == 'end':
+            offset = len(self.text)
+        elif base in self.marks:
+            offset = self.marks[base]
+        elif base.endswith('.first') or base.endswith('.last'):
+            tag, which = base.rsplit('.', 1)
+            ranges = self.tags.get(tag)
+            if not ranges:
+                raise ValueError(f'text doesn\'t contain any characters tagged with "{tag}"')
+            offset = min(r[0] for r in ranges) if which == 'first' else max(r[1] for r in ranges)
+        else:
+            line, _, col = base.partition('.')
+            line = int(line)
+            if line < 1:
+                offset = 0
+            elif line >= len(self.line_starts):
+                offset = len(self.text)
+            else:
+                end = self._line_end(line)
+                offset = end if col == 'end' else min(self.line_starts[line - 1] + int(col), end)
+        for sign, count, unit, anchor in _MODIFIER.findall(modifiers):
+            if anchor:
+                line, _ = self._line_col(min(offset, len(self.text) - 1))
+                offset = self.line_starts[line - 1] if anchor == 'linestart' else self._line_end(line)
+            elif unit in ('c', 'chars'):
+                offset += int(count) if sign == '+' else -int(count)
+            else:
+                line, col = self._line_col(min(offset, len(self.text) - 1))
+                line = max(1, min(len(self.line_starts) - 1, line + (int(count) if sign == '+' else -int(count))))
+                offset = min(self.line_starts[line - 1] + col, self._line_end(line))
+            offset = max(0, min(offset, len(self.text)))
+        return offset
+
+    def _index(self, offset):
+        line, col = self._line_col(offset)
+        return f"{line}.{col}"
+
+    # -- the Text API --
+    def index(self, index):
+        self.calls['index'] += 1
+        return self._index(self._offset(index))
+
+    def compare(self, a, op, b):
+        self.calls['compare'] += 1
+        return {'<': int.__lt__, '<=': int.__le__, '==': int.__eq__, '>=': int.__ge__,
+                '>': int.__gt__, '!=': int.__ne__}[op](self._offset(a), self._offset(b))
+
+    def get(self, index1, index2=None):
+        self.calls['get'] += 1
+        start = self._offset(index1)
+        end = start + 1 if index2 is None else self._offset(index2)
+        return self.text[start:min(end, len(self.text))]
+
+    def insert(self, index, chars, *args):
+        self.calls['insert'] += 1
+        chunks = [chars] + list(args[1::2])
+        chars = ''.join(chunks)
+        if not chars or self.options['state'] != 'normal':
+            return
+        offset = min(self._offset(index), len(self.text) - 1)  # never after the final newline
+        self.text = self.text[:offset] + chars + self.text[offset:]
+        self._shift(offset, len(chars))
+        self._rebuild()
+
+    def delete(self, index1, index2=None):
+        self.calls['delete'] += 1
+        if self.options['state'] != 'normal':
+            return
+        start = self._offset(index1)
+        end = start + 1 if index2 is None else self._offset(index2)
+        end = min(end, len(self.text) - 1)
+        if start >= end:
+            return
+        self.text = self.text[:start] + self.text[end:]
+        self._shift(start, start - end, end)
+        self._rebuild()
+
+    def _shift(self, at, delta, removed_end=None):
+        # Text inserted where a tag range starts is not tagged (Tk only tags it
+        # when both neighbours carry the tag); the insert mark has right gravity
+        def move(pos, right=False):
+            if removed_end is not None:
+                return pos if pos <= at else at if pos <= removed_end else pos + delta
+            return pos + delta if pos > at or (right and pos == at) else pos
+        for name, pos in self.marks.items():
+            self.marks[name] = move(pos, right=name == 'insert')
+        for tag, ranges in self.tags.items():
+            moved = ((move(s, right=True), move(e)) for s, e in ranges)
+            self.tags[tag] = [(s, e) for s, e in moved if s < e]
+
+    def search(self, pattern, index, stopindex=None, forwards=None, backwards=None, exact=None,
+               regexp=None, nocase=None, count=None, elide=None):
+        self.calls['search'] += 1
+        flags = re.IGNORECASE if nocase else 0
+        regex = re.compile(tcl_regex(pattern) if regexp else re.escape(pattern), flags | re.MULTILINE)
+        start = self._offset(index)
+        if backwards:
+            stop = self._offset(stopindex) if stopindex else 0
+            found = None
+            for match in regex.finditer(self.text, stop, start):
+                found = match
+            if found is None and not stopindex:
+                for match in regex.finditer(self.text, start):
+                    found = match
+        else:
+            stop = self._offset(stopindex) if stopindex else len(self.text)
+            found = regex.search(self.text, start, stop)
+            if found is None and not stopindex:
+                found = regex.search(self.text, 0, start)  # Tk wraps around without a stop index
+        if found is None:
+            return ''
+        if count is not None:
+            count.set(found.end() - found.start())
+        return self._index(found.start())
+
+    def tag_add(self, tag, index1, *args):
+        self.calls['tag_add'] += 1
+        indices = (index1,) + args
+        if len(indices) % 2:
+            indices += (f"{indices[-1]}+1c",)
+        ranges = self.tags.setdefault(tag, [])
+        for i in range(0, len(indices), 2):
+            start, end = self._offset(indices[i]), self._offset(indices[i + 1])
+            if start < end:
+                ranges.append((start, end))
+
+    def tag_remove(self, tag, index1, index2=None):
+        self.calls['tag_remove'] += 1
+        ranges = self.tags.get(tag)
+        if not ranges:
+            return
+        start = self._offset(index1)
+        end = start + 1 if index2 is None else self._offset(index2)
+        kept = []
+        for s, e in ranges:
+            if e <= start or s >= end:
+                kept.append((s, e))
+                continue
+            if s < start:
+                kept.append((s, start))
+            if e > end:
+                kept.append((end, e))
+        self.tags[tag] = kept
+
+    def tag_ranges(self, tag):
+        self.calls['tag_ranges'] += 1
+        merged = []
+        for s, e in sorted(self.tags.get(tag, ())):
+            if merged and s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        return tuple(self._index(pos) for pair in merged for pos in pair)
+
+    def tag_names(self, index=None):
+        self.calls['tag_names'] += 1
+        if index is None:
+            return tuple(self.tags) + tuple(t for t in self.tag_options if t not in self.tags)
+        offset = self._offset(index)
+        return tuple(tag for tag, ranges in self.tags.items() if any(s <= offset < e for s, e in ranges))
+
+    def tag_delete(self, *tags):
+        self.calls['tag_delete'] += 1
+        for tag in tags:
+            self.tags.pop(tag, None)
+            self.tag_options.pop(tag, None)
+
+    def tag_configure(self, tag, **options):
+        self.calls['tag_configure'] += 1
+        self.tag_options.setdefault(tag, {}).update(options)
+
+    tag_config = tag_configure
+
+    def tag_raise(self, tag, above=None):
+        self.calls['tag_raise'] += 1
+
+    def tag_lower(self, tag, below=None):
+        self.calls['tag_lower'] += 1
+
+    def mark_set(self, name, index):
+        self.calls['mark_set'] += 1
+        self.marks[name] = self._offset(index)
+
+    def see(self, index):
+        self.calls['see'] += 1
+
+    def bbox(self, index):
+        self.calls['bbox'] += 1
+        return None  # nothing is ever on screen
+
+    def yview(self, *args):
+        self.calls['yview'] += 1
+        return (0.0, 1.0) if not args else None
+
+    def cget(self, option):
+        self.calls['cget'] += 1
+        return self.options.get(option, '')
+
+    def configure(self, **options):
+        self.calls['configure'] += 1
+        self.options.update(options)
+
+    config = configure
+
+    def edit_separator(self):
+        self.calls['edit_separator'] += 1
+
+    def after_idle(self, callback, *args):
+        raise RuntimeError("FakeText has no event loop; drain UIScheduler jobs with flush()")
+
+
+def load_script_definitions(path, names):
+    # Executes a script's imports, its UPPER_CASE constants and the named
+    # top-level functions, classes and variables, skipping everything else (the
+    # Tk() call, widget setup, mainloop). Where a function or class is defined
+    # twice, the first definition wins.
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    wanted = set(names)
+    body = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            body.append(node)
+        elif isinstance(node, (ast.FunctionDef, ast.ClassDef)) and node.name in wanted:
+            wanted.discard(node.name)
+            body.append(node)
+        elif (isinstance(node, ast.Assign) and all(isinstance(t, ast.Name) for t in node.targets)
+              and any(t.id in wanted or t.id.isupper() for t in node.targets)):
+            body.append(node)
+    name = os.path.splitext(os.path.basename(path))[0]
+    namespace = {'__name__': f"{name}_definitions", '__file__': path}
+    exec(compile(ast.Module(body=body, type_ignores=[]), path, 'exec'), namespace)
+    missing = set(names) - set(namespace)
+    if missing:
+        raise NameError(f"{path} does not define {', '.join(sorted(missing))}")
+    return namespace
@@ -0,0 +1,341 @@
+import bisect
+from html.parser import HTMLParser
+
+from text_diff import common_prefix, common_suffix
+
+# ---------------------------------------
+# Incremental HTML validator
+# ---------------------------------------
+# Streams the document through html.parser and reports unclosed and
+# mismatched tags, stray end tags, duplicate ids and bad nesting. The document
+# is cut into segments of about CHECKPOINT_EVERY characters, each starting
+# where the parser stood between two constructs and recording the open
+# elements there, plus the errors and ids found inside it at segment-relative
+# offsets. After an edit, parsing resumes at the segment holding the first
+# changed character and stops at the first later segment whose starting state
+# matches the previous run; the segments from there on are reused, with only
+# their start offsets moved.
+
+CHUNK = 4096
+CHECKPOINT_EVERY = 8192
+MAX_ERRORS = 100
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'frame', 'keygen',
+}
+# End tags the HTML spec lets authors leave out
+OPTIONAL_END = {
+    'html', 'head', 'body', 'p', 'li', 'dt', 'dd', 'option', 'optgroup', 'tr', 'td',
+    'th', 'thead', 'tbody', 'tfoot', 'colgroup', 'caption', 'rt', 'rp',
+}
+BLOCK_ELEMENTS = {
+    'address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'header', 'hr', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'ul',
+}
+# Opening the key element implicitly closes an open element from the value set
+IMPLIED_END = {tag: {'p'} for tag in BLOCK_ELEMENTS}
+IMPLIED_END.update({
+    'li': {'li', 'p'},
+    'dt': {'dt', 'dd', 'p'},
+    'dd': {'dt', 'dd', 'p'},
+    'option': {'option'},
+    'optgroup': {'option', 'optgroup'},
+    'tr': {'tr', 'td', 'th'},
+    'td': {'td', 'th'},
+    'th': {'td', 'th'},
+    'thead': {'tbody', 'tfoot', 'tr', 'td', 'th', 'caption', 'colgroup'},
+    'tbody': {'thead', 'tbody', 'tfoot', 'tr', 'td', 'th', 'caption', 'colgroup'},
+    'tfoot': {'thead', 'tbody', 'tr', 'td', 'th', 'caption', 'colgroup'},
+    'body': {'head'},
+})
+REQUIRED_PARENTS = {
+    'li': {'ul', 'ol', 'menu'},
+    'dt': {'dl', 'div'},
+    'dd': {'dl', 'div'},
+    'tr': {'table', 'thead', 'tbody', 'tfoot'},
+    'td': {'tr'},
+    'th': {'tr'},
+    'thead': {'table'},
+    'tbody': {'table'},
+    'tfoot': {'table'},
+    'caption': {'table'},
+    'colgroup': {'table'},
+    'option': {'select', 'datalist', 'optgroup'},
+    'optgroup': {'select'},
+}
+# Elements that may not contain themselves at any depth
+NO_SELF_NESTING = {'a', 'form', 'button', 'label'}
+# Elements whose content is phrasing only, so block elements may not go inside
+PHRASING_ONLY = {
+    'span', 'b', 'i', 'em', 'strong', 'small', 'code', 'label', 'abbr', 'cite', 'q',
+    'sub', 'sup', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'button',
+}
+
+
+class _Segment:
+    __slots__ = ('offset', 'stack', 'errors', 'ids')
+
+    def __init__(self, offset, stack):
+        self.offset = offset    # where the parser stood between two constructs
+        self.stack = stack      # tuple of (tag, offset) open at that point
+        self.errors = []        # (relative offset, message, ref) found in this segment
+        self.ids = []           # (relative offset, id) defined in this segment
+
+
+class _Parser(HTMLParser):
+    def __init__(self, checker, base):
+        super().__init__(convert_charrefs=False)
+        self.checker = checker
+        self.base = base              # document offset of the first character fed
+        self.line_starts = [0]        # offsets (relative to base) where each fed line starts
+        self.fed = 0
+
+    def feed_text(self, text):
+        find = text.find
+        pos = find('\n')
+        while pos != -1:
+            self.line_starts.append(self.fed + pos + 1)
+            pos = find('\n', pos + 1)
+        self.fed += len(text)
+        self.feed(text)
+
+    def here(self):
+        # Document offset of the construct being handled
+        line, col = self.getpos()
+        return self.base + self.line_starts[line - 1] + col
+
+    def safe_offset(self):
+        # Offset up to which everything has been parsed, or None inside <script>/<style>
+        if self.cdata_elem is not None:
+            return None
+        return self.base + self.fed - len(self.rawdata)
+
+    def handle_starttag(self, tag, attrs):
+        self.checker._start_tag(tag, attrs, self.here())
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/> and XHTML-style <div/> both count as opened and closed
+        offset = self.here()
+        self.checker._start_tag(tag, attrs, offset)
+        if tag not in VOID_ELEMENTS:
+            self.checker._end_tag(tag, offset)
+
+    def handle_endtag(self, tag):
+        self.checker._end_tag(tag, self.here())
+
+
+class HTMLChecker:
+    def __init__(self):
+        self.text = ''
+        self.segments = []
+        self.id_segments = {}    # id -> segments defining it, in document order
+        self.final_stack = ()
+        self.stack = []
+        self.current = None      # segment being filled by the parser
+        self.resume_offset = 0
+        self.region_ids = set()  # ids defined since parsing resumed
+        self.checked = False
+        self.stats = {'parsed': 0, 'reused': 0}
+
+    # -- parser callbacks --
+
+    def _error(self, offset, message, ref=None):
+        # A message that names another line is a (head, tail) pair; ref is the
+        # offset or id name whose line goes between them. Tag names and ids
+        # come from the document, so they never go through str.format.
+        self.current.errors.append((offset - self.current.offset, message, ref))
+
+    def _defined_before(self, value):
+        if value in self.region_ids:
+            return True
+        segments = self.id_segments.get(value)
+        return bool(segments) and segments[0].offset < self.resume_offset
+
+    def _start_tag(self, tag, attrs, offset):
+        stack = self.stack
+        closes = IMPLIED_END.get(tag)
+        while closes and stack and stack[-1][0] in closes:
+            stack.pop()
+        if tag in NO_SELF_NESTING and any(open_tag == tag for open_tag, _ in stack):
+            self._error(offset, f"<{tag}> cannot be nested inside another <{tag}>")
+        parent = stack[-1][0] if stack else None
+        required = REQUIRED_PARENTS.get(tag)
+        if required and parent not in required and parent != 'template':
+            allowed = ', '.join(f"<{name}>" for name in sorted(required))
+            self._error(offset, f"<{tag}> must be inside {allowed}")
+        elif tag in BLOCK_ELEMENTS and parent in PHRASING_ONLY:
+            self._error(offset, (f"block element <{tag}> inside <{parent}> opened on line ", ""), stack[-1][1])
+        for name, value in attrs:
+            if name == 'id' and value:
+                if self._defined_before(value):
+                    self._error(offset, (f'duplicate id "{value}" (first used on line ', ")"), value)
+                self.region_ids.add(value)
+                self.current.ids.append((offset - self.current.offset, value))
+        if tag not in VOID_ELEMENTS:
+            stack.append((tag, offset))
+
+    def _end_tag(self, tag, offset):
+        stack = self.stack
+        for depth in range(len(stack) - 1, -1, -1):
+            if stack[depth][0] == tag:
+                break
+        else:
+            if tag in VOID_ELEMENTS:
+                self._error(offset, f"<{tag}> is a void element and takes no end tag")
+            else:
+                self._error(offset, f"unexpected closing tag </{tag}>")
+            return
+        for open_tag, opened_at in stack[depth + 1:]:
+            if open_tag not in OPTIONAL_END:
+                self._error(offset, (f"</{tag}> found while <{open_tag}> from line ", " is still open"), opened_at)
+        del stack[depth:]
+
+    # -- incremental driver --
+
+    def check(self, text):
+        # Returns [(line, column, message)] for the whole document
+        old_text = self.text
+        if text == old_text and self.checked:
+            return self._report()
+        prefix = common_prefix(old_text, text)
+        suffix = common_suffix(old_text, text, prefix)
+        old_end = len(old_text) - suffix
+        delta = len(text) - len(old_text)
+
+        def shift(offset):
+            # Maps an offset in the old text to the new one, or None inside the edit
+            if offset < prefix:
+                return offset
+            if offset >= old_end:
+                return offset + delta
+            return None
+
+        old = self.segments if self.checked else []
+        index = max(0, bisect.bisect_right([seg.offset for seg in old], prefix) - 1)
+        start, stack = (old[index].offset, old[index].stack) if old else (0, ())
+        self.text = text
+        self.checked = True
+        self.stack = list(stack)
+        self.resume_offset = start
+        self.region_ids = set()
+        self.current = _Segment(start, stack)
+        region = [self.current]
+
+        # Old segment starts past the edit, in new coordinates: where the runs may converge
+        targets = {seg.offset + delta: i for i, seg in enumerate(old) if seg.offset >= old_end}
+        target_offsets = sorted(targets)
+        next_target = 0
+
+        parser = _Parser(self, start)
+        pos = start
+        while pos < len(text):
+            stop = min(pos + CHUNK, len(text))
+            # Feed exactly up to the next old segment so the states can be compared there
+            while next_target < len(target_offsets) and target_offsets[next_target] <= pos:
+                next_target += 1
+            if next_target < len(target_offsets) and target_offsets[next_target] < stop:
+                stop = target_offsets[next_target]
+            parser.feed_text(text[pos:stop])
+            self.stats['parsed'] += stop - pos
+            pos = stop
+            safe = parser.safe_offset()
+            if safe is None:
+                continue
+            if safe in targets and self._converged(old, index, targets[safe], region, shift):
+                reused = old[targets[safe]:]
+                for seg in reused:
+                    seg.offset += delta
+                    seg.stack = tuple((tag, shift(offset)) for tag, offset in seg.stack)
+                    if any(isinstance(ref, int) for _, _, ref in seg.errors):
+                        seg.errors = [(rel, message, shift(ref) if isinstance(ref, int) else ref)
+                                      for rel, message, ref in seg.errors]
+                self.final_stack = tuple((tag, shift(offset)) for tag, offset in self.final_stack)
+                self._reindex(old[index:targets[safe]], region)
+                self.segments = old[:index] + region + reused
+                self.stats['reused'] += len(text) - safe
+                return self._report()
+            if safe - self.current.offset >= CHECKPOINT_EVERY:
+                self.current = _Segment(safe, tuple(self.stack))
+                region.append(self.current)
+
+        rest = parser.rawdata
+        if rest.startswith('<!--'):
+            self._error(parser.base + parser.fed - len(rest), "unterminated comment")
+        elif rest[:1] == '<' and (rest[1:2].isalpha() or rest[1:2] == '/'):
+            self._error(parser.base + parser.fed - len(rest), "unterminated tag")
+        parser.close()
+        self.final_stack = tuple(self.stack)
+        self._reindex(old[index:], region)
+        self.segments = old[:index] + region
+        return self._report()
+
+    def _converged(self, old, first, index, region, shift):
+        # Same open elements and same ids defined since parsing resumed
+        if tuple((tag, shift(offset)) for tag, offset in old[index].stack) != tuple(self.stack):
+            return False
+        old_ids = sorted(value for seg in old[first:index] for _, value in seg.ids)
+        return old_ids == sorted(value for seg in region for _, value in seg.ids)
+
+    def _reindex(self, removed, added):
+        # Keeps id -> segments current, touching only the re-parsed segments
+        for seg in removed:
+            for _, value in seg.ids:
+                segments = self.id_segments.get(value)
+                if segments and seg in segments:
+                    segments.remove(seg)
+                    if not segments:
+                        del self.id_segments[value]
+        for seg in added:
+            for _, value in seg.ids:
+                segments = self.id_segments.setdefault(value, [])
+                if seg in segments:
+                    continue
+                i = len(segments)
+                while i and segments[i - 1].offset > seg.offset:
+                    i -= 1
+                segments.insert(i, seg)
+
+    def _first_id(self, value):
+        segments = self.id_segments.get(value)
+        if not segments:
+            return None
+        seg = segments[0]
+        return seg.offset + next(rel for rel, found in seg.ids if found == value)
+
+    def _report(self):
+        found = []
+        for seg in self.segments:
+            for rel, message, ref in seg.errors:
+                found.append((seg.offset + rel, message, ref))
+        for tag, opened_at in self.final_stack:
+            if tag not in OPTIONAL_END:
+                found.append((opened_at, f"<{tag}> was never closed", None))
+        found.sort(key=lambda error: error[0])
+        found = [(offset, message, self._first_id(ref) if isinstance(ref, str) else ref)
+                 for offset, message, ref in found[:MAX_ERRORS]]
+
+        # Offsets to lines by counting newlines between consecutive positions
+        text = self.text
+        positions = {offset for offset, _, _ in found}
+        positions.update(ref for _, _, ref in found if ref is not None)
+        lines = {}
+        line, last = 1, 0
+        for offset in sorted(positions):
+            line += text.count('\n', last, offset)
+            last = offset
+            lines[offset] = (line, offset - text.rfind('\n', 0, offset))
+
+        report = []
+        for offset, message, ref in found:
+            if isinstance(message, tuple):
+                head, tail = message
+                message = f"{head}{lines[ref][0] if ref is not None else '?'}{tail}"
+            report.append((*lines[offset], message))
+        return report
+
+
+def check_html(text):
+    # One-shot validation of a whole document
+    return HTMLChecker().check(text)
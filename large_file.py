@@ -0,0 +1,99 @@
+import codecs
+import mmap
+import os
+
+from ui_scheduler import scheduler_for
+
+# ---------------------------------
+# Progressive loading of big files
+# ---------------------------------
+# Opening a file used to read it whole with f.read(), insert it into the Text
+# widget in one call and highlight it straight away, which freezes the UI on
+# a 100 MB log and holds several copies of it at once. ProgressiveLoader maps
+# the file with mmap and inserts CHUNK_BYTES at a time as a UI scheduler job,
+# so the window keeps redrawing and reporting progress while the file
+# streams in. The widget stays disabled until the last chunk is in; callers
+# hold back highlighting and checks until on_done. Files of READ_ONLY_BYTES
+# or more stay read-only afterwards and are never highlighted or checked.
+# Text is decoded as UTF-8 (bad bytes become U+FFFD) with universal newlines,
+# like open() in text mode.
+
+CHUNK_BYTES = 256 * 1024
+READ_ONLY_BYTES = 20 * 1024 * 1024
+
+
+def file_size(path):
+    return os.path.getsize(path)
+
+
+def read_chunks(path, chunk=CHUNK_BYTES, encoding='utf-8'):
+    # Yields (text, bytes read so far). A chunk ends after its last newline
+    # when it has one, so a \r\n pair is never split between chunks.
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return      # an empty file can't be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            decoder = codecs.getincrementaldecoder(encoding)('replace')
+            pos = 0
+            while pos < size:
+                end = min(pos + chunk, size)
+                if end < size:
+                    newline = data.rfind(b'\n', pos, end)
+                    if newline >= 0:
+                        end = newline + 1
+                    elif data[end - 1] == 0x0D and end - 1 > pos:
+                        end -= 1
+                text = decoder.decode(data[pos:end], end == size)
+                pos = end
+                yield text.replace('\r\n', '\n').replace('\r', '\n'), pos
+
+
+def format_progress(name, loaded, size):
+    return f"{name} ({loaded * 100 // size if size else 100}%)"
+
+
+class ProgressiveLoader:
+    # on_progress(loaded, size) runs after every chunk, on_done(loader) once at the end
+    def __init__(self, text_widget, path, on_progress=None, on_done=None, chunk=CHUNK_BYTES):
+        self.text = text_widget
+        self.path = path
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.chunk = chunk
+        self.size = file_size(path)
+        self.read_only = self.size >= READ_ONLY_BYTES
+        self.loaded = 0
+        self.cursor = '1.0'     # where the insert mark goes once everything is in
+        self.scheduler = scheduler_for(text_widget)
+        self.key = (self, 'load')
+
+    @property
+    def running(self):
+        return self.scheduler.pending(self.key)
+
+    def start(self):
+        self.scheduler.submit(self.key, self._load())
+        return self
+
+    def cancel(self):
+        self.scheduler.cancel(self.key)
+
+    def _load(self):
+        text = self.text
+        text.config(state='normal')
+        text.delete('1.0', 'end')
+        text.config(state='disabled')
+        for chunk, self.loaded in read_chunks(self.path, self.chunk):
+            text.config(state='normal')
+            text.insert('end-1c', chunk)
+            text.config(state='disabled')
+            if self.on_progress:
+                self.on_progress(self.loaded, self.size)
+            yield
+        if not self.read_only:
+            text.config(state='normal')
+        text.mark_set('insert', self.cursor)
+        text.see(self.cursor)
+        if self.on_done:
+            self.on_done(self)
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# ---------------------------------
+# Per-event latency instrumentation
+# ---------------------------------
+# Handlers wrap their work in tracker.event(...) and its parts in
+# tracker.phase(...): gutter, highlighting, structure check, compiler
+# subprocess, autocomplete. Every span is kept (up to MAX_SPANS) for export as
+# Chrome trace-event JSON, which chrome://tracing and Perfetto open directly;
+# the last WINDOW durations of each name feed the p50/p95 status-bar HUD.
+
+MAX_SPANS = 50000
+WINDOW = 200
+HUD_INTERVAL_MS = 500
+HUD_NAMES = ['keystroke', 'gutter', 'highlight', 'structure', 'compiler', 'build', 'autocomplete']
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class LatencyTracker:
+    def __init__(self, max_spans=MAX_SPANS, window=WINDOW):
+        self.spans = deque(maxlen=max_spans)   # (name, category, start, duration, thread id)
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.origin = time.perf_counter()
+        self.enabled = True
+
+    def record(self, name, start, duration, category='phase'):
+        if not self.enabled:
+            return
+        self.spans.append((name, category, start, duration, threading.get_ident()))
+        self.samples[name].append(duration)
+
+    @contextmanager
+    def phase(self, name, category='phase'):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, category)
+
+    def event(self, name):
+        # The whole handler for one input or edit event; phases nest inside it
+        return self.phase(name, 'event')
+
+    def watch_input(self, widget, name='keystroke'):
+        # Key press until the idle callbacks queued while handling it have run.
+        # Tk defers idle callbacks queued during an idle pass to the next pass,
+        # so the inner one fires after the coalesced edit handlers.
+        def pressed(event):
+            start = time.perf_counter()
+            widget.after_idle(lambda: widget.after_idle(
+                lambda: self.record(name, start, time.perf_counter() - start, 'input')))
+        widget.bind('<KeyPress>', pressed, add='+')
+
+    def summary(self, names=None):
+        # {name: (p50, p95, count)} in seconds over the recent window
+        result = {}
+        for name in (names if names is not None else sorted(self.samples)):
+            values = sorted(self.samples.get(name, ()))
+            if values:
+                result[name] = (percentile(values, 0.5), percentile(values, 0.95), len(values))
+        return result
+
+    def clear(self):
+        self.spans.clear()
+        self.samples.clear()
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        main = threading.main_thread().ident
+        events = []
+        threads = set()
+        for name, category, start, duration, tid in list(self.spans):
+            threads.add(tid)
+            events.append({
+                'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': round((start - self.origin) * 1e6, 3), 'dur': round(duration * 1e6, 3),
+            })
+        for tid in threads:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': 'Tk main loop' if tid == main else f"worker {tid}"}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+        return len(self.spans)
+
+
+def format_hud(summary):
+    return "   ".join(f"{name} p50 {p50 * 1000:.1f} / p95 {p95 * 1000:.1f} ms"
+                       for name, (p50, p95, _) in summary.items()) or "No latency samples yet"
+
+
+class LatencyHUD:
+    # Keeps a Label showing live p50/p95 latencies
+    def __init__(self, label, tracker, names=HUD_NAMES, interval=HUD_INTERVAL_MS):
+        self.label = label
+        self.tracker = tracker
+        self.names = names
+        self.interval = interval
+        self.refresh()
+
+    def refresh(self):
+        self.label.config(text=format_hud(self.tracker.summary(self.names)))
+        self.label.after(self.interval, self.refresh)
+
+
+# Shared by every window in the process, so one trace covers the whole session
+tracker = LatencyTracker()
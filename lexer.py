@@ -0,0 +1,189 @@
+import re
+
+# ------------------------------------
+# Single-pass lexer for C, C++, Java, Python
+# ------------------------------------
+# One compiled alternation per language; finditer walks the buffer once in C
+# code and yields (kind, start, end). Whitespace is skipped, newlines are kept
+# so line-based consumers (indentation checks, line indexes) can use them.
+# A structural variant keeps only literals, comments and brackets (plus what
+# Python needs to find logical line ends), so everything else is skipped by
+# the regex engine instead of being yielded token by token.
+
+KIND_NAMES = [
+    'newline', 'comment', 'string', 'char', 'number', 'keyword', 'identifier',
+    'operator', 'bracket', 'preprocessor',
+    'unterminated_comment', 'unterminated_string', 'unterminated_char', 'other',
+]
+KINDS = {name: code for code, name in enumerate(KIND_NAMES)}
+
+NEWLINE = KINDS['newline']
+COMMENT = KINDS['comment']
+STRING = KINDS['string']
+CHAR = KINDS['char']
+NUMBER = KINDS['number']
+KEYWORD = KINDS['keyword']
+IDENTIFIER = KINDS['identifier']
+OPERATOR = KINDS['operator']
+BRACKET = KINDS['bracket']
+PREPROCESSOR = KINDS['preprocessor']
+UNTERMINATED_COMMENT = KINDS['unterminated_comment']
+UNTERMINATED_STRING = KINDS['unterminated_string']
+UNTERMINATED_CHAR = KINDS['unterminated_char']
+OTHER = KINDS['other']
+
+C_KEYWORDS = [
+    'auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do', 'double',
+    'else', 'enum', 'extern', 'float', 'for', 'goto', 'if', 'int', 'long', 'register',
+    'return', 'short', 'signed', 'sizeof', 'static', 'struct', 'switch', 'typedef',
+    'union', 'unsigned', 'void', 'volatile', 'while'
+]
+CPP_KEYWORDS = C_KEYWORDS + [
+    'bool', 'catch', 'class', 'constexpr', 'delete', 'false', 'friend', 'inline', 'namespace',
+    'new', 'nullptr', 'operator', 'private', 'protected', 'public', 'template', 'this', 'throw',
+    'true', 'try', 'typename', 'using', 'virtual'
+]
+JAVA_KEYWORDS = [
+    'abstract', 'boolean', 'break', 'byte', 'case', 'catch', 'char', 'class', 'continue',
+    'default', 'do', 'double', 'else', 'enum', 'extends', 'final', 'finally', 'float', 'for',
+    'if', 'implements', 'import', 'instanceof', 'int', 'interface', 'long', 'new', 'package',
+    'private', 'protected', 'public', 'return', 'short', 'static', 'super', 'switch', 'this',
+    'throw', 'throws', 'try', 'void', 'while', 'true', 'false', 'null'
+]
+PYTHON_KEYWORDS = [
+    'False', 'class', 'finally', 'is', 'return', 'None', 'continue', 'for', 'lambda',
+    'try', 'True', 'def', 'from', 'nonlocal', 'while', 'and', 'del', 'global', 'not',
+    'with', 'as', 'elif', 'if', 'or', 'yield', 'assert', 'else', 'import', 'pass',
+    'break', 'except', 'in', 'raise', 'async', 'await'
+]
+
+STRUCTURAL_KINDS = {
+    'comment', 'unterminated_comment', 'string', 'unterminated_string', 'char',
+    'unterminated_char', 'preprocessor', 'bracket',
+}
+
+# A directive runs to the end of the line, through continuations and block comments
+_PREPROCESSOR = r'^[ \t]*#(?:[^\n\\/]|\\[\s\S]|/\*[\s\S]*?\*/|/(?!\*))*'
+_C_LIKE_COMMON = [
+    ('comment', r'//[^\n]*|/\*[\s\S]*?\*/'),
+    ('unterminated_comment', r'/\*[\s\S]*'),
+]
+_C_STRINGS = [
+    ('string', r'"(?:[^"\\\n]|\\[\s\S])*"'),
+    ('unterminated_string', r'"(?:[^"\\\n]|\\[\s\S])*'),
+    ('char', r"'(?:[^'\\\n]|\\[\s\S])+'"),
+    ('unterminated_char', r"'(?:[^'\\\n]|\\[\s\S])*"),
+]
+_C_TAIL = [
+    ('newline', r'\n'),
+    ('bracket', r'[(){}\[\]]'),
+    ('identifier', r'[A-Za-z_$][\w$]*'),
+    ('operator', r'->|\+\+|--|<<=|>>=|<<|>>|[<>!=]=|&&|\|\||[-+*/%&|^]=|::|[-+*/%=<>!&|^~?:;,.]'),
+    ('other', r'[^\s]'),
+]
+
+LANGUAGE_RULES = {
+    'C': {
+        'keywords': C_KEYWORDS,
+        'structural_first': r"/#'\"()\[\]{}",
+        'rules': _C_LIKE_COMMON + [
+            ('preprocessor', _PREPROCESSOR),
+        ] + _C_STRINGS + [
+            ('number', r'\.?\d(?:[\w.]|[eEpP][+-])*'),
+        ] + _C_TAIL,
+    },
+    'C++': {
+        'keywords': CPP_KEYWORDS,
+        'rules': _C_LIKE_COMMON + [
+            ('preprocessor', _PREPROCESSOR),
+            ('string', r'(?:u8|[uUL])?R"(?P<delim>[^()\\\s]{0,16})\([\s\S]*?\)(?P=delim)"'),
+            ('unterminated_string', r'(?:u8|[uUL])?R"[^()\\\s]{0,16}\([\s\S]*'),
+        ] + _C_STRINGS + [
+            # C++14 digit separators: 1'000'000
+            ('number', r"\.?\d(?:[\w.']|[eEpP][+-])*"),
+        ] + _C_TAIL,
+        # digit separators would otherwise read as character literals
+        'structural_extra': [('number', r"\d[\w.']*")],
+        'structural_first': r"/#'\"()\[\]{}R\d",
+    },
+    'Java': {
+        'keywords': JAVA_KEYWORDS,
+        'structural_first': r"/'\"()\[\]{}",
+        'rules': _C_LIKE_COMMON + [
+            ('string', r'"""(?:[^"\\]|\\[\s\S]|"(?!""))*"""'),
+            ('unterminated_string', r'"""[\s\S]*'),
+        ] + _C_STRINGS + [
+            ('number', r'\.?\d(?:[\w.]|[eEpP][+-])*'),
+            ('operator', r'@'),
+        ] + _C_TAIL,
+    },
+    'Python': {
+        'keywords': PYTHON_KEYWORDS,
+        # string prefixes are left off: they never change where a literal ends
+        'structural_first': r"#'\"()\[\]{}\n:\\",
+        'rules': [
+            ('comment', r'#[^\n]*'),
+            ('string', r"(?i:[rbuf]{0,2})(?:'''(?:[^'\\]|\\[\s\S]|'(?!''))*'''|\"\"\"(?:[^\"\\]|\\[\s\S]|\"(?!\"\"))*\"\"\")"),
+            ('unterminated_string', r"(?i:[rbuf]{0,2})(?:'''|\"\"\")[\s\S]*"),
+            ('string', r"(?i:[rbuf]{0,2})(?:'(?:[^'\\\n]|\\[\s\S])*'|\"(?:[^\"\\\n]|\\[\s\S])*\")"),
+            ('unterminated_string', r"(?i:[rbuf]{0,2})(?:'(?:[^'\\\n]|\\[\s\S])*|\"(?:[^\"\\\n]|\\[\s\S])*)"),
+            ('number', r'\.?\d(?:[\w.]|[eE][+-])*'),
+            ('newline', r'\n'),
+            ('bracket', r'[(){}\[\]]'),
+            ('identifier', r'[^\W\d]\w*'),
+            ('operator', r'\*\*=?|//=?|>>=?|<<=?|->|:=|[<>!=]=|[-+*/%&|^@]=|[-+*/%=<>&|^~:;,.@]'),
+            ('other', r'[^\s]'),
+        ],
+        'structural_extra': [
+            ('newline', r'\n'),
+            ('operator', r':(?=[ \t\f]*(?:#[^\n]*)?(?:\n|\Z))'),  # a block header's colon
+            ('other', r'\\(?=\n)'),  # explicit line continuation
+        ],
+    },
+}
+
+_COMPILED = {}
+
+
+def _compile(lang, structural=False):
+    spec = LANGUAGE_RULES[lang]
+    rules = spec['rules']
+    if structural:
+        rules = [rule for rule in rules if rule[0] in STRUCTURAL_KINDS] + spec.get('structural_extra', [])
+    groups = []
+    kinds = []
+    for name, pattern in rules:
+        groups.append(f"(?P<g{len(kinds)}>{pattern})")
+        kinds.append(KINDS[name])
+    pattern = '|'.join(groups)
+    if structural:
+        # Cheap first-character test, so most positions are rejected at once
+        pattern = f"(?=[{spec['structural_first']}])(?:{pattern})"
+    regex = re.compile(pattern, re.MULTILINE)
+    # Map regex group numbers back to token kinds (named groups may nest numbered ones)
+    group_kinds = {regex.groupindex[f"g{i}"]: kind for i, kind in enumerate(kinds)}
+    _COMPILED[lang, structural] = (regex, group_kinds, frozenset(spec['keywords']))
+    return _COMPILED[lang, structural]
+
+
+def supported(lang):
+    return lang in LANGUAGE_RULES
+
+
+def tokenize(code, lang, start=0, end=None, structural=False):
+    # Yields (kind, start, end) for every non-whitespace token
+    regex, group_kinds, keywords = _COMPILED.get((lang, structural)) or _compile(lang, structural)
+    end = len(code) if end is None else end
+    for match in regex.finditer(code, start, end):
+        kind = group_kinds[match.lastindex] if match.lastindex in group_kinds else _outer_kind(match, group_kinds)
+        if kind == IDENTIFIER and match.group() in keywords:
+            kind = KEYWORD
+        yield kind, match.start(), match.end()
+
+
+def _outer_kind(match, group_kinds):
+    # lastindex points at an inner group (e.g. a raw-string delimiter); find its owner
+    for group, kind in group_kinds.items():
+        if match.start(group) != -1:
+            return kind
+    return OTHER
@@ -0,0 +1,82 @@
+import bisect
+import re
+
+# ------------------------------
+# Protection for very long lines
+# ------------------------------
+# Minified HTML/JS and generated data tables can put hundreds of kilobytes on
+# one line. The regex highlighters then scan the whole line for patterns
+# like '.*?' and //.*, tag every token on it, and Tk lays the line out as one
+# huge display line. Lines of LONG_LINE_CHARS or more get special handling.
+# Only their first TOKENIZE_WINDOW characters are tokenized and tagged:
+# ClippedText cuts the rest out of what a highlighter sees and maps match
+# offsets back to the real buffer. The view soft-wraps these lines and can
+# elide everything past VIEW_CHARS, which keeps layout and scrolling cheap.
+# The text itself is never changed.
+
+LONG_LINE_CHARS = 5000
+TOKENIZE_WINDOW = 2000
+VIEW_CHARS = 10000
+LONG_LINE_TAG = 'long_line'
+ELIDED_TAG = 'long_line_tail'
+
+
+def find_long_lines(code, limit=LONG_LINE_CHARS):
+    # [(line number, offset of its first character, length)]
+    result = []
+    line, last = 1, 0
+    for match in re.finditer(r'[^\n]{%d,}' % limit, code):
+        line += code.count('\n', last, match.start())
+        last = match.start()
+        result.append((line, match.start(), match.end() - match.start()))
+    return result
+
+
+class ClippedText:
+    # The code with every long line cut to its first `window` characters
+    def __init__(self, code, limit=LONG_LINE_CHARS, window=TOKENIZE_WINDOW):
+        self.long_lines = find_long_lines(code, limit)
+        self.cuts = []      # offsets in self.text where a line tail was removed
+        self.shifts = []    # characters removed up to and including each cut
+        parts, last, removed = [], 0, 0
+        for line, start, length in self.long_lines:
+            keep = start + window
+            parts.append(code[last:keep])
+            self.cuts.append(keep - removed)
+            removed += length - window
+            self.shifts.append(removed)
+            last = start + length
+        self.text = ''.join(parts) + code[last:] if parts else code
+
+    @property
+    def clipped(self):
+        return bool(self.cuts)
+
+    def to_original(self, offset):
+        # A match may end exactly at a cut; only what comes after moves
+        i = bisect.bisect_left(self.cuts, offset)
+        return offset + self.shifts[i - 1] if i else offset
+
+
+def mark_long_lines(text_widget, long_lines, elide=True, view=VIEW_CHARS):
+    # Soft-wraps the long lines and hides what lies past `view` on each
+    text_widget.tag_remove(LONG_LINE_TAG, '1.0', 'end')
+    text_widget.tag_remove(ELIDED_TAG, '1.0', 'end')
+    text_widget.tag_configure(LONG_LINE_TAG, wrap='char')
+    text_widget.tag_configure(ELIDED_TAG, elide=elide)
+    for line, start, length in long_lines:
+        text_widget.tag_add(LONG_LINE_TAG, f"{line}.0", f"{line}.end")
+        if length > view:
+            text_widget.tag_add(ELIDED_TAG, f"{line}.{view}", f"{line}.end")
+
+
+def mark_line_if_long(text_widget, index='insert', elide=True, limit=LONG_LINE_CHARS, view=VIEW_CHARS):
+    # Cheap per-edit check of the line being typed on
+    line, length = map(int, text_widget.index(f"{index} lineend").split('.'))
+    if length < limit or LONG_LINE_TAG in text_widget.tag_names(f"{line}.0"):
+        return
+    text_widget.tag_configure(LONG_LINE_TAG, wrap='char')
+    text_widget.tag_configure(ELIDED_TAG, elide=elide)
+    text_widget.tag_add(LONG_LINE_TAG, f"{line}.0", f"{line}.end")
+    if length > view:
+        text_widget.tag_add(ELIDED_TAG, f"{line}.{view}", f"{line}.end")
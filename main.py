@@ -4,6 +4,10 @@ import os
 import re
 import subprocess
 
+from build_profiles import BUILD_PROFILES, DEFAULT_PROFILE, build
+from edit_events import TextEditProxy, coalesce
+from structure_check import check_structure, format_errors
+
 # Define token types and their associated colors
 TOKEN_TYPES = {
     'keyword': '#FF79C6',      # Pink
@@ -59,22 +63,17 @@ def run(code):
         with open("temp.c", "w") as fp:
             fp.write(code)
 
-        compile_process = subprocess.run(
-            ["gcc", "temp.c", "-o", "a.exe"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        exe_path, compile_process = build("C", "temp.c", build_profile.get())
 
         terminal_output.config(state=NORMAL)
-        if compile_process.returncode != 0:
+        if compile_process is not None and compile_process.returncode != 0:
             terminal_output.insert(END, "Compilation Error:\n" + compile_process.stderr)
             terminal_output.config(state=DISABLED)
             return
 
         try:
             run_process = subprocess.run(
-                ["a.exe"],
+                [exe_path],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
@@ -93,27 +92,33 @@ def detect_errors(code):
     terminal_output.config(state=NORMAL)
     terminal_output.delete("1.0", END)
 
-    # Save code to temp file
-    with open("temp_live.c", "w") as f:
-        f.write(code)
+    # Definite structural errors skip the GCC run entirely
+    errors = check_structure(code, "C")
+    if errors:
+        stderr = format_errors(errors, "temp_live.c")
+    else:
+        # Save code to temp file
+        with open("temp_live.c", "w") as f:
+            f.write(code)
 
-    # Run GCC to check for syntax errors
-    process = subprocess.run(
-        ["gcc", "-fsyntax-only", "temp_live.c"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
+        # Run GCC to check for syntax errors
+        process = subprocess.run(
+            ["gcc", "-fsyntax-only", "temp_live.c"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        stderr = process.stderr
 
     # Display and highlight errors
-    if process.stderr:
+    if stderr:
         error_lines = set()
-        for line in process.stderr.splitlines():
+        for line in stderr.splitlines():
             match = re.search(r"temp_live\.c:(\d+):", line)
             if match:
                 error_lines.add(int(match.group(1)))
 
-        terminal_output.insert(END, process.stderr)
+        terminal_output.insert(END, stderr)
 
         for line_num in error_lines:
             index_start = f"{line_num}.0"
@@ -261,6 +266,12 @@ Button(root, text="RUN", padx=20, pady=2, bg='#50fa7b', fg='#282a36', activeback
        activeforeground='#282a36', borderwidth=0, font=('Helvetica', 12, 'bold'),
        command=lambda: run(text_area.get("1.0", END))).place(x= screen_width - 160, y=5)
 
+build_profile = StringVar(value=DEFAULT_PROFILE)
+profile_menu = OptionMenu(root, build_profile, *BUILD_PROFILES.keys())
+profile_menu.config(bg='#44475a', fg='#f8f8f2', activebackground='#6272a4', activeforeground='#f8f8f2',
+                    borderwidth=0, highlightthickness=0, font=('Helvetica', 10))
+profile_menu.place(x=screen_width - 330, y=5)
+
 terminal_output = Text(root, height=6, bg='#1e1e1e', fg='#f8f8f2', insertbackground='white',
                        font=('Courier', 12), wrap="word")
 terminal_output.place(x=10, y=screen_height - 200, width=screen_width - 80, height=150)
@@ -273,7 +284,9 @@ terminal_output.config(yscrollcommand=terminal_scroll.set)
 text_area.config(yscrollcommand=sync_scroll)
 text_area.tag_configure("error_line", underline=True, background="#FF5555")
 line_count_widget.config(yscrollcommand=sync_scroll)
-text_area.bind("<KeyRelease>", lambda e: (update_line_numbers(), detect_errors(text_area.get("1.0", END))))
+# Edits of any kind (typing, paste, undo) refresh line numbers and errors
+edit_proxy = TextEditProxy(text_area)
+edit_proxy.subscribe(coalesce(text_area, lambda: (update_line_numbers(), detect_errors(text_area.get("1.0", END)))))
 text_area.bind("<MouseWheel>", on_text_scroll)
 line_count_widget.bind("<MouseWheel>", on_text_scroll)
 text_area.bind("<KeyPress>", on_cursor_move)
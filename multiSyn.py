@@ -1,10 +1,30 @@
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
+import bisect
 import os
 import re
 import subprocess
+import threading
+import time
 import webbrowser
 
+from build_profiles import BUILD_PROFILES, DEFAULT_PROFILE, build, prepare_run_command, set_build_listener
+from case_runner import discover_cases, run_cases, format_results
+from document import Document
+from edit_events import TextEditProxy, coalesce
+from html_check import HTMLChecker, check_html
+from py_analysis import PythonAnalyzer
+from structure_check import check_structure, format_errors
+from ui_scheduler import scheduler_for
+from large_file import ProgressiveLoader, format_progress
+from long_lines import ClippedText, ELIDED_TAG, TOKENIZE_WINDOW, find_long_lines, mark_long_lines
+from token_store import store_for
+from lexer import (COMMENT, UNTERMINATED_COMMENT, PREPROCESSOR, STRING, CHAR, UNTERMINATED_STRING,
+                   UNTERMINATED_CHAR, KEYWORD, IDENTIFIER, NUMBER, OPERATOR, BRACKET)
+from latency import tracker, LatencyHUD
+from diagnostics import capture
+from event_log import operation, enable_logging, log_event
+
 # Token type colors
 TOKEN_TYPES = {
     'keyword': '#FF69B4',
@@ -17,6 +37,14 @@ TOKEN_TYPES = {
     'error': '#FF0000'
 }
 
+# Lexer token kinds by tag. Preprocessor lines were colored as '#' comments
+TOKEN_KIND_TAGS = {
+    COMMENT: 'comment', UNTERMINATED_COMMENT: 'comment', PREPROCESSOR: 'comment',
+    STRING: 'string', CHAR: 'string', UNTERMINATED_STRING: 'string', UNTERMINATED_CHAR: 'string',
+    KEYWORD: 'keyword', IDENTIFIER: 'identifier', NUMBER: 'number', OPERATOR: 'operator',
+    BRACKET: 'bracket',
+}
+
 LANGUAGE_EXTENSIONS = {
     'C': 'c',
     'C++': 'cpp',
@@ -30,9 +58,17 @@ SYNTAX_COMMANDS = {
     'C++': lambda filename: subprocess.run(["g++", "-fsyntax-only", filename], capture_output=True, text=True),
     'Python': lambda filename: subprocess.run(["python", "-m", "py_compile", filename], capture_output=True, text=True),
     'Java': lambda filename: subprocess.run(["javac", filename], capture_output=True, text=True),
-    'HTML': lambda filename: subprocess.CompletedProcess(args=[], returncode=0, stdout='', stderr='HTML is not compiled.')
+    'HTML': lambda filename: check_html_file(filename)
 }
 
+
+def check_html_file(filename):
+    # HTML is validated in-process; the result mirrors a compiler run
+    with open(filename, 'r', encoding='utf-8', errors='replace') as f:
+        errors = check_html(f.read())
+    return subprocess.CompletedProcess(args=[], returncode=1 if errors else 0, stdout='',
+                                       stderr=format_errors(errors, filename))
+
 # Keywords per language
 LANGUAGE_KEYWORDS = {
     'C': ['auto','break','case','char','const','continue','default','do','double','else','enum','extern','float','for','goto','if','int','long','register','return','short','signed','sizeof','static','struct','switch','typedef','union','unsigned','void','volatile','while'],
@@ -61,7 +97,16 @@ class SyntaxChecker:
         self.root = root
         self.root.title("Multi-language Syntax Checker")
         self.language = StringVar(value='C')
+        self.build_profile = StringVar(value=DEFAULT_PROFILE)
         self.current_theme = 'dark'
+        self.html_checker = HTMLChecker()
+        self.python_analyzer = PythonAnalyzer()
+        self.check_queued_at = None    # perf_counter() of the first unchecked edit
+        self.loader = None             # ProgressiveLoader while a file streams in
+        self.read_only = False         # the open file is too big to edit, highlight or check
+        self.elide_long_lines = BooleanVar(value=True)
+        self.document = Document()     # mirrors the text area, for offsets
+        self.tokens = None             # TokenStore for the current language
 
         self.setup_ui()
 
@@ -78,52 +123,179 @@ class SyntaxChecker:
 
         theme_menu = Menu(self.menu, tearoff=0)
         theme_menu.add_command(label="Toggle Theme", command=self.toggle_theme)
+        theme_menu.add_checkbutton(label="Elide Long Lines", variable=self.elide_long_lines,
+                                   command=lambda: self.text_area.tag_configure(
+                                       ELIDED_TAG, elide=self.elide_long_lines.get()))
         self.menu.add_cascade(label="Theme", menu=theme_menu)
 
+        self.diagnostics_menu = Menu(self.menu, tearoff=0)
+        self.diagnostics_menu.add_command(label="Start Capture", command=self.start_diagnostics)
+        self.diagnostics_menu.add_command(label="Stop Capture and Save Report", command=self.stop_diagnostics,
+                                          state=DISABLED)
+        self.diagnostics_menu.add_separator()
+        self.diagnostics_menu.add_command(label="Export Latency Trace...", command=self.export_latency_trace)
+        self.menu.add_cascade(label="Diagnostics", menu=self.diagnostics_menu)
+
         ttk.Label(self.root, text="Select Language:", background='#2e2e2e', foreground='white').pack(anchor=W)
         OptionMenu(self.root, self.language, *LANGUAGE_EXTENSIONS.keys(), command=self.language_changed).pack(anchor=W)
 
+        ttk.Label(self.root, text="Build Profile:", background='#2e2e2e', foreground='white').pack(anchor=W)
+        OptionMenu(self.root, self.build_profile, *BUILD_PROFILES.keys()).pack(anchor=W)
+
         # Run button
         run_button = Button(self.root, text="Run", command=self.run_code, bg="green", fg="white")
         run_button.pack(anchor=W, padx=10, pady=5)
 
+        tests_button = Button(self.root, text="Run Tests", command=self.run_tests, bg="#1565C0", fg="white")
+        tests_button.pack(anchor=W, padx=10, pady=5)
+
         self.text_area = Text(self.root, wrap=NONE, bg='#2e2e2e', fg='white', insertbackground='white')
         self.text_area.pack(fill=BOTH, expand=True)
-        self.text_area.bind("<KeyRelease>", self.on_text_change)
+        # Re-check on every real edit (typing, paste, cut, undo), once per idle period
+        self.edit_proxy = TextEditProxy(self.text_area)
+        self.edit_proxy.subscribe(self.apply_edit_to_document)
+        self.edit_proxy.subscribe(coalesce(self.text_area, self.on_text_change))
+        self.edit_proxy.subscribe(self.note_edit)
+        # Highlighting runs in time slices; an edit makes any pass in progress stale
+        self.scheduler = scheduler_for(self.text_area)
+        self.edit_proxy.subscribe(lambda event: self.scheduler.cancel('highlight'))
 
         self.error_output = Text(self.root, height=8, bg='#1e1e1e', fg='red', state=DISABLED)
         self.error_output.pack(fill=X, side=BOTTOM)
 
+        # Live p50/p95 of keystrokes and the checks they trigger
+        self.latency_label = Label(self.root, anchor=W, bg='#1e1e1e', fg='#808080', font=('Courier', 10))
+        self.latency_label.pack(fill=X, side=BOTTOM)
+        tracker.watch_input(self.text_area)
+        LatencyHUD(self.latency_label, tracker, ['keystroke', 'structure', 'analysis', 'compiler'])
+
     def get_token_patterns(self):
         return TOKEN_PATTERNS(self.language.get())
 
+    def apply_edit_to_document(self, event):
+        offset = self.document.from_tk_index(event.start)
+        if self.tokens is not None:
+            self.tokens.note_edit(offset, len(event.removed), len(event.inserted))
+        if event.removed:
+            self.document.delete(offset, len(event.removed))
+        if event.inserted:
+            self.document.insert(offset, event.inserted)
+
+    def token_store(self):
+        # The tokens of the current text, or None for languages the lexer
+        # doesn't know (HTML)
+        lang = self.language.get()
+        if self.tokens is None or self.tokens.lang != lang:
+            self.tokens = store_for(lang)
+            if self.tokens is None:
+                return None
+        self.tokens.update(self.document)
+        return self.tokens
+
+    def note_edit(self, event):
+        # The first edit of a burst starts the check's queue wait
+        if self.check_queued_at is None:
+            self.check_queued_at = time.perf_counter()
+
     def on_text_change(self, event=None):
-        code = self.text_area.get("1.0", END)
-        self.highlight_code(code)
-        self.check_syntax(code)
+        queued_at, self.check_queued_at = self.check_queued_at, None
+        if self.loader is not None or self.read_only:
+            return
+        with tracker.event('edit'):
+            code = self.text_area.get("1.0", END)
+            self.highlight_code(code)
+            self.check_syntax(code, queued_at)
 
     def highlight_code(self, code):
+        self.scheduler.submit('highlight', self.highlight_job(code))
+
+    def highlight_job(self, code):
         for tag in TOKEN_TYPES:
             self.text_area.tag_remove(tag, "1.0", END)
 
+        # Minified lines are only tokenized up to TOKENIZE_WINDOW characters
+        long_lines = find_long_lines(code)
+        mark_long_lines(self.text_area, long_lines, self.elide_long_lines.get())
+        tokens = self.token_store()
+        if tokens is not None:
+            yield from self.tag_tokens(tokens, long_lines)
+            return
+        clipped = ClippedText(code)
         patterns = self.get_token_patterns()
         for token_type, pattern in patterns.items():
-            for match in re.finditer(pattern, code, re.MULTILINE):
+            self.text_area.tag_configure(token_type, foreground=TOKEN_TYPES[token_type])
+            for match in re.finditer(pattern, clipped.text, re.MULTILINE):
                 start, end = match.span()
-                start_index = self.get_index(start)
-                end_index = self.get_index(end)
+                start_index = self.get_index(clipped.to_original(start))
+                end_index = self.get_index(clipped.to_original(end))
                 self.text_area.tag_add(token_type, start_index, end_index)
-                self.text_area.tag_configure(token_type, foreground=TOKEN_TYPES[token_type])
+                yield
+
+    def tag_tokens(self, tokens, long_lines):
+        # Tags straight from the token store, skipping long-line tails
+        for tag in set(TOKEN_KIND_TAGS.values()):
+            self.text_area.tag_configure(tag, foreground=TOKEN_TYPES[tag])
+        keywords = set(LANGUAGE_KEYWORDS[tokens.lang])
+        code = self.document.get_text()
+        tails = [(start + TOKENIZE_WINDOW, start + length) for line, start, length in long_lines]
+        tail_starts = [first for first, last in tails]
+        to_index = self.document.to_tk_index
+        for n, (kind, start, end) in enumerate(tokens):
+            tag = TOKEN_KIND_TAGS.get(kind)
+            if tag is None:
+                continue
+            if tails:
+                k = bisect.bisect_right(tail_starts, start) - 1
+                if k >= 0 and start < tails[k][1]:
+                    continue
+            if kind == IDENTIFIER and code[start:end] in keywords:
+                tag = 'keyword'
+            self.text_area.tag_add(tag, to_index(start), to_index(end))
+            if n % 256 == 0:
+                yield
 
     def get_index(self, index):
         return self.text_area.index(f"1.0+{index}c")
 
-    def check_syntax(self, code):
-        filename = f"temp.{LANGUAGE_EXTENSIONS[self.language.get()]}"
+    def check_syntax(self, code, queued_at=None):
+        lang = self.language.get()
+        with operation('check', queued_at, lang=lang, bytes=len(code.encode('utf-8'))) as record:
+            self.display_errors(self.run_checks(code, lang, record))
+
+    def run_checks(self, code, lang, record):
+        # Returns the error text; record gets the stage that decided and its exit code
+        filename = f"temp.{LANGUAGE_EXTENSIONS[lang]}"
+        if lang == 'HTML':
+            # Incremental: only the part of the document around the edit is re-parsed
+            errors = self.html_checker.check(code)
+            record.update(stage='html', exit_code=1 if errors else 0)
+            return format_errors(errors, filename)
+        # A definite structural error is reported at once, without launching the compiler
+        with tracker.phase('structure'):
+            tokens = self.token_store()
+            if tokens is not None:
+                source = self.document.get_text()
+                errors = check_structure(source, lang, tokens.structural(source))
+            else:
+                errors = check_structure(code, lang)
+        if errors:
+            record.update(stage='structure', exit_code=1)
+            return format_errors(errors, filename)
+        warnings = ''
+        if lang == 'Python':
+            # Undefined names and unused imports; only edited blocks are re-parsed
+            with tracker.phase('analysis'):
+                findings = self.python_analyzer.analyze(code)
+            if self.python_analyzer.syntax_error:
+                record.update(stage='analysis', exit_code=1)
+                return format_errors(findings, filename)
+            warnings = format_errors(findings, filename, 'warning')
         with open(filename, 'w') as f:
             f.write(code)
-        result = SYNTAX_COMMANDS[self.language.get()](filename)
-        self.display_errors(result.stderr)
+        with tracker.phase('compiler', 'subprocess'):
+            result = SYNTAX_COMMANDS[lang](filename)
+        record.update(stage='compiler', exit_code=result.returncode)
+        return result.stderr + warnings
 
     def display_errors(self, errors):
         self.error_output.config(state=NORMAL)
@@ -134,13 +306,53 @@ class SyntaxChecker:
     def open_file(self):
         file_path = filedialog.askopenfilename()
         if file_path:
-            with open(file_path, 'r') as file:
-                code = file.read()
-                self.text_area.delete("1.0", END)
-                self.text_area.insert(END, code)
+            self.open_path(file_path)
+
+    def open_path(self, file_path):
+        # The file streams in over many event-loop slices; highlighting and
+        # checks run once it is all there
+        if self.loader is not None:
+            self.loader.cancel()
+        self.read_only = False
+        self.tokens = None
+        name = os.path.basename(file_path)
+
+        def show_progress(loaded, size):
+            self.root.title(f"Multi-language Syntax Checker - {format_progress(name, loaded, size)}")
+
+        def finish(loader):
+            self.loader = None
+            self.read_only = loader.read_only
+            self.root.title(f"Multi-language Syntax Checker - {name}{' [read-only]' if self.read_only else ''}")
             self.on_text_change()
 
+        self.loader = ProgressiveLoader(self.text_area, file_path, show_progress, finish).start()
+
+    def start_diagnostics(self):
+        capture.start()
+        self.diagnostics_menu.entryconfig(0, state=DISABLED)
+        self.diagnostics_menu.entryconfig(1, state=NORMAL)
+
+    def stop_diagnostics(self):
+        folder = capture.stop()
+        self.diagnostics_menu.entryconfig(0, state=NORMAL)
+        self.diagnostics_menu.entryconfig(1, state=DISABLED)
+        if folder:
+            messagebox.showinfo("Diagnostics", f"Profile and memory reports written to\n{folder}")
+
+    def export_latency_trace(self):
+        path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[('Chrome trace', '*.json')],
+                                            title="Export Latency Trace")
+        if not path:
+            return
+        count = tracker.export_chrome_trace(path)
+        messagebox.showinfo("Latency Trace", f"Exported {count} span(s) to {path}\n"
+                            "Open it in chrome://tracing or ui.perfetto.dev.")
+
     def save_file(self):
+        if self.loader is not None:
+            self.display_errors("The file is still loading.")
+            return
         file_path = filedialog.asksaveasfilename(defaultextension=f".{LANGUAGE_EXTENSIONS[self.language.get()]}")
         if file_path:
             with open(file_path, 'w') as file:
@@ -150,10 +362,12 @@ class SyntaxChecker:
         if self.current_theme == 'dark':
             self.text_area.config(bg='white', fg='black', insertbackground='black')
             self.error_output.config(bg='lightgray', fg='black')
+            self.latency_label.config(bg='lightgray', fg='#404040')
             self.current_theme = 'light'
         else:
             self.text_area.config(bg='#2e2e2e', fg='white', insertbackground='white')
             self.error_output.config(bg='#1e1e1e', fg='red')
+            self.latency_label.config(bg='#1e1e1e', fg='#808080')
             self.current_theme = 'dark'
 
     def language_changed(self, lang):
@@ -167,40 +381,80 @@ class SyntaxChecker:
         with open(filename, "w") as f:
             f.write(code)
 
-        try:
-            if lang == "Python":
-                result = subprocess.run(["python", filename], capture_output=True, text=True)
-            elif lang == "C":
-                exe = "a.out"
-                subprocess.run(["gcc", filename, "-o", exe], check=True)
-                result = subprocess.run([f"./{exe}"], capture_output=True, text=True)
-            elif lang == "C++":
-                exe = "a.out"
-                subprocess.run(["g++", filename, "-o", exe], check=True)
-                result = subprocess.run([f"./{exe}"], capture_output=True, text=True)
-            elif lang == "Java":
-                subprocess.run(["javac", filename], check=True)
-                class_name = os.path.splitext(os.path.basename(filename))[0]
-                result = subprocess.run(["java", class_name], capture_output=True, text=True)
-            elif lang == "HTML":
-                webbrowser.open(f"file://{os.path.abspath(filename)}")
-                self.display_errors("Opened in browser.")
-                return
-            else:
-                self.display_errors("Run not supported for this language.")
-                return
+        with operation('run', lang=lang, bytes=len(code.encode('utf-8'))) as record:
+            try:
+                if lang == "Python":
+                    result = subprocess.run(["python", filename], capture_output=True, text=True)
+                elif lang in ("C", "C++"):
+                    exe, build_proc = build(lang, filename, self.build_profile.get())
+                    if build_proc is not None and build_proc.returncode != 0:
+                        record['exit_code'] = build_proc.returncode
+                        self.display_errors(build_proc.stderr)
+                        return
+                    result = subprocess.run([exe], capture_output=True, text=True)
+                elif lang == "Java":
+                    subprocess.run(["javac", filename], check=True)
+                    class_name = os.path.splitext(os.path.basename(filename))[0]
+                    result = subprocess.run(["java", class_name], capture_output=True, text=True)
+                elif lang == "HTML":
+                    webbrowser.open(f"file://{os.path.abspath(filename)}")
+                    self.display_errors("Opened in browser.")
+                    return
+                else:
+                    self.display_errors("Run not supported for this language.")
+                    return
+
+                record['exit_code'] = result.returncode
+                output = result.stdout
+                if result.stderr:
+                    output += "\n" + result.stderr
+                self.display_errors(output)
+            except subprocess.CalledProcessError as e:
+                record['exit_code'] = e.returncode
+                self.display_errors(e.stderr if hasattr(e, 'stderr') else str(e))
+            except Exception as e:
+                record['error'] = type(e).__name__
+                self.display_errors(str(e))
+
+    def run_tests(self):
+        lang = self.language.get()
+        if lang == "HTML":
+            self.display_errors("Test cases are not supported for HTML.")
+            return
+        directory = filedialog.askdirectory(title="Folder with .in/.out test cases")
+        if not directory:
+            return
+        cases = discover_cases(directory)
+        if not cases:
+            self.display_errors("No .in files found in that folder.")
+            return
+
+        filename = f"temp_run.{LANGUAGE_EXTENSIONS[lang]}"
+        with open(filename, "w") as f:
+            f.write(self.text_area.get("1.0", END))
+        cmd, error = prepare_run_command(lang, filename, self.build_profile.get())
+        if error is not None:
+            self.display_errors(error)
+            return
+        self.display_errors(f"Running {len(cases)} test case(s)...")
 
-            output = result.stdout
-            if result.stderr:
-                output += "\n" + result.stderr
-            self.display_errors(output)
-        except subprocess.CalledProcessError as e:
-            self.display_errors(e.stderr if hasattr(e, 'stderr') else str(e))
-        except Exception as e:
-            self.display_errors(str(e))
+        def worker():
+            try:
+                results = run_cases(cmd, cases)
+            except Exception as e:
+                self.root.after(0, self.display_errors, str(e))
+                return
+            report = format_results(results)
+            for r in results:
+                if r['status'] not in ('PASS', 'DONE'):
+                    report += f"\n[{r['name']}] {r['status']}\n{r['detail']}\n"
+            self.root.after(0, self.display_errors, report)
+        threading.Thread(target=worker, daemon=True).start()
 
 
 if __name__ == "__main__":
+    enable_logging()
+    set_build_listener(log_event)
     root = Tk()
     root.geometry("1000x700")
     app = SyntaxChecker(root)
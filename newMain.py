@@ -1,8 +1,24 @@
 from tkinter import *
 from tkinter import ttk
+import bisect
 import os
 import re
 import subprocess
+import time
+
+from build_profiles import BUILD_PROFILES, DEFAULT_PROFILE, build, set_build_listener
+from document import Document
+from edit_events import TextEditProxy, coalesce
+from structure_check import check_structure, format_errors
+from ui_scheduler import scheduler_for, ConsoleWriter
+from large_file import ProgressiveLoader, format_progress
+from long_lines import ClippedText, TOKENIZE_WINDOW, find_long_lines, mark_long_lines
+from search_engine import LineIndex
+from token_store import store_for
+from lexer import (COMMENT, UNTERMINATED_COMMENT, PREPROCESSOR, STRING, CHAR, UNTERMINATED_STRING,
+                   UNTERMINATED_CHAR, KEYWORD, IDENTIFIER, NUMBER, OPERATOR, BRACKET)
+from latency import tracker, LatencyHUD
+from event_log import operation, enable_logging, log_event
 
 TOKEN_TYPES = {
     'keyword': '#FF79C6',      # Pink
@@ -69,87 +85,139 @@ TOKEN_PATTERNS = {
     'identifier': r'\b(?!' + '|'.join(C_KEYWORDS) + r'\b)[a-zA-Z_][a-zA-Z0-9_]*\b'
 }
 
+# Lexer token kinds by tag; directives are colored like keywords
+TOKEN_KIND_TAGS = {
+    COMMENT: 'comment', UNTERMINATED_COMMENT: 'comment', PREPROCESSOR: 'keyword',
+    STRING: 'string', CHAR: 'string', UNTERMINATED_STRING: 'string', UNTERMINATED_CHAR: 'string',
+    KEYWORD: 'keyword', IDENTIFIER: 'identifier', NUMBER: 'number', OPERATOR: 'operator',
+    BRACKET: 'bracket',
+}
+
 def get_tkinter_index(text_widget, char_index):
     line = text_widget.index(f"1.0+{char_index}c").split(".")
     return f"{line[0]}.{line[1]}"
 
 def highlight_code(text_widget, code):
+    # Tags are applied in time slices so typing stays responsive on long files
+    scheduler.submit('highlight', highlight_job(text_widget, code, token_store()))
+    return code
+
+def highlight_job(text_widget, code, tokens=None):
     for token in TOKEN_TYPES.keys():
         text_widget.tag_remove(token, "1.0", END)
 
+    if tokens is not None:
+        yield from tag_tokens(text_widget, code, tokens)
+        return
+
+    # Generated tables and minified lines are only tokenized up to TOKENIZE_WINDOW characters
+    clipped = ClippedText(code)
+    mark_long_lines(text_widget, clipped.long_lines)
     for token_type, pattern in TOKEN_PATTERNS.items():
-        for match in re.finditer(pattern, code, re.MULTILINE):
+        text_widget.tag_configure(token_type, foreground=TOKEN_TYPES[token_type])
+        for match in re.finditer(pattern, clipped.text, re.MULTILINE):
             start, end = match.span()
-            start_index = get_tkinter_index(text_widget, start)
-            end_index = get_tkinter_index(text_widget, end)
+            start_index = get_tkinter_index(text_widget, clipped.to_original(start))
+            end_index = get_tkinter_index(text_widget, clipped.to_original(end))
             text_widget.tag_add(token_type, start_index, end_index)
-            text_widget.tag_configure(token_type, foreground=TOKEN_TYPES[token_type])
-    return code
+            yield
+
+def tag_tokens(text_widget, code, tokens):
+    # Tags straight from the token store; long lines are only tagged up to TOKENIZE_WINDOW
+    long_lines = find_long_lines(code)
+    mark_long_lines(text_widget, long_lines)
+    tails = [(start + TOKENIZE_WINDOW, start + length) for line, start, length in long_lines]
+    tail_starts = [first for first, last in tails]
+    line_starts = LineIndex(code).starts
+
+    def to_index(offset):
+        line = bisect.bisect_right(line_starts, offset)
+        return f"{line}.{offset - line_starts[line - 1]}"
+
+    for token_type, color in TOKEN_TYPES.items():
+        text_widget.tag_configure(token_type, foreground=color)
+    for n, (kind, start, end) in enumerate(tokens):
+        tag = TOKEN_KIND_TAGS.get(kind)
+        if tag is None:
+            continue
+        if tails:
+            k = bisect.bisect_right(tail_starts, start) - 1
+            if k >= 0 and start < tails[k][1]:
+                continue
+        text_widget.tag_add(tag, to_index(start), to_index(end))
+        if n % 256 == 0:
+            yield
 
 def run(code):
-    terminal_output.config(state=NORMAL)
-    terminal_output.delete("1.0", END)
-    terminal_output.config(state=DISABLED)
+    terminal.clear()
 
     if code.strip():
         with open("temp.c", "w") as fp:
             fp.write(code)
 
-        compile_process = subprocess.run(
-            ["gcc", "temp.c", "-o", "a.exe"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
-        terminal_output.config(state=NORMAL)
-        if compile_process.returncode != 0:
-            terminal_output.insert(END, "Compilation Error:\n" + compile_process.stderr)
-            terminal_output.config(state=DISABLED)
-            return
-
-        try:
-            run_process = subprocess.run(
-                ["a.exe"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=10
-            )
-            terminal_output.insert(END, "Output:\n" + run_process.stdout)
-            if run_process.stderr:
-                terminal_output.insert(END, "\nErrors:\n" + run_process.stderr)
-        except subprocess.TimeoutExpired:
-            terminal_output.insert(END, "Execution timed out.")
-        terminal_output.config(state=DISABLED)
-
-def detect_errors(code):
+        with operation('run', lang='C', bytes=len(code.encode('utf-8'))) as record:
+            with tracker.phase('build', 'subprocess'):
+                exe_path, compile_process = build("C", "temp.c", build_profile.get())
+
+            if compile_process is not None and compile_process.returncode != 0:
+                record['exit_code'] = compile_process.returncode
+                terminal.write("Compilation Error:\n" + compile_process.stderr)
+                return
+
+            try:
+                with tracker.phase('run', 'subprocess'):
+                    run_process = subprocess.run(
+                        [exe_path],
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True,
+                        timeout=10
+                    )
+                record['exit_code'] = run_process.returncode
+                terminal.write("Output:\n" + run_process.stdout)
+                if run_process.stderr:
+                    terminal.write("\nErrors:\n" + run_process.stderr)
+            except subprocess.TimeoutExpired:
+                record['error'] = 'timeout'
+                terminal.write("Execution timed out.")
+
+def detect_errors(code, queued_at=None):
     highlight_code(text_area, code)
     text_area.tag_remove("error_line", "1.0", END)
-    terminal_output.config(state=NORMAL)
-    terminal_output.delete("1.0", END)
-
-    # Save code to temp file
-    with open("temp_live.c", "w") as f:
-        f.write(code)
-
-    # Run GCC to check for syntax errors
-    process = subprocess.run(
-        ["gcc", "-fsyntax-only", "temp_live.c"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
+    terminal.clear()
+
+    with operation('check', queued_at, lang='C', bytes=len(code.encode('utf-8'))) as record:
+        # Definite structural errors skip the GCC run entirely
+        with tracker.phase('structure'):
+            errors = check_structure(code, "C", token_store().structural(document))
+        if errors:
+            stderr = format_errors(errors, "temp_live.c")
+            record.update(stage='structure', exit_code=1)
+        else:
+            # Save code to temp file
+            with open("temp_live.c", "w") as f:
+                f.write(code)
+
+            # Run GCC to check for syntax errors
+            with tracker.phase('compiler', 'subprocess'):
+                process = subprocess.run(
+                    ["gcc", "-fsyntax-only", "temp_live.c"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True
+                )
+            stderr = process.stderr
+            record.update(stage='compiler', exit_code=process.returncode)
 
     # Display and highlight errors
-    if process.stderr:
+    if stderr:
         error_lines = set()
-        for line in process.stderr.splitlines():
+        for line in stderr.splitlines():
             match = re.search(r"temp_live\.c:(\d+):", line)
             if match:
                 error_lines.add(int(match.group(1)))
 
-        terminal_output.insert(END, process.stderr)
+        terminal.write(stderr)
 
         for line_num in error_lines:
             index_start = f"{line_num}.0"
@@ -158,9 +226,8 @@ def detect_errors(code):
 
         text_area.tag_configure("error_line", background="#FF5555") 
     else:
-        terminal_output.insert(END, "No syntax errors detected.")
+        terminal.write("No syntax errors detected.")
 
-    terminal_output.config(state=DISABLED)
 def compute_lps(pattern):
     lps = [0] * len(pattern)
     length = 0
@@ -195,13 +262,23 @@ def autocomplete_kmp(prefix, keyword_list):
     return [word for word in keyword_list if kmp_prefix_match(word, prefix)]
 
 def update_line_numbers(event=None):
+    global gutter_lines
+    lines = int(text_area.index('end-1c').split('.')[0])
+    if lines != gutter_lines:
+        gutter_lines = lines
+        scheduler.submit('gutter', gutter_job(lines))
+    scroll_line_numbers()
+
+def gutter_job(lines):
     line_count_widget.config(state=NORMAL)
     line_count_widget.delete(1.0, END)
-    lines = text_area.index('end-1c').split('.')[0]
-    line_numbers = "\n".join(str(i) for i in range(1, int(lines) + 1))
-    line_count_widget.insert(END, line_numbers)
-    line_count_widget.config(state=DISABLED)
-    scroll_line_numbers()
+    for first in range(1, lines + 1, GUTTER_CHUNK):
+        chunk = "\n".join(str(i) for i in range(first, min(first + GUTTER_CHUNK, lines + 1)))
+        line_count_widget.config(state=NORMAL)
+        line_count_widget.insert(END, chunk if first == 1 else "\n" + chunk)
+        line_count_widget.config(state=DISABLED)
+        scroll_line_numbers()
+        yield
 
 def sync_scroll(*args):
     text_area.yview(*args)
@@ -232,10 +309,14 @@ from tkinter import filedialog, messagebox
 
 
 current_file = None  # Global variable to store current file path
+gutter_lines = None  # line count the gutter was last filled for
+GUTTER_CHUNK = 2000  # line numbers inserted per scheduler step
+loader = None        # ProgressiveLoader while a file streams in
+read_only = False    # the open file is too big to edit, highlight or check
 
 
 def new_file():
-    global current_file
+    global current_file, loader, read_only
     file_path = filedialog.asksaveasfilename(
         defaultextension=".c",
         filetypes=[("C Files", "*.c"), ("Text Files", "*.txt"), ("All Files", "*.*")],
@@ -244,20 +325,46 @@ def new_file():
     if file_path:
         with open(file_path, "w") as f:
             f.write("")  
+        # A file still streaming in would keep filling the new buffer, and a
+        # read-only one leaves the widget disabled
+        if loader is not None:
+            loader.cancel()
+            loader = None
+        read_only = False
         current_file = file_path
+        text_area.config(state='normal')
         text_area.delete("1.0", END)
+        root.title(f"C Code Editor - {os.path.basename(file_path)}")
 
 def open_file():
-    global current_file
+    global current_file, loader, read_only
     file_path = filedialog.askopenfilename(filetypes=[("C Files", "*.c"), ("Text Files", "*.txt"), ("All Files", "*.*")])
     if file_path:
-        with open(file_path, "r") as f:
-            text_area.delete("1.0", END)
-            text_area.insert("1.0", f.read())
+        # The file streams in over many event-loop slices; the gutter,
+        # highlighting and checks catch up once it is all there
+        if loader is not None:
+            loader.cancel()
+        read_only = False
+        tokens.invalidate()
+        name = os.path.basename(file_path)
+
+        def show_progress(loaded, size):
+            root.title(f"C Code Editor - {format_progress(name, loaded, size)}")
+
+        def finish(done):
+            global loader, read_only
+            loader = None
+            read_only = done.read_only
+            root.title(f"C Code Editor - {name}{' [read-only]' if read_only else ''}")
+            on_edit()
+
+        loader = ProgressiveLoader(text_area, file_path, show_progress, finish).start()
         current_file = file_path
 
 def save_file():
     global current_file
+    if loader is not None or read_only:
+        return
     if current_file:
         with open(current_file, "w") as f:
             f.write(text_area.get("1.0", END))
@@ -266,6 +373,8 @@ def save_file():
 
 def save_as_file():
     global current_file
+    if loader is not None:
+        return
     file_path = filedialog.asksaveasfilename(defaultextension=".txt",
                                              filetypes=[("C Files", "*.c"), ("Text Files", "*.txt"), ("All Files", "*.*")])
     if file_path:
@@ -277,6 +386,7 @@ def save_as_file():
 
 # GUI Setup
 root = Tk()
+scheduler = scheduler_for(root)
 screen_width = root.winfo_screenwidth()
 screen_height = root.winfo_screenheight()
 root.resizable(True, True)
@@ -326,7 +436,10 @@ def show_autocomplete():
     if line_text.strip().startswith("#include"):
         suggestions = autocomplete_kmp(prefix, C_HEADERS)
     else:
-        suggestions = autocomplete_kmp(prefix, C_KEYWORDS + C_FUNCTIONS)
+        # Names already used in the file come after the library ones
+        known = set(C_KEYWORDS + C_FUNCTIONS)
+        names = sorted(token_store().identifiers(document) - known - {prefix})
+        suggestions = autocomplete_kmp(prefix, C_KEYWORDS + C_FUNCTIONS + names)
 
     if not prefix or not prefix.isalpha():
         hide_autocomplete()
@@ -359,6 +472,15 @@ file_menu.add_command(label="Open", command=open_file)
 file_menu.add_command(label="Save", command=save_file)
 file_menu.add_command(label="Save As", command=save_as_file)
 
+def export_latency_trace():
+    path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+    if path:
+        count = tracker.export_chrome_trace(path)
+        messagebox.showinfo("Latency Trace", f"Exported {count} span(s) to {path}")
+
+file_menu.add_separator()
+file_menu.add_command(label="Export Latency Trace...", command=export_latency_trace)
+
 def show_file_menu(event):
     try:
         file_menu.tk_popup(event.x_root, event.y_root)
@@ -395,15 +517,26 @@ Button(root, text="RUN", padx=20, pady=2, bg='#50fa7b', fg='#282a36', activeback
        activeforeground='#282a36', borderwidth=0, font=('Helvetica', 12, 'bold'),
        command=lambda: run(text_area.get("1.0", END))).place(x= screen_width - 160, y=5)
 
+build_profile = StringVar(value=DEFAULT_PROFILE)
+profile_menu = OptionMenu(root, build_profile, *BUILD_PROFILES.keys())
+profile_menu.config(bg='#44475a', fg='#f8f8f2', activebackground='#6272a4', activeforeground='#f8f8f2',
+                    borderwidth=0, highlightthickness=0, font=('Helvetica', 10))
+profile_menu.place(x=screen_width - 330, y=5)
+
 terminal_output = Text(root, height=6, bg='#1e1e1e', fg='#f8f8f2', insertbackground='white',
                        font=('Courier', 12), wrap="word")
 terminal_output.place(x=10, y=screen_height - 200, width=screen_width - 80, height=150)
 terminal_output.config(state=DISABLED)
+terminal = ConsoleWriter(terminal_output)
 
 terminal_scroll = ttk.Scrollbar(root, command=terminal_output.yview)
 terminal_scroll.place(x=screen_width - 40, y=screen_height - 200, height=150)
 terminal_output.config(yscrollcommand=terminal_scroll.set)
 
+# Live p50/p95 of each phase of recent edits and keystrokes
+latency_label = Label(root, anchor=W, bg='#282a36', fg='#6272a4', font=('Courier', 10))
+latency_label.place(x=10, y=screen_height - 45, width=screen_width - 80, height=20)
+
 def focus_autocomplete_if_visible(event):
     if autocomplete_listbox.winfo_ismapped():
         autocomplete_listbox.focus_set()
@@ -414,7 +547,49 @@ text_area.bind("<Down>", focus_autocomplete_if_visible)
 
 text_area.config(yscrollcommand=sync_scroll)
 text_area.tag_configure("error_line", underline=True, background="#FF5555")
-text_area.bind("<KeyRelease>", lambda e: (update_line_numbers(), detect_errors(text_area.get("1.0", END)), show_autocomplete()))
+# Edits of any kind (typing, paste, undo, autocomplete inserts) refresh line numbers and errors
+edit_proxy = TextEditProxy(text_area)
+document = Document()     # mirrors text_area, for offsets into the token store
+tokens = store_for('C')
+
+def apply_edit_to_document(event):
+    offset = document.from_tk_index(event.start)
+    tokens.note_edit(offset, len(event.removed), len(event.inserted))
+    if event.removed:
+        document.delete(offset, len(event.removed))
+    if event.inserted:
+        document.insert(offset, event.inserted)
+
+def token_store():
+    tokens.update(document)
+    return tokens
+
+edit_proxy.subscribe(apply_edit_to_document)
+edit_proxy.subscribe(lambda event: scheduler.cancel('highlight'))  # the pass in progress is stale
+check_queued_at = None  # perf_counter() of the first unchecked edit, for the event log's queue wait
+
+def note_edit(event):
+    global check_queued_at
+    if check_queued_at is None:
+        check_queued_at = time.perf_counter()
+
+def on_edit():
+    global check_queued_at
+    queued_at, check_queued_at = check_queued_at, None
+    if loader is not None:
+        return
+    with tracker.event('edit'):
+        update_line_numbers()
+        if not read_only:
+            detect_errors(text_area.get("1.0", END), queued_at)
+
+def on_key_release(event):
+    with tracker.phase('autocomplete'):
+        show_autocomplete()
+
+edit_proxy.subscribe(coalesce(text_area, on_edit))
+edit_proxy.subscribe(note_edit)
+text_area.bind("<KeyRelease>", on_key_release)
 
 line_count_widget.config(yscrollcommand=sync_scroll)
 text_area.bind("<MouseWheel>", on_text_scroll)
@@ -423,5 +598,10 @@ text_area.bind("<KeyPress>", on_cursor_move)
 file_button.bind("<Button-1>", show_file_menu)
 text_area.bind("<Escape>", lambda e: hide_autocomplete())
 
+tracker.watch_input(text_area)
+LatencyHUD(latency_label, tracker)
+
+enable_logging()
+set_build_listener(log_event)
 update_line_numbers()
 root.mainloop()
\ No newline at end of file
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from lexer import tokenize
+
+# ------------------------------------
+# Multi-process lexing of huge buffers
+# ------------------------------------
+# A single pass over a 500k-line amalgamation (sqlite3.c) takes seconds.
+# lex_parallel() cuts the text after newlines into a few chunks per worker
+# and lexes them concurrently in a process pool. The text goes to the workers
+# once, UTF-8 encoded into a SharedMemory block; each task only carries the
+# block's name and its chunk's byte span, never the text itself. Workers send
+# back the three token columns as arrays (start, length, kind).
+# Every chunk is lexed as if the file began there, which is wrong when a
+# block comment, triple-quoted or raw string or continued directive crosses
+# the cut. Lexed on its own, such a construct runs to the end of its chunk as
+# an unterminated token, and the next chunk starts out lexing its inside as
+# code. TokenStore.reconcile() fixes each seam afterwards: it re-lexes from
+# just before the cut until the tokens line up with the next chunk's again,
+# which for an ordinary seam means a couple of tokens.
+# Workers are always forked. A spawned worker imports the editor's main script,
+# and newMain builds its window at module level, so every worker would open
+# another editor. Where fork isn't available (Windows) or isn't safe once Tk
+# is loaded (macOS), files are lexed serially.
+
+PARALLEL_MIN_CHARS = 2 * 1024 * 1024   # below this a pool costs more than it saves
+MIN_CHUNK_CHARS = 256 * 1024
+CHUNKS_PER_WORKER = 4                  # so one slow chunk doesn't hold up the rest
+
+if sys.platform != 'darwin' and 'fork' in multiprocessing.get_all_start_methods():
+    FORK = multiprocessing.get_context('fork')
+else:
+    FORK = None
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def worthwhile(length, workers=None):
+    return FORK is not None and length >= PARALLEL_MIN_CHARS and (workers or default_workers()) > 1
+
+
+def split_points(text, chunks):
+    # Offsets just past a newline, splitting text into about `chunks` parts
+    size = max(MIN_CHUNK_CHARS, len(text) // max(1, chunks))
+    points = []
+    pos = size
+    while pos < len(text):
+        cut = text.find('\n', pos)
+        if cut == -1 or cut + 1 >= len(text):
+            break
+        points.append(cut + 1)
+        pos = cut + 1 + size
+    return points
+
+
+def _lex_chunk(name, first, last, base, lang):
+    # Runs in a pool worker: tokens of bytes [first, last) of the shared
+    # block, with starts counted from the character offset `base`
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        text = bytes(block.buf[first:last]).decode('utf-8', 'surrogatepass')
+    finally:
+        block.close()
+    starts, lengths, kinds = array('I'), array('I'), array('B')
+    for kind, s, e in tokenize(text, lang):
+        starts.append(s + base)
+        lengths.append(e - s)
+        kinds.append(kind)
+    return starts, lengths, kinds
+
+
+def lex_parallel(text, lang, workers=None):
+    # Returns (starts, lengths, kinds, seams): the token columns for all of
+    # text, where the chunks beginning at each seam offset still need a
+    # TokenStore.reconcile()
+    workers = workers or default_workers()
+    seams = split_points(text, workers * CHUNKS_PER_WORKER)
+    bounds = list(zip([0] + seams, seams + [len(text)]))
+    encoded = [text[first:last].encode('utf-8', 'surrogatepass') for first, last in bounds]
+    block = shared_memory.SharedMemory(create=True, size=max(1, sum(map(len, encoded))))
+    try:
+        tasks = []
+        offset = 0
+        for (first, last), data in zip(bounds, encoded):
+            block.buf[offset:offset + len(data)] = data
+            tasks.append((offset, offset + len(data), first))
+            offset += len(data)
+        del encoded
+        starts, lengths, kinds = array('I'), array('I'), array('B')
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=FORK) as pool:
+            futures = [pool.submit(_lex_chunk, block.name, first, last, base, lang) for first, last, base in tasks]
+            for future in futures:
+                chunk_starts, chunk_lengths, chunk_kinds = future.result()
+                starts.extend(chunk_starts)
+                lengths.extend(chunk_lengths)
+                kinds.extend(chunk_kinds)
+    finally:
+        block.close()
+        block.unlink()
+    return starts, lengths, kinds, seams
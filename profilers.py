@@ -0,0 +1,163 @@
+import glob
+import json
+import os
+import re
+import subprocess
+
+from build_profiles import build
+
+PROFILE_RUN_TIMEOUT = 60  # seconds
+
+# ---------------
+# gprof profiling
+# ---------------
+FLAT_LINE = re.compile(
+    r'^\s*([\d.]+)\s+([\d.]+)\s+([\d.]+)'
+    r'(?:\s+(\d+)\s+([\d.]+)\s+([\d.]+))?'
+    r'\s+(\S.*?)\s*$'
+)
+GRAPH_PRIMARY = re.compile(r'^\[(\d+)\]\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d+/]*)\s*(.*?)\s+\[\d+\]\s*$')
+GRAPH_RELATED = re.compile(r'^\s+([\d.]+)?\s+([\d.]+)?\s+([\d+/]+)?\s+(.*?)\s+\[\d+\]\s*$')
+
+
+def parse_flat_profile(text):
+    rows = []
+    in_table = False
+    unit = 'ms'
+    for line in text.splitlines():
+        if line.strip().startswith('time') and 'name' in line:
+            in_table = True
+            unit_match = re.search(r'(\w+)/call', line)
+            if unit_match:
+                unit = unit_match.group(1)
+            continue
+        if not in_table:
+            continue
+        if not line.strip():
+            if rows:
+                break
+            continue
+        match = FLAT_LINE.match(line)
+        if not match:
+            continue
+        pct, cumulative, self_s, calls, self_call, total_call, name = match.groups()
+        rows.append({
+            'name': name,
+            'percent': float(pct),
+            'cumulative': float(cumulative),
+            'self': float(self_s),
+            'calls': int(calls) if calls else 0,
+            'self_per_call': float(self_call) if self_call else 0.0,
+            'total_per_call': float(total_call) if total_call else 0.0,
+            'unit': unit,
+        })
+    return rows
+
+
+def parse_call_graph(text):
+    # Each block lists callers, then the primary [index] line, then callees
+    graph = {}
+    start = text.find('index % time')
+    if start == -1:
+        return graph
+    end = text.find('Index by function name', start)
+    section = text[start:end] if end != -1 else text[start:]
+    for block in section.split('-----------------------------------------------'):
+        primary = None
+        callers, callees = [], []
+        for line in block.splitlines():
+            if not line.strip() or line.startswith('index'):
+                continue
+            match = GRAPH_PRIMARY.match(line)
+            if match:
+                _, pct, self_s, children, called, name = match.groups()
+                primary = {'name': name, 'percent': float(pct), 'self': float(self_s),
+                           'children': float(children), 'called': called}
+                continue
+            related = GRAPH_RELATED.match(line)
+            if related:
+                (callees if primary else callers).append(related.group(4))
+        if primary:
+            primary['callers'] = callers
+            primary['callees'] = callees
+            graph[primary['name']] = primary
+    return graph
+
+
+def run_gprof(lang, src, profile, timeout=PROFILE_RUN_TIMEOUT):
+    # Returns (flat_rows, call_graph, raw_report, error)
+    exe, proc = build(lang, src, profile, extra_flags=['-pg'], variant='pg')
+    if proc is not None and proc.returncode != 0:
+        return None, None, '', proc.stderr
+    work_dir = os.path.dirname(exe)
+    gmon = os.path.join(work_dir, 'gmon.out')
+    if os.path.exists(gmon):
+        os.remove(gmon)
+    try:
+        subprocess.run([exe], cwd=work_dir, stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, None, '', f"Program did not finish within {timeout}s."
+    if not os.path.exists(gmon):
+        return None, None, '', "No gmon.out was written (the program must exit normally)."
+    report = subprocess.run(['gprof', '-b', exe, gmon], capture_output=True, text=True)
+    if report.returncode != 0:
+        return None, None, '', report.stderr
+    return parse_flat_profile(report.stdout), parse_call_graph(report.stdout), report.stdout, None
+
+
+# ------------------------
+# gcov line-level coverage
+# ------------------------
+def parse_gcov_json(text, src):
+    # gcov --stdout prints one JSON document per data file, one per line
+    counts = {}
+    base = os.path.basename(src)
+    for chunk in text.splitlines():
+        if not chunk.strip():
+            continue
+        for entry in json.loads(chunk).get('files', []):
+            if os.path.basename(entry['file']) != base:
+                continue
+            for line in entry['lines']:
+                number = line['line_number']
+                counts[number] = counts.get(number, 0) + line['count']
+    return counts
+
+
+def run_gcov(lang, src, profile, timeout=PROFILE_RUN_TIMEOUT):
+    # Returns ({line_number: execution_count}, error)
+    exe, proc = build(lang, src, profile, extra_flags=['--coverage'], variant='cov')
+    if proc is not None and proc.returncode != 0:
+        return None, proc.stderr
+    work_dir = os.path.dirname(exe)
+    # Counters accumulate across runs, so start every run from a clean slate
+    for data_file in glob.glob(os.path.join(work_dir, '*.gcda')):
+        os.remove(data_file)
+    try:
+        subprocess.run([exe], cwd=work_dir, stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, f"Program did not finish within {timeout}s."
+    data_files = [os.path.basename(f) for f in glob.glob(os.path.join(work_dir, '*.gcda'))]
+    if not data_files:
+        return None, "No coverage data was written (the program must exit normally)."
+    report = subprocess.run(['gcov', '--json-format', '--stdout', *data_files],
+                            cwd=work_dir, capture_output=True, text=True)
+    if report.returncode != 0:
+        return None, report.stderr
+    return parse_gcov_json(report.stdout, src), None
+
+
+def find_function_lines(code, names):
+    # Line of each function definition: name followed by '(' on a line that
+    # starts at column 0 and is not a prototype
+    wanted = set(names)
+    lines = {}
+    pattern = re.compile(r'\b([A-Za-z_]\w*)\s*\(')
+    for line_no, line in enumerate(code.split('\n'), 1):
+        if not line or line[0].isspace() or line.rstrip().endswith(';') or line.startswith('#'):
+            continue
+        for match in pattern.finditer(line):
+            if match.group(1) in wanted and match.group(1) not in lines:
+                lines[match.group(1)] = line_no
+                break
+    return lines
@@ -0,0 +1,490 @@
+import ast
+import builtins
+import re
+
+from lexer import tokenize, BRACKET, NEWLINE, OTHER
+from text_diff import common_prefix, common_suffix
+
+# ------------------------------------------
+# Incremental Python name analysis
+# ------------------------------------------
+# Reports undefined names, unused imports and redefinitions of unused
+# definitions, in the spirit of pyflakes. The module is split into top-level
+# statement blocks (a def with its decorators, a class, an import, an if/try
+# with its else branches...). Each block is parsed on its own and boiled down
+# to facts: the module-level bindings and loads it performs, in order, plus
+# the names its functions look up at call time. Facts are cached by block
+# text, so a keystroke re-parses only the block being edited; the module-wide
+# pass then only walks those facts.
+
+BUILTIN_NAMES = frozenset(dir(builtins)) | {
+    '__file__', '__name__', '__doc__', '__spec__', '__loader__', '__package__',
+    '__path__', '__builtins__', '__annotations__', '__dict__', '__class__',
+    '__module__', '__qualname__',
+}
+REDEFINABLE = {'import', 'def', 'class'}
+IMPORT_KINDS = {'import', 'submodule'}
+_CONTINUATION = re.compile(r'(?:else|elif|except|finally)\b')
+
+BIND, LOAD = 0, 1
+
+
+class BlockFacts:
+    __slots__ = ('syntax_error', 'events', 'deferred', 'global_binds', 'messages',
+                 'exports', 'star_import')
+
+    def __init__(self):
+        self.syntax_error = None    # (line, col, message), lines relative to the block
+        self.events = []            # (BIND, name, line, col, kind, direct) / (LOAD, name, line, col)
+        self.deferred = []          # (name, line, col) looked up in module scope at call time
+        self.global_binds = set()   # names assigned through `global` inside functions
+        self.messages = []          # block-local findings, e.g. unused imports in a function
+        self.exports = []           # (name, line, col) listed in __all__
+        self.star_import = False
+
+
+class _Scope:
+    __slots__ = ('kind', 'bound', 'loads', 'globals', 'imports', 'used')
+
+    def __init__(self, kind):
+        self.kind = kind            # 'function', 'class' or 'comprehension'
+        self.bound = set()
+        self.loads = []             # (name, line, col, deferred)
+        self.globals = set()
+        self.imports = {}           # name -> (line, col), for function scopes
+        self.used = set()
+
+
+class _BlockVisitor(ast.NodeVisitor):
+    # Visits one top-level statement. Function scopes are resolved when they
+    # end; anything they can't resolve bubbles up towards the module.
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.scopes = []
+        self.depth = 0              # nesting of module-level compound statements
+
+    # -- helpers --
+
+    def bind(self, name, node, kind='assign'):
+        if self.scopes:
+            scope = self.scopes[-1]
+            if name in scope.globals:
+                self.facts.global_binds.add(name)
+            else:
+                scope.bound.add(name)
+                if kind in IMPORT_KINDS and scope.kind == 'function':
+                    scope.imports[name] = (node.lineno, node.col_offset)
+        else:
+            self.facts.events.append((BIND, name, node.lineno, node.col_offset, kind, self.depth == 0))
+
+    def load(self, name, node, deferred=False):
+        if self.scopes:
+            self.scopes[-1].loads.append((name, node.lineno, node.col_offset, deferred))
+        elif deferred:
+            self.facts.deferred.append((name, node.lineno, node.col_offset))
+        else:
+            self.facts.events.append((LOAD, name, node.lineno, node.col_offset))
+
+    def in_scope(self, kind, body):
+        scope = _Scope(kind)
+        self.scopes.append(scope)
+        body(scope)
+        self.scopes.pop()
+        deferred = kind == 'function'
+        for name, line, col, was_deferred in scope.loads:
+            if name in scope.bound and name not in scope.globals:
+                scope.used.add(name)
+                continue
+            # Methods don't see their class body's names
+            target = len(self.scopes) - 1
+            while target >= 0 and self.scopes[target].kind == 'class' and kind == 'function':
+                target -= 1
+            entry = (name, line, col, deferred or was_deferred)
+            if target >= 0:
+                self.scopes[target].loads.append(entry)
+            elif entry[3]:
+                self.facts.deferred.append(entry[:3])
+            else:
+                self.facts.events.append((LOAD, name, line, col))
+        for name, (line, col) in scope.imports.items():
+            if name not in scope.used:
+                self.facts.messages.append((line, col + 1, f"'{name}' imported but unused"))
+
+    # -- statements --
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            # `import a.b` binds `a` again without replacing it
+            kind = 'import' if alias.asname or '.' not in alias.name else 'submodule'
+            self.bind(alias.asname or alias.name.split('.')[0], node, kind)
+
+    def visit_ImportFrom(self, node):
+        if node.module == '__future__':
+            return
+        for alias in node.names:
+            if alias.name == '*':
+                self.facts.star_import = True
+            else:
+                self.bind(alias.asname or alias.name, node, 'import')
+
+    def _function(self, node, is_lambda=False):
+        args = node.args
+        for default in args.defaults + [d for d in args.kw_defaults if d is not None]:
+            self.visit(default)
+        if not is_lambda:
+            for decorator in node.decorator_list:
+                self.visit(decorator)
+            # Annotations may be strings or postponed; only resolve them at call time
+            for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+                if arg is not None and arg.annotation is not None:
+                    self._deferred(arg.annotation)
+            if node.returns is not None:
+                self._deferred(node.returns)
+
+        def body(scope):
+            for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+                if arg is not None:
+                    scope.bound.add(arg.arg)
+            if is_lambda:
+                self.visit(node.body)
+            else:
+                for statement in node.body:
+                    self.visit(statement)
+        self.in_scope('function', body)
+        if not is_lambda:
+            self.bind(node.name, node, 'def')
+
+    def _deferred(self, node):
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                self.load(child.id, child, deferred=True)
+
+    def visit_FunctionDef(self, node):
+        self._function(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self._function(node, is_lambda=True)
+
+    def visit_ClassDef(self, node):
+        for expr in node.decorator_list + node.bases + [k.value for k in node.keywords]:
+            self.visit(expr)
+        self.in_scope('class', lambda scope: [self.visit(statement) for statement in node.body])
+        self.bind(node.name, node, 'class')
+
+    def visit_Global(self, node):
+        if self.scopes:
+            self.scopes[-1].globals.update(node.names)
+
+    def visit_Nonlocal(self, node):
+        if self.scopes:
+            self.scopes[-1].bound.update(node.names)
+
+    def _exports(self, value):
+        # Names listed in a module-level __all__ = [...], += [...] or .extend([...])
+        if not self.scopes and isinstance(value, (ast.List, ast.Tuple)):
+            for element in value.elts:
+                if isinstance(element, ast.Constant) and isinstance(element.value, str):
+                    self.facts.exports.append((element.value, element.lineno, element.col_offset))
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        for target in node.targets:
+            self.visit(target)
+        if any(isinstance(t, ast.Name) and t.id == '__all__' for t in node.targets):
+            self._exports(node.value)
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        func = node.func
+        if (isinstance(func, ast.Attribute) and func.attr == 'extend' and isinstance(func.value, ast.Name)
+                and func.value.id == '__all__' and node.args):
+            self._exports(node.args[0])
+
+    def visit_AugAssign(self, node):
+        self.visit(node.value)
+        if isinstance(node.target, ast.Name):
+            self.load(node.target.id, node.target)
+            self.bind(node.target.id, node.target)
+            if node.target.id == '__all__':
+                self._exports(node.value)
+        else:
+            self.visit(node.target)
+
+    def visit_AnnAssign(self, node):
+        if node.value is not None:
+            self.visit(node.value)
+        self._deferred(node.annotation)
+        self.visit(node.target)
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self.visit(node.target)
+        self._compound(node.body + node.orelse)
+
+    visit_AsyncFor = visit_For
+
+    def _compound(self, statements):
+        self.depth += 1
+        for statement in statements:
+            self.visit(statement)
+        self.depth -= 1
+
+    def visit_If(self, node):
+        self.visit(node.test)
+        self._compound(node.body + node.orelse)
+
+    def visit_While(self, node):
+        self.visit(node.test)
+        self._compound(node.body + node.orelse)
+
+    def visit_With(self, node):
+        for item in node.items:
+            self.visit(item)
+        self._compound(node.body)
+
+    visit_AsyncWith = visit_With
+
+    def visit_Try(self, node):
+        self.depth += 1
+        for statement in node.body:
+            self.visit(statement)
+        for handler in node.handlers:
+            if handler.type is not None:
+                self.visit(handler.type)
+            if handler.name:
+                self.bind(handler.name, handler)
+            for statement in handler.body:
+                self.visit(statement)
+        for statement in node.orelse + node.finalbody:
+            self.visit(statement)
+        self.depth -= 1
+
+    visit_TryStar = visit_Try
+
+    def visit_Match(self, node):
+        self.visit(node.subject)
+        self.depth += 1
+        for case in node.cases:
+            self.visit(case.pattern)
+            if case.guard is not None:
+                self.visit(case.guard)
+            for statement in case.body:
+                self.visit(statement)
+        self.depth -= 1
+
+    def visit_MatchAs(self, node):
+        if node.pattern is not None:
+            self.visit(node.pattern)
+        if node.name:
+            self.bind(node.name, node)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self.bind(node.name, node)
+
+    def visit_MatchMapping(self, node):
+        self.generic_visit(node)
+        if node.rest:
+            self.bind(node.rest, node)
+
+    # -- expressions --
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Store):
+            self.bind(node.id, node)
+        else:
+            self.load(node.id, node)
+
+    def visit_NamedExpr(self, node):
+        self.visit(node.value)
+        self.visit(node.target)
+
+    def _comprehension(self, node, elements):
+        # The first iterable is evaluated outside the comprehension's own scope
+        self.visit(node.generators[0].iter)
+
+        def body(scope):
+            for i, generator in enumerate(node.generators):
+                if i:
+                    self.visit(generator.iter)
+                self.visit(generator.target)
+                for condition in generator.ifs:
+                    self.visit(condition)
+            for element in elements:
+                self.visit(element)
+        self.in_scope('comprehension', body)
+
+    def visit_ListComp(self, node):
+        self._comprehension(node, [node.elt])
+
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._comprehension(node, [node.key, node.value])
+
+
+def analyze_block(text):
+    facts = BlockFacts()
+    try:
+        tree = ast.parse(text)
+    except SyntaxError as e:
+        facts.syntax_error = (e.lineno or 1, e.offset or 1, e.msg)
+        return facts
+    visitor = _BlockVisitor(facts)
+    for statement in tree.body:
+        visitor.visit(statement)
+    return facts
+
+
+def block_starts(text, start=0):
+    # Yields the offsets of top-level statements after `start`, which must be one.
+    # A statement starts at column 0 outside brackets and strings, and is not an
+    # else/elif/except/finally branch or the def/class under a decorator.
+    depth = 0
+    continued = False
+    decorated = text.startswith('@', start)
+    for kind, token_start, token_end in tokenize(text, 'Python', start, structural=True):
+        if kind == BRACKET:
+            depth = depth + 1 if text[token_start] in '([{' else max(0, depth - 1)
+        elif kind == OTHER:
+            continued = True
+        elif kind == NEWLINE:
+            if continued:
+                continued = False
+                continue
+            first = text[token_end:token_end + 1]
+            if depth or not first or first in ' \t\f\r\n#' or _CONTINUATION.match(text, token_end):
+                continue
+            if not decorated:
+                yield token_end
+            decorated = first == '@'
+
+
+class PythonAnalyzer:
+    def __init__(self):
+        self.text = ''
+        self.blocks = []        # [offset, line, facts] per top-level block
+        self.cache = {}         # block text -> BlockFacts
+        self.stats = {'parsed': 0, 'reused': 0}
+        self.syntax_error = False  # the last analyze() stopped at a syntax error
+
+    def analyze(self, text):
+        # Returns [(line, column, message)] for the whole module
+        self._update_blocks(text)
+        return self._module_pass()
+
+    def _facts(self, text):
+        facts = self.cache.get(text)
+        if facts is None:
+            facts = self.cache[text] = analyze_block(text)
+            self.stats['parsed'] += 1
+        return facts
+
+    def _update_blocks(self, text):
+        old_text, old = self.text, self.blocks
+        prefix = common_prefix(old_text, text)
+        suffix = common_suffix(old_text, text, prefix)
+        old_end = len(old_text) - suffix
+        delta = len(text) - len(old_text)
+        self.text = text
+        if old and old_text == text:
+            return
+
+        # A line's fate depends on the line before it, so restart one character early
+        index = 0
+        while index + 1 < len(old) and old[index + 1][0] <= prefix - 1:
+            index += 1
+        start, line = (old[index][0], old[index][1]) if old else (0, 1)
+        # Old block starts past the edit, in new coordinates, where the split must agree again
+        targets = {offset + delta: i for i, (offset, _, _) in enumerate(old) if offset >= old_end and offset > 0}
+
+        starts = [start]
+        resume = None
+        for offset in block_starts(text, start):
+            starts.append(offset)
+            if offset >= len(text) - suffix and offset in targets:
+                resume = targets[offset]
+                break
+        stop = len(text) if resume is None else starts.pop()
+        ends = starts[1:] + [stop]
+
+        region = []
+        for block_start, block_end in zip(starts, ends):
+            region.append([block_start, line, self._facts(text[block_start:block_end])])
+            line += text.count('\n', block_start, block_end)
+        tail = []
+        if resume is not None:
+            line_delta = line - old[resume][1]
+            for offset, block_line, facts in old[resume:]:
+                tail.append([offset + delta, block_line + line_delta, facts])
+            self.stats['reused'] += len(old) - resume
+        self.blocks = old[:index] + region + tail
+        # Keep only facts for blocks that still exist
+        live = {id(facts) for _, _, facts in self.blocks}
+        if len(self.cache) > 2 * len(self.blocks) + 64:
+            self.cache = {key: facts for key, facts in self.cache.items() if id(facts) in live}
+
+    def _module_pass(self):
+        messages = []
+        for _, line, facts in self.blocks:
+            if facts.syntax_error:
+                rel_line, col, message = facts.syntax_error
+                messages.append((line + rel_line - 1, col, f"syntax error: {message}"))
+        self.syntax_error = bool(messages)
+        if messages:
+            return messages  # names can't be trusted until the module parses
+
+        star = any(facts.star_import for _, _, facts in self.blocks)
+        global_binds = set()
+        for _, _, facts in self.blocks:
+            global_binds |= facts.global_binds
+        known = BUILTIN_NAMES | global_binds
+        bindings = {}   # name -> [line, col, kind, direct, used]
+
+        for _, base, facts in self.blocks:
+            base -= 1
+            for rel, col, message in facts.messages:
+                messages.append((base + rel, col, message))
+            for event in facts.events:
+                name = event[1]
+                if event[0] == LOAD:
+                    binding = bindings.get(name)
+                    if binding:
+                        binding[4] = True
+                    elif name not in known and not star:
+                        messages.append((base + event[2], event[3] + 1, f"undefined name '{name}'"))
+                    continue
+                _, _, rel, col, kind, direct = event
+                previous = bindings.get(name)
+                if previous and previous[2] in IMPORT_KINDS and 'submodule' in (kind, previous[2]):
+                    continue  # `import a` and `import a.b` share one binding
+                if (previous and not previous[4] and direct and previous[3]
+                        and kind in REDEFINABLE and previous[2] in REDEFINABLE):
+                    messages.append((base + rel, col + 1, f"redefinition of unused '{name}' from line {previous[0]}"))
+                    previous[4] = True
+                bindings[name] = [base + rel, col + 1, kind, direct, False]
+
+        # Function bodies run later, against whatever the module bound last
+        for _, base, facts in self.blocks:
+            for name, rel, col in facts.deferred:
+                binding = bindings.get(name)
+                if binding:
+                    binding[4] = True
+                elif name not in known and not star:
+                    messages.append((base - 1 + rel, col + 1, f"undefined name '{name}'"))
+            for name, rel, col in facts.exports:
+                binding = bindings.get(name)
+                if binding:
+                    binding[4] = True
+                elif not star:
+                    messages.append((base - 1 + rel, col + 1, f"undefined name '{name}' in __all__"))
+
+        # Only imports still bound at the end; replaced ones were dealt with above
+        for name, binding in bindings.items():
+            if binding[2] in IMPORT_KINDS and not binding[4] and not (name.startswith('__') and name.endswith('__')):
+                messages.append((binding[0], binding[1], f"'{name}' imported but unused"))
+        messages.sort()
+        return messages
@@ -0,0 +1,58 @@
+import bisect
+import re
+
+# -----------------------------------
+# Buffer-level find / replace helpers
+# -----------------------------------
+# Everything here works on a plain string snapshot of the buffer, so a search
+# is one regex pass instead of one widget round trip per match.
+
+
+def compile_query(needle, case_sensitive=False, whole_word=False, regex=False):
+    # Raises re.error for an invalid regular expression
+    pattern = needle if regex else re.escape(needle)
+    if whole_word:
+        pattern = rf'\b(?:{pattern})\b'
+    return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+
+
+def find_all(content, pattern):
+    # Empty regex matches are skipped; they can't be highlighted or replaced
+    return [m.span() for m in pattern.finditer(content) if m.end() > m.start()]
+
+
+def replace_all(content, pattern, replacement, regex=False):
+    # Returns (start, end, new_text, count) for the smallest span that covers
+    # every match, or None when nothing matched. Literal replacements are
+    # inserted as-is; regex replacements may use \1 and \g<name>.
+    parts = []
+    first = None
+    last = 0
+    count = 0
+    for match in pattern.finditer(content):
+        if match.end() == match.start():
+            continue
+        if first is None:
+            first = last = match.start()
+        parts.append(content[last:match.start()])
+        parts.append(match.expand(replacement) if regex else replacement)
+        last = match.end()
+        count += 1
+    if first is None:
+        return None
+    return first, last, ''.join(parts), count
+
+
+class LineIndex:
+    # Maps string offsets to Tk "line.column" indices with a binary search
+    def __init__(self, content):
+        self.starts = [0]
+        self.starts.extend(m.end() for m in re.finditer('\n', content))
+
+    def to_index(self, offset):
+        line = bisect.bisect_right(self.starts, offset) - 1
+        return f"{line + 1}.{offset - self.starts[line]}"
+
+    def to_offset(self, index):
+        line, col = map(int, index.split('.'))
+        return self.starts[line - 1] + col
@@ -0,0 +1,451 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tkinter
+from contextlib import contextmanager
+from tkinter import filedialog, messagebox, simpledialog
+
+from edit_events import observe_all, unobserve_all
+from latency import percentile, tracker
+
+# -----------------------------------------
+# Recording and replaying editing sessions
+# -----------------------------------------
+# Micro-benchmarks time one handler at a time; a replayed session shows how
+# they interact: check results landing mid-word, the autocomplete popup taking
+# focus, a highlight slice delaying the next key. The recorder logs key and
+# mouse input, edits and file opens with millisecond timestamps to a gzipped
+# JSON-lines file. The replayer starts a fresh CodeEditorApp or SyntaxChecker,
+# feeds the same input with `event generate` at the recorded pace (or faster),
+# and measures each input from the moment it was due until the idle pass after
+# its handlers and redraw - input-to-paint, including any time the event loop
+# was too busy to take the input at all. Recorded edits are checked against
+# the replayed ones, so a report says whether two editor versions really saw
+# the same workload.
+#
+#   python session_replay.py record --app full_compiler session.jsonl.gz
+#   python session_replay.py replay session.jsonl.gz --speed 4 --out new.json --baseline old.json
+
+FORMAT = 'editor-session'
+VERSION = 1
+APPS = ['full_compiler', 'multiSyn']
+RECORD_TAG = 'SessionRecorder'
+EDIT_TEXT_LIMIT = 256       # longer inserted/removed text is stored as its length
+DEFAULT_THRESHOLD = 0.25    # 25% slower p95 than the baseline is a regression
+SETTLE_MS = 500             # let the window map and the first checks run before replaying
+
+# Record kinds:
+#   [t, 'k', path, keysym, state]   key press      [t, 'K', ...] key release
+#   [t, 'b', path, num, x, y]       button press   [t, 'B', ...] button release
+#   [t, 'e', path, start, removed, inserted]       edit (removed/inserted: text or length)
+#   [t, 'o', path, content]                        file opened through open_path
+INPUT_KINDS = {'k': '<KeyPress>', 'K': '<KeyRelease>', 'b': '<ButtonPress>', 'B': '<ButtonRelease>'}
+MEASURED_KINDS = {'k': 'key', 'b': 'click'}
+
+
+def _compact(text):
+    return text if len(text) <= EDIT_TEXT_LIMIT else len(text)
+
+
+def _edit_record(widget, event):
+    return [str(widget), event.start, _compact(event.removed), _compact(event.inserted)]
+
+
+def launch(app_name):
+    # Returns (root, app) for a fresh editor window
+    if app_name == 'full_compiler':
+        import full_compiler
+        app = full_compiler.CodeEditorApp()
+        return app, app
+    if app_name == 'multiSyn':
+        import multiSyn
+        root = tkinter.Tk()
+        root.geometry("1000x700")
+        return root, multiSyn.SyntaxChecker(root)
+    raise ValueError(f"unknown app {app_name!r}; expected one of {', '.join(APPS)}")
+
+
+# ---------------
+# Recording
+# ---------------
+
+class SessionRecorder:
+    def __init__(self, root, app, app_name):
+        self.root = root
+        self.app = app
+        self.app_name = app_name
+        self.records = []
+        self.origin = None
+        self.geometry = None
+        self.stats = {'inputs': 0, 'edits': 0, 'opens': 0}
+
+    def _now(self):
+        return int(round((time.perf_counter() - self.origin) * 1000))
+
+    def start(self):
+        self.origin = time.perf_counter()
+        self.geometry = self.root.winfo_geometry()
+        # A bindtag in front of each widget's own sees input before any
+        # binding can `break` it; widgets mapped later (popups) get it on <Map>
+        for kind, sequence in INPUT_KINDS.items():
+            self.root.bind_class(RECORD_TAG, sequence, lambda e, kind=kind: self._input(kind, e))
+        self.root.bind_all('<Map>', lambda e: self._tag_tree(str(e.widget)), add='+')
+        self._tag_tree(str(self.root))
+        observe_all(self._edit)
+        original = self.app.open_path
+
+        def open_path(filename, *args, **kwargs):
+            if self.origin is not None:
+                with open(filename, 'r', encoding='utf-8', errors='replace') as f:
+                    self.records.append([self._now(), 'o', filename, f.read()])
+                self.stats['opens'] += 1
+            return original(filename, *args, **kwargs)
+        self.app.open_path = open_path
+
+    def stop(self):
+        unobserve_all(self._edit)
+        self.origin = None
+
+    def _tag_tree(self, path):
+        call = self.root.tk.call
+        try:
+            tags = self.root.tk.splitlist(call('bindtags', path))
+            if RECORD_TAG not in tags:
+                call('bindtags', path, (RECORD_TAG,) + tuple(tags))
+            children = self.root.tk.splitlist(call('winfo', 'children', path))
+        except tkinter.TclError:
+            return  # destroyed while the event was queued
+        for child in children:
+            self._tag_tree(str(child))
+
+    def _input(self, kind, event):
+        if self.origin is None:
+            return
+        self.stats['inputs'] += 1
+        if kind in ('k', 'K'):
+            self.records.append([self._now(), kind, str(event.widget), event.keysym, event.state])
+        else:
+            self.records.append([self._now(), kind, str(event.widget), event.num, event.x, event.y])
+
+    def _edit(self, widget, event):
+        if self.origin is None:
+            return
+        self.stats['edits'] += 1
+        self.records.append([self._now(), 'e'] + _edit_record(widget, event))
+
+    def save(self, path):
+        header = {'format': FORMAT, 'version': VERSION, 'app': self.app_name,
+                  'geometry': self.geometry, 'recorded': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(header) + "\n")
+            for record in self.records:
+                f.write(json.dumps(record, separators=(',', ':')) + "\n")
+        return len(self.records)
+
+
+def load_session(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != FORMAT or header.get('version') != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} editor session")
+        return header, [json.loads(line) for line in f if line.strip()]
+
+
+# ---------------
+# Replaying
+# ---------------
+
+@contextmanager
+def quiet_dialogs():
+    # A recorded Ctrl+O or a compile error must not block the replay on a
+    # modal dialog; files come from the session's 'o' records instead
+    replaced = {
+        filedialog: {'askopenfilename': '', 'asksaveasfilename': '', 'askdirectory': ''},
+        messagebox: {'showinfo': 'ok', 'showwarning': 'ok', 'showerror': 'ok', 'askyesno': False,
+                     'askokcancel': False, 'askyesnocancel': None, 'askquestion': 'no'},
+        simpledialog: {'askstring': None, 'askinteger': None, 'askfloat': None},
+    }
+    saved = [(module, name, getattr(module, name)) for module, names in replaced.items() for name in names]
+    for module, names in replaced.items():
+        for name, value in names.items():
+            setattr(module, name, lambda *args, _value=value, **kwargs: _value)
+    try:
+        yield
+    finally:
+        for module, name, original in saved:
+            setattr(module, name, original)
+
+
+class SessionReplayer:
+    # speed 1.0 is the recorded pace, 4.0 four times faster; 0 feeds each
+    # input as soon as the previous one has painted
+    def __init__(self, root, app, records, speed=1.0):
+        self.root = root
+        self.app = app
+        self.records = records
+        self.speed = speed
+        self.index = 0
+        self.origin = None
+        self.focus = None
+        self.waiting = 0            # measurements still in flight
+        self.samples = {kind: [] for kind in MEASURED_KINDS.values()}
+        self.expected_edits = [r[2:] for r in records if r[1] == 'e']
+        self.replayed_edits = []
+        self.stats = {'inputs': 0, 'missed': 0, 'opens': 0}
+        self.files = tempfile.mkdtemp(prefix='session-replay-')
+        self.done = None
+
+    def start(self, done):
+        self.done = done
+        observe_all(self._edit)
+        tracker.clear()
+        self.origin = time.perf_counter()
+        self._schedule()
+
+    def _edit(self, widget, event):
+        self.replayed_edits.append(_edit_record(widget, event))
+
+    def _schedule(self):
+        if self.index >= len(self.records):
+            self._finish()
+            return
+        record = self.records[self.index]
+        if self.speed:
+            due = self.origin + record[0] / 1000.0 / self.speed
+        else:
+            due = time.perf_counter()
+        delay = max(0, int((due - time.perf_counter()) * 1000))
+        self.root.after(delay, self._fire, record, due)
+
+    def _fire(self, record, due):
+        self.index += 1
+        kind = record[1]
+        measured = False
+        try:
+            if kind in INPUT_KINDS:
+                measured = self._inject(record, due)
+            elif kind == 'o':
+                self._open(record)
+        finally:
+            if self.speed or not measured:
+                self._schedule()
+
+    def _inject(self, record, due):
+        call = self.root.tk.call
+        kind, path = record[1], record[2]
+        if not call('winfo', 'exists', path):
+            # The widget the user typed into doesn't exist in this version, e.g.
+            # a popup that never opened
+            self.stats['missed'] += 1
+            return False
+        self.stats['inputs'] += 1
+        if kind in ('k', 'K'):
+            if kind == 'k' and path != self.focus:
+                call('focus', '-force', path)
+                self.focus = path
+            call('event', 'generate', path, INPUT_KINDS[kind], '-keysym', record[3], '-state', record[4])
+        else:
+            num, x, y = record[3:6]
+            call('event', 'generate', path, f"{INPUT_KINDS[kind][:-1]}-{num}>", '-x', x, '-y', y)
+        if kind not in MEASURED_KINDS:
+            return False
+        self.waiting += 1
+        sample = self.samples[MEASURED_KINDS[kind]]
+
+        def painted():
+            sample.append(time.perf_counter() - due)
+            self.waiting -= 1
+            if not self.speed:
+                self._schedule()
+            elif self.index >= len(self.records) and not self.waiting:
+                self._finish()
+        # The handlers ran inside `event generate`; the redraw and coalesced
+        # checks they queued run in the next idle pass, work those queue in the
+        # pass after
+        self.root.after_idle(lambda: self.root.after_idle(painted))
+        return True
+
+    def _open(self, record):
+        # Same basename so language detection by extension still works
+        original = record[2]
+        folder = os.path.join(self.files, hashlib.sha1(os.path.dirname(original).encode()).hexdigest()[:8])
+        os.makedirs(folder, exist_ok=True)
+        filename = os.path.join(folder, os.path.basename(original))
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(record[3])
+        self.stats['opens'] += 1
+        self.app.open_path(filename)
+
+    def _finish(self):
+        if self.done is None or self.waiting:
+            return
+        done, self.done = self.done, None
+        unobserve_all(self._edit)
+        shutil.rmtree(self.files, ignore_errors=True)
+        done(self.report())
+
+    def report(self):
+        divergence = None
+        for i, (expected, got) in enumerate(zip(self.expected_edits, self.replayed_edits)):
+            if expected != got:
+                divergence = {'index': i, 'recorded': expected, 'replayed': got}
+                break
+        if divergence is None and len(self.expected_edits) != len(self.replayed_edits):
+            shorter = min(len(self.expected_edits), len(self.replayed_edits))
+            divergence = {'index': shorter,
+                          'recorded': self.expected_edits[shorter] if shorter < len(self.expected_edits) else None,
+                          'replayed': self.replayed_edits[shorter] if shorter < len(self.replayed_edits) else None}
+        latency = {kind: summarize_latency(values) for kind, values in self.samples.items() if values}
+        everything = [v for values in self.samples.values() for v in values]
+        if everything:
+            latency['all'] = summarize_latency(everything)
+        return {
+            'speed': self.speed,
+            'wall_s': round(time.perf_counter() - self.origin, 3),
+            'inputs': self.stats['inputs'],
+            'missed': self.stats['missed'],
+            'opens': self.stats['opens'],
+            'latency_ms': latency,
+            'edits': {'recorded': len(self.expected_edits), 'replayed': len(self.replayed_edits),
+                      'first_divergence': divergence},
+            # Recent window only, see latency.WINDOW
+            'phases_ms': {name: {'p50': round(p50 * 1000, 3), 'p95': round(p95 * 1000, 3), 'count': count}
+                          for name, (p50, p95, count) in tracker.summary().items()},
+        }
+
+
+def summarize_latency(values):
+    values = sorted(values)
+    summary = {'count': len(values), 'mean': round(sum(values) / len(values) * 1000, 3),
+               'max': round(values[-1] * 1000, 3)}
+    for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p95', 0.95), ('p99', 0.99)):
+        summary[name] = round(percentile(values, fraction) * 1000, 3)
+    return summary
+
+
+def replay_session(path, app_name=None, speed=1.0):
+    header, records = load_session(path)
+    with quiet_dialogs():
+        root, app = launch(app_name or header['app'])
+        if header.get('geometry'):
+            root.geometry(header['geometry'])  # click coordinates depend on the layout
+        result = {}
+        replayer = SessionReplayer(root, app, records, speed)
+
+        def done(report):
+            result.update(report)
+            root.destroy()
+        root.after(SETTLE_MS, replayer.start, done)
+        root.mainloop()
+    result.update({'session': os.path.basename(path), 'app': app_name or header['app'],
+                   'recorded_app': header['app']})
+    return result
+
+
+# ---------------
+# Reports
+# ---------------
+
+def format_report(report):
+    pace = f"{report['speed']:g}x" if report['speed'] else 'max'
+    lines = [f"Replay of {report['session']} in {report['app']} at {pace} speed: "
+             f"{report['inputs']} inputs, {report['missed']} missed, {report['wall_s']:.1f} s"]
+    lines.append(f"{'input-to-paint':<16}{'count':>8}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for kind, s in report['latency_ms'].items():
+        lines.append(f"{kind:<16}{s['count']:>8}{s['p50']:>10.2f}{s['p90']:>10.2f}"
+                     f"{s['p95']:>10.2f}{s['p99']:>10.2f}{s['max']:>10.2f}")
+    edits = report['edits']
+    if edits['first_divergence'] is None:
+        lines.append(f"Edits: all {edits['recorded']} recorded edits reproduced.")
+    else:
+        d = edits['first_divergence']
+        lines.append(f"Edits: replay diverged at edit {d['index']} of {edits['recorded']} "
+                     f"(recorded {d['recorded']}, replayed {d['replayed']}).")
+    return "\n".join(lines) + "\n"
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    # Returns [(kind, stat, baseline ms, current ms, ratio, regressed)]; only p95 can regress
+    rows = []
+    for kind, after in sorted(current['latency_ms'].items()):
+        before = baseline['latency_ms'].get(kind)
+        if not before:
+            continue
+        for stat in ('p50', 'p95', 'p99', 'max'):
+            ratio = after[stat] / before[stat] if before[stat] else float('inf')
+            rows.append((kind, stat, before[stat], after[stat], ratio, stat == 'p95' and ratio > 1 + threshold))
+    return rows
+
+
+def format_comparison(rows, current, baseline):
+    lines = [f"{'Latency':<16}{'Base (ms)':>12}{'Now (ms)':>12}{'Now/Base':>10}"]
+    for kind, stat, before, after, ratio, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        lines.append(f"{kind + ' ' + stat:<16}{before:>12.2f}{after:>12.2f}{ratio:>9.2f}x{flag}")
+    for label, report in (('baseline', baseline), ('current', current)):
+        if report['edits']['first_divergence'] is not None:
+            lines.append(f"Warning: the {label} replay diverged from the recording; the workloads differ.")
+    regressions = sum(1 for row in rows if row[5])
+    lines.append(f"{regressions} regression(s).")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and replay editing sessions")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="open an editor and record until it is closed")
+    record.add_argument('session', help="file to write (gzipped JSON lines)")
+    record.add_argument('--app', choices=APPS, default='full_compiler')
+    replay = commands.add_parser('replay', help="replay a session and report input-to-paint latency")
+    replay.add_argument('session')
+    replay.add_argument('--app', choices=APPS, help="editor to drive (default: the one recorded)")
+    replay.add_argument('--speed', type=float, default=1.0,
+                        help="pace relative to the recording; 0 sends each input once the last has painted")
+    replay.add_argument('--out', help="write the report JSON here")
+    replay.add_argument('--baseline', help="report JSON to compare against")
+    replay.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed p95 slowdown before a latency counts as regressed")
+    compare_cmd = commands.add_parser('compare', help="compare two replay reports")
+    compare_cmd.add_argument('baseline')
+    compare_cmd.add_argument('current')
+    compare_cmd.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        root, app = launch(args.app)
+        recorder = SessionRecorder(root, app, args.app)
+        root.after(SETTLE_MS, recorder.start)
+        root.mainloop()
+        recorder.stop()
+        count = recorder.save(args.session)
+        print(f"Recorded {count} events to {args.session}")
+        return 0
+
+    if args.command == 'replay':
+        current = replay_session(args.session, args.app, args.speed)
+        print(format_report(current), end='')
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(current, f, indent=2, sort_keys=True)
+        if not args.baseline:
+            return 0
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+    rows = compare(current, baseline, args.threshold)
+    print(format_comparison(rows, current, baseline), end='')
+    return 1 if any(row[5] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
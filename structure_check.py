@@ -0,0 +1,189 @@
+import re
+
+from lexer import (
+    tokenize, supported, NEWLINE, COMMENT, BRACKET, OPERATOR, OTHER, PREPROCESSOR,
+    UNTERMINATED_COMMENT, UNTERMINATED_STRING, UNTERMINATED_CHAR,
+)
+
+# -----------------------------------------
+# In-process structural pre-check
+# -----------------------------------------
+# Catches the states a buffer is in for most keystrokes (an unclosed brace,
+# string or comment, a bad Python indent) from the lexer's token stream, so
+# the live checkers can report them without launching a compiler. Anything
+# reported here is a definite error; an empty result says nothing about
+# whether the compiler will accept the file. Brackets can't be paired for
+# sure once a #if/#ifdef appears (branches like `#ifdef __cplusplus
+# extern "C" {` open what another branch or file closes), or once a #define
+# body has brackets that don't pair up by themselves (`#define OPEN {`), so
+# from there on bracket errors are left to the compiler.
+
+MAX_ERRORS = 20
+EXPECTED_BLOCK = "expected an indented block"
+PAIRS = {')': '(', ']': '[', '}': '{'}
+_BLANK_LINES = re.compile(r'(?:[ \t\f]*(?:#[^\n]*)?\n)*')
+_INDENT = re.compile(r'[ \t\f]*')
+_CONDITIONAL = re.compile(r'[ \t]*#[ \t]*(if|ifdef|ifndef|elif|else|endif)\b')
+_DEFINE_HEAD = re.compile(r'[ \t]*#[ \t]*define[ \t]+\w+(?:\([^)\n]*\))?')
+
+UNTERMINATED_MESSAGES = {
+    UNTERMINATED_COMMENT: "unterminated comment",
+    UNTERMINATED_STRING: "unterminated string literal",
+    UNTERMINATED_CHAR: "unterminated character literal",
+}
+
+
+def _position(code, offset):
+    # 1-based line and column, as compilers report them
+    line_start = code.rfind('\n', 0, offset) + 1
+    return code.count('\n', 0, offset) + 1, offset - line_start + 1
+
+
+def _unpaired_macro(code, start, end, lang):
+    # True for a #define whose body opens or closes brackets for the code
+    # that uses it
+    head = _DEFINE_HEAD.match(code, start, end)
+    if not head:
+        return False
+    body = code[head.end():end]
+    stack = []
+    for kind, first, _ in tokenize(body, lang, structural=True):
+        if kind != BRACKET:
+            continue
+        ch = body[first]
+        if ch in '([{':
+            stack.append(ch)
+        elif not stack or stack.pop() != PAIRS[ch]:
+            return True
+    return bool(stack)
+
+
+def _indent_width(indent, tabsize):
+    width = 0
+    for ch in indent:
+        if ch == '\t':
+            width = (width // tabsize + 1) * tabsize
+        elif ch == ' ':
+            width += 1
+        # form feeds reset nothing that matters here
+    return width
+
+
+class _Indentation:
+    # Python's tokenizer rules: a line's indent is compared with tab size 8 and
+    # tab size 1; if the two comparisons disagree, tabs and spaces are mixed.
+    def __init__(self):
+        self.levels = [(0, 0)]
+        self.expect_block = False
+        self.header = 0  # offset of the last block header
+
+    def check(self, indent):
+        wide, narrow = _indent_width(indent, 8), _indent_width(indent, 1)
+        top_wide, top_narrow = self.levels[-1]
+        expect_block, self.expect_block = self.expect_block, False
+        if wide > top_wide:
+            if narrow <= top_narrow:
+                return "inconsistent use of tabs and spaces in indentation"
+            if not expect_block:
+                return "unexpected indent"
+            self.levels.append((wide, narrow))
+            return None
+        while wide < self.levels[-1][0]:
+            self.levels.pop()
+        if wide != self.levels[-1][0]:
+            return "unindent does not match any outer indentation level"
+        if narrow != self.levels[-1][1]:
+            return "inconsistent use of tabs and spaces in indentation"
+        if expect_block:
+            return EXPECTED_BLOCK
+        return None
+
+
+def check_structure(code, lang, tokens=None):
+    # Returns [(line, column, message)] sorted by position. tokens, when given,
+    # is the structural token stream, e.g. from a TokenStore
+    if not supported(lang):
+        return []
+    python = lang == 'Python'
+    errors = []
+    stack = []  # (bracket, offset) of open brackets
+    conditional = False  # a #if or bracket macro was seen: bracket errors are no longer certain
+    indentation = _Indentation() if python else None
+    last = None            # last structural token on the current logical line
+    logical_start = 0      # offset where the current logical line began
+    checked_upto = 0       # blank lines up to here were skipped by the last indent check
+
+    def check_indent(newline_end):
+        # Indentation of the next line that holds code, skipping blank and comment-only lines
+        nonlocal indentation, logical_start, checked_upto
+        line = _BLANK_LINES.match(code, newline_end).end()
+        indent = _INDENT.match(code, line)
+        checked_upto = line
+        if indent.end() == len(code):
+            return
+        logical_start = indent.end()
+        message = indentation.check(indent.group())
+        if message == EXPECTED_BLOCK:
+            message += f" after line {_position(code, indentation.header)[0]}"
+        if message:
+            errors.append((logical_start, message))
+            indentation = None  # like the compiler, stop at the first indentation error
+
+    if python:
+        check_indent(0)
+    if tokens is None:
+        tokens = tokenize(code, lang, structural=True)
+    for kind, start, end in tokens:
+        if kind == NEWLINE:
+            # Inside brackets or after a backslash the logical line continues
+            if last == OTHER:
+                last = None
+            elif not stack and start >= checked_upto:
+                if indentation is not None:
+                    if last == OPERATOR:
+                        indentation.expect_block = True
+                        indentation.header = logical_start
+                    check_indent(end)
+                last = None
+            continue
+        if kind == COMMENT:
+            continue
+        if kind == PREPROCESSOR:
+            if _CONDITIONAL.match(code, start) or _unpaired_macro(code, start, end, lang):
+                conditional = True
+            continue
+        last = kind
+
+        if kind in UNTERMINATED_MESSAGES:
+            message = UNTERMINATED_MESSAGES[kind]
+            if python and code[start:end].lstrip('rRbBuUfF').startswith(('"""', "'''")):
+                message = "unterminated triple-quoted string literal"
+            errors.append((start, message))
+        elif kind == BRACKET:
+            ch = code[start]
+            if ch in '([{':
+                stack.append((ch, start))
+            elif not stack:
+                if not conditional:
+                    errors.append((start, f"unmatched '{ch}'"))
+            else:
+                opener, opened_at = stack.pop()
+                if opener != PAIRS[ch] and not conditional:
+                    line = _position(code, opened_at)[0]
+                    errors.append((start, f"closing '{ch}' does not match '{opener}' on line {line}"))
+        if len(errors) >= MAX_ERRORS:
+            break
+
+    if not conditional:
+        for opener, opened_at in stack:
+            errors.append((opened_at, f"'{opener}' was never closed"))
+    if indentation is not None and not stack and (indentation.expect_block or last == OPERATOR):
+        # A block header on the last line, with or without a trailing newline
+        errors.append((logical_start, EXPECTED_BLOCK))
+    errors.sort()
+    return [(*_position(code, offset), message) for offset, message in errors[:MAX_ERRORS]]
+
+
+def format_errors(errors, filename, severity='error'):
+    # gcc-style lines, so existing "file:line:" parsers pick them up unchanged
+    return ''.join(f"{filename}:{line}:{col}: {severity}: {message}\n" for line, col, message in errors)
@@ -0,0 +1,40 @@
+import sys
+
+import pytest
+
+from benchmark import run_once, summarize
+
+
+def test_timeout_kills_the_child_and_still_reports_usage():
+    sample = run_once([sys.executable, '-c', 'import time; time.sleep(30)'], timeout=0.2)
+    assert sample['returncode'] != 0
+    assert sample['wall'] < 10
+    if sys.platform.startswith('linux'):
+        assert sample['user'] is not None
+
+
+def test_exit_code_and_stdin_are_passed_through(tmp_path):
+    stdin = tmp_path / 'in.txt'
+    stdin.write_text('7\n')
+    sample = run_once(['sh', '-c', 'read a; echo ignored; exit $a'], stdin_path=str(stdin), timeout=30)
+    assert sample['returncode'] == 7
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="Linux max RSS accounting")
+def test_max_rss_does_not_include_the_editor():
+    ballast = bytearray(200 * 1024 * 1024)
+    for i in range(0, len(ballast), 4096):
+        ballast[i] = 1
+    sample = run_once(['true'])
+    assert sample['rss_floor'] <= sample['max_rss'] < 64 * 1024
+
+
+def test_missing_program_raises():
+    with pytest.raises(FileNotFoundError):
+        run_once(['no-such-program-anywhere'])
+
+
+def test_p95_is_one_of_the_samples():
+    stats = summarize([float(n) for n in range(1, 21)])
+    assert stats['p95'] == 19.0
+    assert stats['min'] == 1.0
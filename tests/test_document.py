@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+import document
+from document import Document
+
+
+def assert_same(doc, text):
+    assert doc.length == len(text)
+    assert doc.get_text() == text
+    assert doc.line_count == text.count('\n') + 1
+    starts = [0] + [i + 1 for i, ch in enumerate(text) if ch == '\n']
+    for line, start in enumerate(starts, 1):
+        assert doc.line_start(line) == start
+        end = starts[line] - 1 if line < len(starts) else len(text)
+        assert doc.get_line(line) == text[start:end]
+    for offset in range(len(text) + 1):
+        line = text.count('\n', 0, offset) + 1
+        col = offset - starts[line - 1]
+        assert doc.offset_to_line_col(offset) == (line, col)
+        assert doc.from_tk_index(doc.to_tk_index(offset)) == offset
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_edits_match_string(seed, monkeypatch):
+    # A low piece limit so flattening happens during the run too
+    monkeypatch.setattr(document, 'MAX_PIECES', 32)
+    rng = random.Random(seed)
+    text = ''.join(rng.choice('ab\n漢 ') for _ in range(rng.randint(0, 60)))
+    doc = Document(text)
+    snapshots = []
+    for step in range(300):
+        offset = rng.randint(0, len(text))
+        if rng.random() < 0.5:
+            length = rng.randint(0, 8)
+            assert doc.delete(offset, length) == text[offset:offset + length]
+            text = text[:offset] + text[offset + length:]
+        else:
+            # Mostly typing right after the last insert, which extends its buffer
+            inserted = ''.join(rng.choice('xy\n') for _ in range(rng.randint(1, 4)))
+            doc.insert(offset, inserted)
+            text = text[:offset] + inserted + text[offset:]
+        if step % 25 == 0:
+            snapshots.append((doc.snapshot(), text))
+        start = rng.randint(0, len(text))
+        end = rng.randint(start, len(text))
+        assert doc.get_text(start, end) == text[start:end]
+    assert_same(doc, text)
+    # Snapshots keep the text they were taken with
+    for snapshot, expected in snapshots:
+        assert snapshot.get_text() == expected
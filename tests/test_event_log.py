@@ -0,0 +1,42 @@
+import json
+import shutil
+
+import pytest
+
+import build_profiles
+import event_log
+
+
+@pytest.fixture
+def c_source(tmp_path):
+    if shutil.which('gcc') is None:
+        pytest.skip("gcc is not installed")
+    src = tmp_path / 'main.c'
+    src.write_text('int main(void) { return 0; }\n')
+    return str(src)
+
+
+def test_builds_log_nothing_until_an_editor_enables_logging(c_source, tmp_path, monkeypatch):
+    monkeypatch.setattr(event_log, 'event_log', event_log._DisabledLog())
+    monkeypatch.setattr(build_profiles, '_build_listener', None)
+    monkeypatch.setattr(event_log, 'LOG_DIR', str(tmp_path / 'logs'))
+    build_profiles.build('C', c_source, 'Debug')
+    assert not (tmp_path / 'logs').exists()
+
+    path = tmp_path / 'events.jsonl'
+    log = event_log.enable_logging(str(path))
+    build_profiles.set_build_listener(event_log.log_event)
+    build_profiles.build('C', c_source, 'Debug')
+    log.close()
+    [record] = [json.loads(line) for line in path.read_text().splitlines()]
+    assert record['op'] == 'build' and record['cache'] == 'hit' and record['lang'] == 'C'
+
+
+def test_analyze_skips_paths_that_match_nothing(tmp_path, capsys):
+    log = tmp_path / 'events.jsonl'
+    log.write_text('{"op": "build", "lang": "C", "duration_ms": 3}\n')
+    files = event_log.log_files([str(tmp_path / 'host' / '*.jsonl'), str(tmp_path / 'missing.jsonl'), str(tmp_path)])
+    assert files == [str(log)]
+    assert capsys.readouterr().err.count('warning: no log files match') == 2
+    assert event_log.analyze(event_log.read_records(files + [str(tmp_path / 'rotated.jsonl')]))[('C', 'build')]['count'] == 1
+    assert 'skipping' in capsys.readouterr().err
@@ -0,0 +1,29 @@
+from html_check import HTMLChecker, check_html
+
+
+def test_line_references_are_filled_in():
+    text = '<span>\n<div></div></span>\n<p id="a"></p>\n<p id="a"></p>\n'
+    assert check_html(text) == [
+        (2, 1, 'block element <div> inside <span> opened on line 1'),
+        (4, 1, 'duplicate id "a" (first used on line 3)'),
+    ]
+
+
+def test_braces_in_tags_and_ids_are_reported_verbatim():
+    text = ('<span><div{x}></div></span>\n'
+            '<b id="{0}"></b><b id="{0}"></b>\n'
+            '<i id="{{ item.id }}"></i><i id="{{ item.id }}"></i>\n'
+            '<em><a{}></em>}\n')
+    messages = [message for _, _, message in check_html(text)]
+    assert '</span> found while <div{x}> from line 1 is still open' in messages
+    assert 'duplicate id "{0}" (first used on line 2)' in messages
+    assert 'duplicate id "{{ item.id }}" (first used on line 3)' in messages
+    assert '</em> found while <a{}> from line 4 is still open' in messages
+
+
+def test_incremental_check_with_braces_matches_a_fresh_check():
+    checker = HTMLChecker()
+    text = '<ul>\n' + ''.join(f'<li id="{{{{ row.{i} }}}}">{i}</li>\n' for i in range(200)) + '</ul>\n'
+    checker.check(text)
+    edited = text.replace('row.150', 'row.3')
+    assert checker.check(edited) == check_html(edited)
@@ -0,0 +1,38 @@
+from headless import FakeText
+from large_file import ProgressiveLoader
+from ui_scheduler import scheduler_for
+
+
+class IdleText(FakeText):
+    # Acts as its own Tk root and lets a UIScheduler arm itself; jobs are
+    # then drained with flush()
+    def _root(self):
+        return self
+
+    def after_idle(self, callback, *args):
+        return 'after#1'
+
+
+def load(path, cursor=None, chunk=64):
+    text = IdleText()
+    done = []
+    loader = ProgressiveLoader(text, str(path), on_done=done.append, chunk=chunk).start()
+    if cursor is not None:
+        loader.cursor = cursor
+    scheduler_for(text).flush(loader.key)
+    assert done == [loader]
+    return text
+
+
+def test_loaded_file_opens_at_the_top(tmp_path):
+    path = tmp_path / 'a.c'
+    path.write_bytes(b''.join(b'int v%d;\r\n' % i for i in range(100)))
+    text = load(path)
+    assert text.get('1.0', 'end-1c') == ''.join(f'int v{i};\n' for i in range(100))
+    assert text.index('insert') == '1.0'
+
+
+def test_cursor_set_while_loading_is_kept(tmp_path):
+    path = tmp_path / 'a.c'
+    path.write_text(''.join(f'int v{i};\n' for i in range(100)))
+    assert load(path, cursor='42.0').index('insert') == '42.0'
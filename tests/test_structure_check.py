@@ -0,0 +1,29 @@
+from structure_check import check_structure
+
+
+def test_unclosed_brace_is_reported():
+    assert check_structure('int f() {\n', 'C') == [(1, 9, "'{' was never closed")]
+
+
+def test_brackets_split_across_conditional_branches_are_left_to_the_compiler():
+    code = ('#ifdef __cplusplus\nextern "C" {\n#else\nint y;\n#endif\nint x;\n'
+            '#ifdef __cplusplus\n}\n#endif\nint z)\n')
+    assert check_structure(code, 'C') == []
+
+
+def test_unterminated_literals_are_still_reported_after_a_conditional():
+    code = '#if X\nint a;\n#endif\nchar *s = "abc\n'
+    assert check_structure(code, 'C') == [(4, 11, 'unterminated string literal')]
+
+
+def test_brackets_opened_by_a_macro_are_left_to_the_compiler():
+    code = '#define OPEN {\n#define CLOSE }\nint g(void) OPEN return 1; }\nint h(void) { return 2; CLOSE\n'
+    assert check_structure(code, 'C') == []
+
+
+def test_macros_with_paired_brackets_keep_bracket_checks():
+    code = ('#define MAX(a, b) ((a) > (b) ? (a) : (b))\n'
+            '#define BRACE "{"\n'
+            '#define INIT { 0, \\\n    [1] = 2 }\n'
+            'int f(void) { return MAX(1, 2);\n')
+    assert check_structure(code, 'C') == [(5, 13, "'{' was never closed")]
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+import parallel_lex
+from document import Document
+from lexer import tokenize, KINDS
+from token_store import TokenStore
+
+LANGS = ['C', 'C++', 'Python', 'Java']
+
+# Fragments that open and close every multi-line construct the lexer knows,
+# plus line-start directives, so random edits keep crossing token boundaries
+FRAGMENTS = [
+    'x', 'foo', ' ', '  ', '\t', '\n', '\n\n', '#', '#define A', '#include <a.h>', '\\', '\\\n',
+    '/*', '*/', '//', '"', "'", '"""', "'''", 'R"d(', ')d"', '(', ')', '{', '}', '[', ']',
+    ':', '1.5e+3', "1'000", 'def f():', 'if', 'return', ';', 'é', '漢',
+]
+
+
+def random_text(rng, pieces):
+    return ''.join(rng.choice(FRAGMENTS) for _ in range(pieces))
+
+
+def assert_matches_full_lex(store, code):
+    assert list(store) == list(tokenize(code, store.lang))
+
+
+def test_indented_directive_on_first_line():
+    store = TokenStore('C')
+    store.update('  x\n')
+    store.note_edit(2, 1, 8)
+    store.update('  #define A\n')
+    assert_matches_full_lex(store, '  #define A\n')
+    assert store.token(0) == (KINDS['preprocessor'], 0, 11)
+
+
+@pytest.mark.parametrize('lang', LANGS)
+@pytest.mark.parametrize('as_document', [False, True])
+def test_random_edits_match_full_lex(lang, as_document):
+    rng = random.Random(f"{lang}-{as_document}")
+    for _ in range(1500):
+        code = random_text(rng, rng.randint(0, 30))
+        document = Document(code) if as_document else None
+        store = TokenStore(lang)
+        store.update(document or code)
+        # A burst of edits between updates, as typing between idle callbacks gives
+        for _ in range(rng.randint(1, 4)):
+            offset = rng.randint(0, len(code))
+            removed = rng.randint(0, min(6, len(code) - offset))
+            inserted = random_text(rng, rng.randint(0, 3))
+            code = code[:offset] + inserted + code[offset + removed:]
+            store.note_edit(offset, removed, len(inserted))
+            if document is not None:
+                document.delete(offset, removed)
+                document.insert(offset, inserted)
+        store.update(document or code)
+        assert_matches_full_lex(store, code)
+
+
+@pytest.mark.skipif(parallel_lex.FORK is None, reason="workers are only forked")
+@pytest.mark.parametrize('lang', LANGS)
+def test_parallel_lex_matches_serial(lang, monkeypatch):
+    monkeypatch.setattr(parallel_lex, 'PARALLEL_MIN_CHARS', 0)
+    monkeypatch.setattr(parallel_lex, 'MIN_CHUNK_CHARS', 50)
+    rng = random.Random(lang)
+    for _ in range(10):
+        code = random_text(rng, rng.randint(100, 600))
+        store = TokenStore(lang, workers=3)
+        store.update(code)
+        assert store.stats['parallel'] == 1
+        assert_matches_full_lex(store, code)
+
+
+def test_no_fork_means_serial_lexing(monkeypatch):
+    monkeypatch.setattr(parallel_lex, 'PARALLEL_MIN_CHARS', 0)
+    monkeypatch.setattr(parallel_lex, 'FORK', None)
+    code = 'int x;\n' * 100
+    store = TokenStore('C', workers=3)
+    store.update(code)
+    assert store.stats['parallel'] == 0
+    assert_matches_full_lex(store, code)
+
+
+def test_match_bracket_and_identifiers():
+    code = 'int f(int a) { return g(a[0]); }\n'
+    store = TokenStore('C')
+    store.update(code)
+    assert store.match_bracket(code, code.index('{')) == (code.index('{'), code.index('}'))
+    assert store.match_bracket(code, code.index(']')) == (code.index(']'), code.index('['))
+    assert store.identifiers(code) == {'f', 'a', 'g'}
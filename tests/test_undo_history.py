@@ -0,0 +1,177 @@
+import random
+
+import pytest
+
+import undo_history
+from edit_events import EditEvent
+from headless import FakeText
+from undo_history import UndoHistory
+
+
+class FakeProxy:
+    # Stands in for TextEditProxy: applies edits to a FakeText and reports them
+    def __init__(self, text):
+        self.text = text
+        self.subscribers = []
+        self.version = 0
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def replace(self, offset, length, inserted):
+        start = self.text.index(f"1.0+{offset}c")
+        removed = self.text.get(start, f"{start}+{length}c")
+        if removed:
+            self.text.delete(start, f"{start}+{length}c")
+        if inserted:
+            self.text.insert(start, inserted)
+        if removed or inserted:
+            self.version += 1
+            for callback in list(self.subscribers):
+                callback(EditEvent(start, removed, inserted, self.version))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def content(text):
+    return text.get('1.0', 'end-1c')
+
+
+def random_text(rng, length):
+    return ''.join(rng.choice('abc xy_\n(){};') for _ in range(length))
+
+
+def random_edit(rng, proxy, cursor):
+    # One user-like edit; returns the new cursor offset
+    length = len(content(proxy.text))
+    roll = rng.random()
+    if roll < 0.4:
+        # Typing at the cursor, which merges into word-sized steps
+        char = rng.choice('abcd  .\n') if rng.random() < 0.9 else rng.choice('xyz')
+        proxy.replace(cursor, 0, char)
+        return cursor + 1
+    if roll < 0.55 and cursor > 0:
+        proxy.replace(cursor - 1, 1, '')    # Backspace
+        return cursor - 1
+    if roll < 0.65 and cursor < length:
+        proxy.replace(cursor, 1, '')        # Delete
+        return cursor
+    offset = rng.randint(0, length)
+    removed = rng.randint(0, min(length - offset, 120))
+    if rng.random() < 0.3:
+        # A large edit that keeps its line count, stored as changed lines only
+        old = content(proxy.text)[offset:offset + removed]
+        inserted = ''.join(ch if ch == '\n' or rng.random() < 0.9 else rng.choice('QRS') for ch in old)
+    else:
+        inserted = random_text(rng, rng.randint(0, 80))
+    proxy.replace(offset, removed, inserted)
+    return offset + len(inserted)
+
+
+def undo_all(history, text):
+    states = [content(text)]
+    while history.can_undo():
+        assert history.undo()
+        states.append(content(text))
+    assert not history.undo()
+    return states
+
+
+def redo_all(history, text):
+    states = [content(text)]
+    while history.can_redo():
+        assert history.redo()
+        states.append(content(text))
+    assert not history.redo()
+    return states
+
+
+def assert_passes_through(states, checkpoints):
+    # checkpoints must appear in states in the same order
+    position = 0
+    for checkpoint in checkpoints:
+        while states[position] != checkpoint:
+            position += 1
+            assert position < len(states), "undo/redo skipped a checkpoint"
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_random_edits_undo_to_the_start_and_redo_to_the_end(seed, monkeypatch):
+    # Small limits so packing and spilling to disk happen within the run
+    monkeypatch.setattr(undo_history, 'PACK_THRESHOLD', 40)
+    clock = Clock()
+    monkeypatch.setattr(undo_history, 'time', clock)
+    rng = random.Random(seed)
+    text = FakeText(random_text(rng, rng.randint(0, 300)))
+    proxy = FakeProxy(text)
+    history = UndoHistory(max_steps=6, max_bytes=2000)
+    history.attach(text, proxy)
+
+    checkpoints = [content(text)]
+    cursor = rng.randint(0, len(checkpoints[0]))
+    for _ in range(250):
+        roll = rng.random()
+        if roll < 0.05:
+            with history.group():
+                for _ in range(rng.randint(1, 4)):
+                    cursor = random_edit(rng, proxy, cursor)
+        elif roll < 0.1:
+            clock.now += 2.0            # a pause ends the word being typed
+        elif roll < 0.15:
+            history.separator()
+            checkpoints.append(content(text))
+        elif roll < 0.2 and history.can_undo():
+            # Undoing some steps and redoing them gets back to the same text
+            before = content(text)
+            count = rng.randint(1, 3)
+            path = [before]
+            for _ in range(count):
+                if history.undo():
+                    path.append(content(text))
+            for expected in reversed(path[:-1]):
+                assert history.redo()
+                assert content(text) == expected
+            assert content(text) == before
+        else:
+            cursor = random_edit(rng, proxy, cursor)
+        cursor = min(cursor, len(content(text)))
+        clock.now += rng.random() * 0.5
+
+    final = content(text)
+    checkpoints.append(final)
+    undone = undo_all(history, text)
+    assert undone[-1] == checkpoints[0]
+    assert_passes_through(undone, list(reversed(checkpoints)))
+    redone = redo_all(history, text)
+    assert redone[-1] == final
+    assert_passes_through(redone, checkpoints)
+    # Once more, now that the older steps went through the spill file
+    assert undo_all(history, text) == undone
+    assert history.stats['dropped'] == 0
+
+
+def test_typing_merges_into_words_and_a_new_edit_clears_redo(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(undo_history, 'time', clock)
+    text = FakeText()
+    proxy = FakeProxy(text)
+    history = UndoHistory()
+    history.attach(text, proxy)
+    for offset, char in enumerate('int x'):
+        proxy.replace(offset, 0, char)
+    assert undo_all(history, text) == ['int x', 'int ', '']
+    assert history.redo()
+    proxy.replace(4, 0, 'y')
+    assert not history.can_redo()
+    assert content(text) == 'int y'
@@ -0,0 +1,32 @@
+import time
+
+import workspace_search
+from workspace_search import WorkspaceSearch
+
+
+def test_results_stream_while_the_walk_is_still_going(tmp_path, monkeypatch):
+    for i in range(20):
+        (tmp_path / f'd{i}').mkdir()
+        for j in range(workspace_search.FILES_PER_TASK):
+            (tmp_path / f'd{i}' / f'f{j}.c').write_text('int needle;\n' if j == 0 else 'int x;\n')
+
+    walk_ended = []
+    real_iter_files = workspace_search.iter_files
+
+    def slow_iter_files(root):
+        for count, path in enumerate(real_iter_files(root)):
+            if count % workspace_search.FILES_PER_TASK == 0:
+                time.sleep(0.02)
+            yield path
+        walk_ended.append(time.perf_counter())
+
+    monkeypatch.setattr(workspace_search, 'iter_files', slow_iter_files)
+    search = WorkspaceSearch(str(tmp_path), 'needle')
+    search.start()
+    arrivals = []
+    while (item := search.results.get(timeout=60)) != 'done':
+        arrivals.append((time.perf_counter(), item))
+    assert sorted(path for _, (path, _) in arrivals) == sorted(
+        str(tmp_path / f'd{i}' / 'f0.c') for i in range(20))
+    assert all(matches == [(1, 'int needle;')] for _, (_, matches) in arrivals)
+    assert arrivals[0][0] < walk_ended[0]
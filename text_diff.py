@@ -0,0 +1,35 @@
+# -------------------------------
+# Shared ends of two text buffers
+# -------------------------------
+# Edits are recovered by diffing the old and new buffer: everything outside
+# the common prefix and suffix changed. Both scans compare whole blocks
+# first, so a single keystroke in a large file costs a few slice compares.
+
+
+def common_prefix(a, b, block=65536):
+    # Length of the shared prefix; whole blocks are compared in C first
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit:
+        step = min(block, limit - i)
+        if a[i:i + step] != b[i:i + step]:
+            break
+        i += step
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def common_suffix(a, b, prefix, block=65536):
+    # Length of the shared suffix, never overlapping the shared prefix
+    limit = min(len(a), len(b)) - prefix
+    len_a, len_b = len(a), len(b)
+    i = 0
+    while i < limit:
+        step = min(block, limit - i)
+        if a[len_a - i - step:len_a - i] != b[len_b - i - step:len_b - i]:
+            break
+        i += step
+    while i < limit and a[len_a - i - 1] == b[len_b - i - 1]:
+        i += 1
+    return i
@@ -0,0 +1,297 @@
+import bisect
+import re
+from array import array
+from concurrent.futures.process import BrokenProcessPool
+
+from lexer import (
+    tokenize, supported, KINDS, STRUCTURAL_KINDS, NEWLINE, IDENTIFIER, OPERATOR, OTHER, BRACKET,
+)
+from parallel_lex import lex_parallel, worthwhile
+from search_engine import LineIndex
+
+# ------------------------------------
+# Array-backed token store per document
+# ------------------------------------
+# Each token is a start offset, a length and a lexer kind, held in three
+# parallel columns: array('I'), array('I') and array('B'). That is 9 bytes a
+# token, against about 100 for a match object or a (kind, start, end) tuple.
+# Edits only record the damaged span (note_edit). The next update() re-lexes
+# from a little before the damage until the new tokens line up with the old
+# ones again. It reads a window of RELEX_WINDOW characters past the edit and
+# widens it only when a token runs off its end (an opened block comment).
+# The tokens after that point are shifted in one pass over the start column.
+# Highlighting, completion, bracket matching and the structural checks all
+# read from the store instead of lexing the buffer themselves. A huge buffer
+# is first lexed in a process pool (parallel_lex) when there are cores to spare.
+
+RELEX_WINDOW = 4096
+BRACKET_SCAN_LIMIT = 200000  # tokens walked looking for a matching bracket
+BRACKET_PAIRS = {'(': ')', '[': ']', '{': '}', ')': '(', ']': '[', '}': '{'}
+
+_STRUCTURAL = frozenset(KINDS[name] for name in STRUCTURAL_KINDS)
+# What lexer.tokenize(structural=True) reports besides the structural kinds
+_PYTHON_BLOCK_COLON = re.compile(r'[ \t\f]*(?:#[^\n]*)?(?:\n|\Z)')
+
+
+class _StringText:
+    # The slice of the Document interface the store uses, for plain strings
+    def __init__(self, text):
+        self.text = text
+        self.length = len(text)
+        self._lines = None
+
+    def get_text(self, start=0, end=None):
+        return self.text[start:end]
+
+    def line_start(self, line):
+        if self._lines is None:
+            self._lines = LineIndex(self.text).starts
+        if line <= 1:
+            return 0
+        return self._lines[line - 1] if line <= len(self._lines) else self.length
+
+    def line_start_at(self, offset):
+        return self.text.rfind('\n', 0, offset) + 1
+
+
+def _source(text):
+    return _StringText(text) if isinstance(text, str) else text
+
+
+def _line_start_at(source, offset):
+    if isinstance(source, _StringText):
+        return source.line_start_at(offset)
+    return source.line_start(source.offset_to_line_col(offset)[0])
+
+
+class TokenStore:
+    def __init__(self, lang, workers=None):
+        self.lang = lang
+        self.workers = workers  # for the first full lex; None uses every core
+        self.starts = array('I')
+        self.lengths = array('I')
+        self.kinds = array('B')
+        self.built = False
+        self.damage = None      # (offset, removed, inserted) covering every edit since the last update
+        self.version = 0        # bumped whenever the tokens change
+        self._identifiers = None  # (version, set of identifier names)
+        self.stats = {'full': 0, 'parallel': 0, 'updates': 0, 'relexed_chars': 0, 'relexed_tokens': 0}
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def memory_bytes(self):
+        return sum(column.buffer_info()[1] * column.itemsize for column in (self.starts, self.lengths, self.kinds))
+
+    # -- keeping up with edits --
+    def invalidate(self):
+        # The next update() lexes the whole text again
+        self.built = False
+        self.damage = None
+
+    def note_edit(self, offset, removed, inserted):
+        # offset is where the edit happened in the text as it was then
+        if not self.built:
+            return
+        if self.damage is None:
+            self.damage = (offset, removed, inserted)
+            return
+        # Merge with the earlier damage: the union of both spans, in old and new terms
+        start, old_len, new_len = self.damage
+        first = min(start, offset)
+        new_end = max(start + new_len, offset + removed)
+        old_end = start + old_len + (new_end - (start + new_len))
+        self.damage = (first, old_end - first, new_end + inserted - removed - first)
+
+    def update(self, text):
+        # Brings the tokens in line with text (a str or a Document). Returns the
+        # (start, end) span whose tokens may have changed, or None.
+        source = _source(text)
+        if not self.built:
+            self._rebuild(source)
+            return (0, source.length)
+        if self.damage is None:
+            return None
+        offset, removed, inserted = self.damage
+        self.damage = None
+        delta = inserted - removed
+        starts, n = self.starts, len(self.starts)
+        length = source.length
+
+        # Re-lex from two tokens before the damage (a token's end can depend on
+        # the character just past it), backed up to the start of that line so
+        # that rules anchored there (^[ \t]*#) see the indentation. A line that
+        # starts inside a multi-line token backs up to where that token starts.
+        i = max(0, bisect.bisect_left(starts, offset) - 2)
+        restart = min(starts[i], offset) if i < n else offset
+        while True:
+            base = _line_start_at(source, restart)
+            k = bisect.bisect_right(starts, base) - 1
+            if k < 0 or starts[k] == base or starts[k] + self.lengths[k] <= base:
+                break
+            restart = starts[k]
+        restart = base
+        i = bisect.bisect_left(starts, base)
+        edit_end = offset + inserted
+        first_after = bisect.bisect_left(starts, offset + removed)   # old tokens past the damage
+        window = RELEX_WINDOW
+        while True:
+            stop = min(length, edit_end + window)
+            chunk = source.get_text(base, stop)
+            new_starts, new_lengths, new_kinds = array('I'), array('I'), array('B')
+            synced = None
+            q = first_after
+            for kind, s, e in tokenize(chunk, self.lang, restart - base):
+                if e + base >= stop and stop < length:
+                    break   # may run on past the window
+                s += base
+                if s > edit_end:
+                    # The old tokens resume here unchanged: stop re-lexing
+                    while q < n and starts[q] + delta < s:
+                        q += 1
+                    if q < n and starts[q] + delta == s and self.lengths[q] == e + base - s and self.kinds[q] == kind:
+                        synced = q
+                        break
+                new_starts.append(s)
+                new_lengths.append(e + base - s)
+                new_kinds.append(kind)
+            if synced is not None or stop >= length:
+                break
+            window *= 4
+
+        j = n if synced is None else synced
+        tail = self.starts[j:]
+        if delta:
+            tail = array('I', map(delta.__add__, tail))
+        self.starts[i:] = new_starts + tail
+        self.lengths[i:j] = new_lengths
+        self.kinds[i:j] = new_kinds
+        self.version += 1
+        self.stats['updates'] += 1
+        self.stats['relexed_chars'] += stop - restart
+        self.stats['relexed_tokens'] += len(new_starts)
+        changed_end = new_starts[-1] + new_lengths[-1] if len(new_starts) else restart
+        return (restart, max(changed_end, edit_end))
+
+    def _rebuild(self, source):
+        text = source.get_text()
+        if worthwhile(len(text), self.workers):
+            try:
+                starts, lengths, kinds, seams = lex_parallel(text, self.lang, self.workers)
+            except (OSError, BrokenProcessPool):
+                pass    # no shared memory or no pool here: lex in this process
+            else:
+                self.load(starts, lengths, kinds)
+                self.stats['parallel'] += 1
+                self.reconcile(text, seams)
+                return
+        starts, lengths, kinds = array('I'), array('I'), array('B')
+        for kind, s, e in tokenize(text, self.lang):
+            starts.append(s)
+            lengths.append(e - s)
+            kinds.append(kind)
+        self.load(starts, lengths, kinds)
+
+    def load(self, starts, lengths, kinds):
+        # Replaces every token with columns lexed elsewhere
+        self.starts, self.lengths, self.kinds = starts, lengths, kinds
+        self.built = True
+        self.damage = None
+        self.version += 1
+        self.stats['full'] += 1
+
+    def reconcile(self, text, seams):
+        # The tokens after each seam offset were lexed as if the text began
+        # there; re-lex across every seam until they agree with a single pass
+        for offset in seams:
+            self.damage = (offset, 0, 0)
+            self.update(text)
+
+    # -- queries --
+    def token(self, i):
+        return self.kinds[i], self.starts[i], self.starts[i] + self.lengths[i]
+
+    def index_at(self, offset):
+        # Index of the token covering offset, or None
+        i = bisect.bisect_right(self.starts, offset) - 1
+        if i >= 0 and offset < self.starts[i] + self.lengths[i]:
+            return i
+        return None
+
+    def range(self, start, end):
+        # (kind, start, end) of every token overlapping [start, end)
+        starts, lengths, kinds = self.starts, self.lengths, self.kinds
+        i = max(0, bisect.bisect_right(starts, start) - 1)
+        if i < len(starts) and starts[i] + lengths[i] <= start:
+            i += 1
+        stop = bisect.bisect_left(starts, end, i)
+        for k in range(i, stop):
+            yield kinds[k], starts[k], starts[k] + lengths[k]
+
+    def lines(self, text, first, last):
+        # Tokens on 1-based lines first..last
+        source = _source(text)
+        return self.range(source.line_start(first), source.line_start(last + 1))
+
+    def __iter__(self):
+        return self.range(0, 1 << 32)
+
+    def structural(self, text):
+        # The token stream lexer.tokenize(text, structural=True) would give
+        source = _source(text)
+        python = self.lang == 'Python'
+        code = source.get_text() if python else None
+        for kind, s, e in self:
+            if kind in _STRUCTURAL:
+                yield kind, s, e
+            elif python:
+                if kind == NEWLINE:
+                    yield kind, s, e
+                elif kind == OPERATOR and code[s] == ':' and e - s == 1 and _PYTHON_BLOCK_COLON.match(code, e):
+                    yield kind, s, e
+                elif kind == OTHER and code[s] == '\\' and code[e:e + 1] == '\n':
+                    yield kind, s, e
+
+    def identifiers(self, text):
+        # Every identifier in the text, for completion; cached until the tokens change
+        if self._identifiers is None or self._identifiers[0] != self.version:
+            code = _source(text).get_text()
+            starts, lengths, kinds = self.starts, self.lengths, self.kinds
+            names = {code[starts[k]:starts[k] + lengths[k]] for k in range(len(kinds)) if kinds[k] == IDENTIFIER}
+            self._identifiers = (self.version, names)
+        return self._identifiers[1]
+
+    def match_bracket(self, text, offset):
+        # (offset, matching offset) for a bracket at or just before offset, or None
+        source = _source(text)
+        for at in (offset, offset - 1):
+            i = self.index_at(at) if at >= 0 else None
+            if i is not None and self.kinds[i] == BRACKET:
+                break
+        else:
+            return None
+        bracket = source.get_text(self.starts[i], self.starts[i] + 1)
+        partner = BRACKET_PAIRS[bracket]
+        step = 1 if bracket in '([{' else -1
+        depth = 0
+        k = i
+        for _ in range(BRACKET_SCAN_LIMIT):
+            k += step
+            if k < 0 or k >= len(self.kinds):
+                return None
+            if self.kinds[k] != BRACKET:
+                continue
+            ch = source.get_text(self.starts[k], self.starts[k] + 1)
+            if ch == bracket:
+                depth += 1
+            elif ch == partner:
+                if not depth:
+                    return self.starts[i], self.starts[k]
+                depth -= 1
+        return None
+
+
+def store_for(lang):
+    # None for languages the lexer doesn't know (HTML)
+    return TokenStore(lang) if supported(lang) else None
@@ -0,0 +1,146 @@
+import time
+from collections import deque
+
+from latency import tracker
+
+# ----------------------------------------
+# Time-sliced UI jobs on the Tk event loop
+# ----------------------------------------
+# Work that has to touch widgets (tagging, filling the gutter, writing console
+# output) is written as a generator that yields between small steps. The
+# scheduler resumes queued jobs from an after_idle callback until the slice
+# budget is spent, then re-arms itself. Tk only runs idle callbacks once its
+# event queue is empty, so keystrokes, clicks and redraws that arrive while a
+# job is running are handled before the job's next slice. Jobs are keyed:
+# submitting under a key that is still running closes the old generator.
+# Each job's share of a slice is recorded with the latency tracker under the
+# key's last element ('highlight', 'gutter', ...).
+
+SLICE_MS = 8
+CONSOLE_CHUNK = 16384   # characters inserted per console step
+
+
+class UIScheduler:
+    def __init__(self, widget, slice_ms=SLICE_MS):
+        self.widget = widget
+        self.slice = slice_ms / 1000.0
+        self.jobs = {}          # key -> generator, in run order
+        self.after_id = None
+        self.stats = {'slices': 0, 'steps': 0, 'cancelled': 0}
+
+    def submit(self, key, job):
+        # job is a generator; a pending job under the same key is superseded
+        self.cancel(key)
+        self.jobs[key] = job
+        self._arm()
+        return job
+
+    def cancel(self, key):
+        job = self.jobs.pop(key, None)
+        if job is not None:
+            self.stats['cancelled'] += 1
+            job.close()
+
+    def cancel_all(self):
+        for key in list(self.jobs):
+            self.cancel(key)
+
+    def pending(self, key):
+        return key in self.jobs
+
+    def flush(self, key=None):
+        # Run one job (or all of them) to completion right now
+        keys = [key] if key is not None else list(self.jobs)
+        for key in keys:
+            job = self.jobs.get(key)
+            if job is None:
+                continue
+            for _ in job:
+                self.stats['steps'] += 1
+            if self.jobs.get(key) is job:
+                del self.jobs[key]
+
+    def _arm(self):
+        if self.jobs and self.after_id is None:
+            self.after_id = self.widget.after_idle(self._run_slice)
+
+    def _run_slice(self):
+        self.after_id = None
+        self.stats['slices'] += 1
+        deadline = time.perf_counter() + self.slice
+        try:
+            while self.jobs and time.perf_counter() < deadline:
+                key, job = next(iter(self.jobs.items()))
+                started = time.perf_counter()
+                try:
+                    # A step may submit or cancel jobs, including this one
+                    while self.jobs.get(key) is job:
+                        next(job)
+                        self.stats['steps'] += 1
+                        if time.perf_counter() >= deadline:
+                            # Out of time: the other jobs go first next slice
+                            if self.jobs.get(key) is job:
+                                self.jobs[key] = self.jobs.pop(key)
+                            break
+                except StopIteration:
+                    if self.jobs.get(key) is job:
+                        del self.jobs[key]
+                except Exception:
+                    if self.jobs.get(key) is job:
+                        del self.jobs[key]
+                    raise
+                finally:
+                    tracker.record(_label(key), started, time.perf_counter() - started, 'job')
+        finally:
+            self._arm()
+
+
+def _label(key):
+    return key[-1] if isinstance(key, tuple) else key
+
+
+def scheduler_for(widget):
+    # One scheduler per Tk root, so every tab and window shares the frame budget
+    root = widget._root()
+    scheduler = getattr(root, '_ui_scheduler', None)
+    if scheduler is None:
+        scheduler = root._ui_scheduler = UIScheduler(root)
+    return scheduler
+
+
+class ConsoleWriter:
+    # Appends to a read-only Text widget a chunk per step, in write order
+    def __init__(self, text_widget, chunk=CONSOLE_CHUNK):
+        self.text = text_widget
+        self.chunk = chunk
+        self.scheduler = scheduler_for(text_widget)
+        self.key = (self, 'console')
+        self.queue = deque()
+
+    def write(self, message):
+        if not message:
+            return
+        self.queue.append(message)
+        if not self.scheduler.pending(self.key):
+            self.scheduler.submit(self.key, self._drain())
+
+    def clear(self):
+        self.queue.clear()
+        self.scheduler.cancel(self.key)
+        state = self.text.cget('state')
+        self.text.config(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.config(state=state)
+
+    def _drain(self):
+        while self.queue:
+            message = self.queue.popleft()
+            if len(message) > self.chunk:
+                self.queue.appendleft(message[self.chunk:])
+                message = message[:self.chunk]
+            state = self.text.cget('state')
+            self.text.config(state='normal')
+            self.text.insert('end', message)
+            self.text.config(state=state)
+            self.text.see('end')
+            yield
@@ -0,0 +1,365 @@
+import json
+import pickle
+import re
+import tempfile
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+
+from text_diff import common_prefix, common_suffix
+
+# ------------------------------------
+# Editor-managed, bounded undo history
+# ------------------------------------
+# Replaces Tk's built-in undo stack, which keeps every keystroke forever.
+# Edits arrive from a TextEditProxy. Typing is merged into word-sized steps:
+# consecutive single-character inserts (or Backspace/Delete presses) at the
+# expected position stay in one step until a new word starts or the typist
+# pauses for COALESCE_SECONDS. An edit larger than PACK_THRESHOLD characters
+# is stored as a compact diff: the common prefix and suffix of the removed
+# and inserted text are dropped, and when the middle keeps its line count
+# only the changed lines are kept, zlib-compressed. The stack is bounded by
+# MAX_STEPS and MAX_BYTES; past either, the oldest steps are pickled to an
+# anonymous temp file (up to MAX_SPILL_BYTES) and read back as undo reaches
+# them. Redo is cleared by any new edit, as usual.
+
+MAX_STEPS = 1000
+MAX_BYTES = 4 * 1024 * 1024
+MAX_SPILL_BYTES = 64 * 1024 * 1024
+COALESCE_SECONDS = 1.5
+PACK_THRESHOLD = 4096       # characters removed + inserted
+EDIT_OVERHEAD = 120         # bytes per stored edit besides its text
+
+_WORD = re.compile(r'\w')
+
+# Histories by Text widget path, for helpers that only have the widget
+_histories = {}
+
+
+def history_for(widget):
+    return _histories.get(str(widget))
+
+
+def _key(index):
+    line, col = str(index).split('.')
+    return int(line), int(col)
+
+
+class PackedChange:
+    # A large replacement stored as what differs between its two sides
+    __slots__ = ('skip', 'removed_len', 'inserted_len', 'patch')
+
+    def __init__(self, removed, inserted):
+        self.skip = common_prefix(removed, inserted)
+        tail = common_suffix(removed, inserted, self.skip)
+        old = removed[self.skip:len(removed) - tail]
+        new = inserted[self.skip:len(inserted) - tail]
+        self.removed_len = len(old)
+        self.inserted_len = len(new)
+        old_lines, new_lines = old.split('\n'), new.split('\n')
+        if len(old_lines) == len(new_lines):
+            patch = ['lines', [(i, a, b) for i, (a, b) in enumerate(zip(old_lines, new_lines)) if a != b]]
+        else:
+            patch = ['text', old, new]
+        self.patch = zlib.compress(json.dumps(patch).encode('utf-8'), 6)
+
+    @property
+    def size(self):
+        return len(self.patch) + EDIT_OVERHEAD
+
+    def _patch(self):
+        return json.loads(zlib.decompress(self.patch).decode('utf-8'))
+
+    def old_text(self, new):
+        patch = self._patch()
+        if patch[0] == 'text':
+            return patch[1]
+        lines = new.split('\n')
+        for i, old_line, _ in patch[1]:
+            lines[i] = old_line
+        return '\n'.join(lines)
+
+    def new_text(self, old):
+        patch = self._patch()
+        if patch[0] == 'text':
+            return patch[2]
+        lines = old.split('\n')
+        for i, _, new_line in patch[1]:
+            lines[i] = new_line
+        return '\n'.join(lines)
+
+
+class UndoStep:
+    # Edits are (start, removed, inserted) with start the "line.col" index
+    # before the edit, or (start, PackedChange, None)
+    __slots__ = ('edits', 'size')
+
+    def __init__(self, edits=None):
+        self.edits = edits or []
+        self.size = sum(_edit_size(edit) for edit in self.edits)
+
+    def add(self, edit):
+        self.edits.append(edit)
+        self.size += _edit_size(edit)
+
+
+def _edit_size(edit):
+    start, removed, inserted = edit
+    if isinstance(removed, PackedChange):
+        return removed.size
+    return len(removed) + len(inserted) + EDIT_OVERHEAD
+
+
+def _compact(edits):
+    # A delete followed by an insert at the same index is one replacement;
+    # big replacements are packed
+    merged = []
+    for start, removed, inserted in edits:
+        if merged and not merged[-1][2] and not removed and merged[-1][0] == start:
+            merged[-1] = (start, merged[-1][1], inserted)
+        else:
+            merged.append((start, removed, inserted))
+    return [(start, PackedChange(removed, inserted), None) if len(removed) + len(inserted) > PACK_THRESHOLD
+            else (start, removed, inserted) for start, removed, inserted in merged]
+
+
+class UndoHistory:
+    def __init__(self, max_steps=MAX_STEPS, max_bytes=MAX_BYTES, max_spill_bytes=MAX_SPILL_BYTES):
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.widget = None
+        self.proxy = None
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.bytes = 0              # held by undo_stack and redo_stack
+        self.typing = None          # (kind, next start key, last char, time) of the step still merging
+        self.group_depth = 0
+        self.group_step = None
+        self.applying = False
+        self.spill_file = None
+        self.spilled = []           # (offset, length) per spilled step, oldest first
+        self.stats = {'steps': 0, 'merged': 0, 'packed': 0, 'spilled': 0, 'restored': 0, 'dropped': 0}
+
+    def attach(self, widget, proxy):
+        self.widget = widget
+        self.proxy = proxy
+        proxy.subscribe(self.record)
+        _histories[str(widget)] = self
+
+    def detach(self):
+        # The history outlives the widget, e.g. while a tab is hibernated
+        self.typing = None
+        if self.proxy is not None:
+            self.proxy.unsubscribe(self.record)
+        if _histories.get(str(self.widget)) is self:
+            del _histories[str(self.widget)]
+        self.widget = self.proxy = None
+
+    @property
+    def memory_bytes(self):
+        return self.bytes
+
+    def can_undo(self):
+        return bool(self.undo_stack or self.spilled)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    # -- recording --
+    def separator(self):
+        # The next edit starts a new step
+        self.typing = None
+
+    @contextmanager
+    def group(self):
+        # Every edit inside the block is undone and redone as one step
+        self.typing = None
+        if not self.group_depth:
+            self.group_step = UndoStep()
+        self.group_depth += 1
+        try:
+            yield
+        finally:
+            self.group_depth -= 1
+            if not self.group_depth:
+                step, self.group_step = self.group_step, None
+                if step.edits:
+                    self._push(UndoStep(_compact(step.edits)))
+
+    def record(self, event):
+        if self.applying:
+            return
+        self._clear_redo()
+        edit = (event.start, event.removed, event.inserted)
+        if self.group_depth:
+            self.group_step.add(edit)
+            return
+        now = time.monotonic()
+        kind, char = self._typing_kind(event)
+        if kind and self._continues_typing(kind, event, char, now):
+            self._merge(kind, event, char, now)
+            return
+        self.typing = None
+        self._push(UndoStep(_compact([edit])))
+        if kind:
+            self.typing = (kind, self._next_start(kind, event.start), char, now)
+
+    def _typing_kind(self, event):
+        if len(event.inserted) == 1 and not event.removed and event.inserted != '\n':
+            return 'insert', event.inserted
+        if len(event.removed) == 1 and not event.inserted and event.removed != '\n':
+            return 'delete', event.removed
+        return None, None
+
+    def _next_start(self, kind, start):
+        # Where the next keystroke of this kind lands: after an inserted
+        # character, or at the same index (Delete) or one before it (Backspace)
+        line, col = _key(start)
+        return (line, col + 1) if kind == 'insert' else (line, col)
+
+    def _continues_typing(self, kind, event, char, now):
+        if self.typing is None or not self.undo_stack:
+            return False
+        last_kind, expected, last_char, last_time = self.typing
+        if kind != last_kind or now - last_time > COALESCE_SECONDS:
+            return False
+        # A word starting after a space or punctuation starts a new step
+        if _WORD.match(char) and not _WORD.match(last_char):
+            return False
+        start = _key(event.start)
+        if kind == 'insert':
+            return start == expected
+        return start == expected or start == (expected[0], expected[1] - 1)
+
+    def _merge(self, kind, event, char, now):
+        step = self.undo_stack[-1]
+        start, removed, inserted = step.edits[-1]
+        if kind == 'insert':
+            edit = (start, removed, inserted + char)
+        elif _key(event.start) == _key(start):
+            edit = (start, removed + char, inserted)        # Delete key
+        else:
+            edit = (event.start, char + removed, inserted)  # Backspace
+        step.edits[-1] = edit
+        step.size += 1
+        self.bytes += 1
+        self.stats['merged'] += 1
+        self.typing = (kind, self._next_start(kind, edit[0] if kind == 'delete' else event.start), char, now)
+
+    def _push(self, step):
+        self.undo_stack.append(step)
+        self.bytes += step.size
+        self.stats['steps'] += 1
+        self.stats['packed'] += sum(1 for edit in step.edits if isinstance(edit[1], PackedChange))
+        self._enforce_limits()
+
+    def _clear_redo(self):
+        self.bytes -= sum(step.size for step in self.redo_stack)
+        self.redo_stack.clear()
+
+    # -- bounds and spilling --
+    def _enforce_limits(self):
+        # The newest step may still be merging typing, so it always stays
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > self.max_steps or self.bytes > self.max_bytes):
+            self._spill(self.undo_stack.popleft())
+
+    def spill_all(self):
+        self.typing = None
+        while self.undo_stack:
+            self._spill(self.undo_stack.popleft())
+
+    def _spill(self, step):
+        self.bytes -= step.size
+        data = zlib.compress(pickle.dumps(step.edits, pickle.HIGHEST_PROTOCOL))
+        if self.spill_file is None:
+            self.spill_file = tempfile.TemporaryFile(prefix='undo-')
+        end = self.spilled[-1][0] + self.spilled[-1][1] if self.spilled else 0
+        if end + len(data) > self.max_spill_bytes:
+            # History must stay contiguous, so everything older goes
+            self.stats['dropped'] += len(self.spilled)
+            self.spilled.clear()
+            end = 0
+        if len(data) > self.max_spill_bytes:
+            self.stats['dropped'] += 1
+            return
+        self.spill_file.seek(end)
+        self.spill_file.write(data)
+        self.spill_file.truncate()
+        self.spilled.append((end, len(data)))
+        self.stats['spilled'] += 1
+
+    def _restore(self):
+        offset, length = self.spilled.pop()
+        self.spill_file.seek(offset)
+        step = UndoStep(pickle.loads(zlib.decompress(self.spill_file.read(length))))
+        self.spill_file.truncate(offset)
+        self.stats['restored'] += 1
+        return step
+
+    # -- undo and redo --
+    def undo(self):
+        self.typing = None
+        if not self.undo_stack and self.spilled:
+            step = self._restore()
+            self.bytes += step.size
+        elif self.undo_stack:
+            step = self.undo_stack.pop()
+        else:
+            return False
+        text = self.widget
+        self.applying = True
+        try:
+            for start, removed, inserted in reversed(step.edits):
+                if isinstance(removed, PackedChange):
+                    first = text.index(f"{start}+{removed.skip}c")
+                    last = f"{first}+{removed.inserted_len}c"
+                    old = removed.old_text(text.get(first, last))
+                    text.delete(first, last)
+                    text.insert(first, old)
+                    cursor = f"{first}+{len(old)}c"
+                else:
+                    if inserted:
+                        text.delete(start, f"{start}+{len(inserted)}c")
+                    if removed:
+                        text.insert(start, removed)
+                    cursor = f"{start}+{len(removed)}c"
+        finally:
+            self.applying = False
+        self.redo_stack.append(step)
+        self._move_cursor(cursor)
+        return True
+
+    def redo(self):
+        self.typing = None
+        if not self.redo_stack:
+            return False
+        step = self.redo_stack.pop()
+        text = self.widget
+        self.applying = True
+        try:
+            for start, removed, inserted in step.edits:
+                if isinstance(removed, PackedChange):
+                    first = text.index(f"{start}+{removed.skip}c")
+                    last = f"{first}+{removed.removed_len}c"
+                    new = removed.new_text(text.get(first, last))
+                    text.delete(first, last)
+                    text.insert(first, new)
+                    cursor = f"{first}+{len(new)}c"
+                else:
+                    if removed:
+                        text.delete(start, f"{start}+{len(removed)}c")
+                    if inserted:
+                        text.insert(start, inserted)
+                    cursor = f"{start}+{len(inserted)}c"
+        finally:
+            self.applying = False
+        self.undo_stack.append(step)
+        self._enforce_limits()
+        self._move_cursor(cursor)
+        return True
+
+    def _move_cursor(self, index):
+        self.widget.mark_set('insert', index)
+        self.widget.see('insert')
@@ -0,0 +1,128 @@
+import mmap
+import os
+import queue
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+IGNORED_DIRS = {'.git', '.hg', '.svn', '__pycache__', 'node_modules', 'build', '.venv', 'venv',
+                '.mypy_cache', '.pytest_cache', '.tox'}
+BINARY_SNIFF_BYTES = 8192
+MAX_MATCHES_PER_FILE = 1000
+MAX_LINE_PREVIEW = 200
+FILES_PER_TASK = 64
+NEWLINE_WINDOW = 1 << 20  # count newlines 1 MB at a time
+
+
+def compile_bytes_query(query, case_sensitive=False, regex=False):
+    pattern = query.encode('utf-8') if regex else re.escape(query.encode('utf-8'))
+    return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+
+
+def iter_files(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS and not d.startswith('.')]
+        for name in filenames:
+            yield os.path.join(dirpath, name)
+
+
+def _count_newlines(mm, start, end):
+    count = 0
+    while start < end:
+        stop = min(end, start + NEWLINE_WINDOW)
+        count += mm[start:stop].count(b'\n')
+        start = stop
+    return count
+
+
+def search_file(path, pattern):
+    # Returns [(line_number, preview)] without reading the file into a string
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if b'\0' in mm[:BINARY_SNIFF_BYTES]:
+                    return []
+                results = []
+                line_no = 1
+                scanned = 0
+                last_line_start = -1
+                for match in pattern.finditer(mm):
+                    start = match.start()
+                    line_no += _count_newlines(mm, scanned, start)
+                    scanned = start
+                    line_start = mm.rfind(b'\n', 0, start) + 1
+                    if line_start == last_line_start:
+                        continue  # one result per line
+                    last_line_start = line_start
+                    line_end = mm.find(b'\n', start)
+                    if line_end == -1:
+                        line_end = len(mm)
+                    line_end = min(line_end, line_start + MAX_LINE_PREVIEW)
+                    preview = mm[line_start:line_end].decode('utf-8', errors='replace').strip()
+                    results.append((line_no, preview))
+                    if len(results) >= MAX_MATCHES_PER_FILE:
+                        break
+                return results
+    except (OSError, ValueError):
+        return []
+
+
+def search_files(paths, pattern):
+    found = []
+    for path in paths:
+        matches = search_file(path, pattern)
+        if matches:
+            found.append((path, matches))
+    return found
+
+
+class WorkspaceSearch:
+    # Streams (path, matches) tuples into self.results; a 'done' sentinel ends the stream
+    def __init__(self, root, query, case_sensitive=False, regex=False):
+        self.root = root
+        self.pattern = compile_bytes_query(query, case_sensitive, regex)
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self.pool = None
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        workers = os.cpu_count() or 1
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as self.pool:
+                pending = set()
+                batch = []
+                for path in iter_files(self.root):
+                    if self.cancelled.is_set():
+                        break
+                    batch.append(path)
+                    if len(batch) == FILES_PER_TASK:
+                        pending.add(self.pool.submit(search_files, batch, self.pattern))
+                        batch = []
+                        # Results stream out while the walk is still going
+                        self._collect(pending, timeout=0)
+                if batch and not self.cancelled.is_set():
+                    pending.add(self.pool.submit(search_files, batch, self.pattern))
+                while pending and not self.cancelled.is_set():
+                    self._collect(pending)
+        finally:
+            self.results.put('done')
+
+    def _collect(self, pending, timeout=None):
+        # Queues the results of finished tasks, waiting up to timeout for the first
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            if future.cancelled() or future.exception():
+                continue
+            for item in future.result():
+                self.results.put(item)
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)